@@ -0,0 +1,8 @@
+"""Benchmarks of pybids-reports on synthetic datasets.
+
+Run them with::
+
+    pytest benchmarks --subjects 10,1000,10000
+
+See :mod:`benchmarks.synthetic` to generate the datasets.
+"""
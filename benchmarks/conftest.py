@@ -0,0 +1,55 @@
+"""Fixtures for the benchmarks."""
+
+from __future__ import annotations
+
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from bids.layout import BIDSLayout
+
+from .synthetic import make_dataset
+
+N_SESSIONS = 2
+N_RUNS = 2
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--subjects",
+        action="store",
+        default="10",
+        help="Comma separated numbers of subjects of the synthetic datasets, e.g. 10,1000,10000.",
+    )
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    if "n_subjects" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("subjects").split(",")]
+        metafunc.parametrize("n_subjects", sizes, scope="session")
+
+
+@pytest.fixture(scope="session")
+def dataset(n_subjects: int, tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Generate a synthetic dataset once per session."""
+    root = tmp_path_factory.mktemp(f"synthetic_{n_subjects}") / "dataset"
+    return make_dataset(root, n_subjects=n_subjects, n_sessions=N_SESSIONS, n_runs=N_RUNS)
+
+
+@pytest.fixture(scope="session")
+def layout(dataset: Path) -> BIDSLayout:
+    """Index the synthetic dataset once per session."""
+    return BIDSLayout(dataset)
+
+
+def peak_memory(func: Callable[..., Any], *args: Any, **kwargs: Any) -> float:
+    """Return the peak memory allocated by a call, in MiB."""
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
@@ -0,0 +1,212 @@
+"""Generate synthetic BIDS datasets of any size for benchmarks.
+
+Images only contain a NIfTI header, so that large datasets stay small on disk
+while being indexed and reported on like real ones.
+
+Usage::
+
+    python -m benchmarks.synthetic OUTPUT_DIR --subjects 1000 --sessions 2 --runs 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import struct
+from collections.abc import Sequence
+from pathlib import Path
+
+# NIfTI datatype codes
+INT16 = 4
+FLOAT32 = 16
+
+TASK = "rest"
+
+TOP_LEVEL_SIDECARS = {
+    "dataset_description.json": {
+        "Name": "Synthetic dataset for benchmarks",
+        "BIDSVersion": "1.9.0",
+    },
+    f"task-{TASK}_bold.json": {
+        "TaskName": TASK,
+        "RepetitionTime": 2.0,
+        "EchoTime": 0.03,
+        "FlipAngle": 80,
+        "SliceTiming": [i * 0.0625 for i in range(32)],
+        "PhaseEncodingDirection": "j-",
+        "ScanningSequence": "EP",
+        "SequenceVariant": "SK",
+        "MRAcquisitionType": "2D",
+        "MultibandAccelerationFactor": 2,
+        "Manufacturer": "Siemens",
+        "ManufacturersModelName": "Prisma",
+        "MagneticFieldStrength": 3,
+        "ConversionSoftware": "dcm2niix",
+        "ConversionSoftwareVersion": "v1.0.20220720",
+    },
+    "T1w.json": {
+        "RepetitionTime": 2.3,
+        "EchoTime": 0.00298,
+        "FlipAngle": 9,
+        "ScanningSequence": "GR_IR",
+        "SequenceVariant": "SK_SP_MP",
+        "MRAcquisitionType": "3D",
+        "Manufacturer": "Siemens",
+        "ManufacturersModelName": "Prisma",
+        "MagneticFieldStrength": 3,
+    },
+    "dwi.json": {
+        "RepetitionTime": 3.2,
+        "EchoTime": 0.089,
+        "FlipAngle": 90,
+        "ScanningSequence": "EP",
+        "SequenceVariant": "SK_SP",
+        "PhaseEncodingDirection": "j-",
+        "MultibandAccelerationFactor": 3,
+    },
+}
+
+N_DIRECTIONS = 64
+
+
+def nifti_header(
+    shape: Sequence[int], zooms: Sequence[float], datatype: int = INT16, bitpix: int = 16
+) -> bytes:
+    """Return a NIfTI-1 header, followed by an empty extension flag."""
+    header = bytearray(348)
+    struct.pack_into("<i", header, 0, 348)
+    dim = [len(shape), *shape] + [1] * (7 - len(shape))
+    struct.pack_into("<8h", header, 40, *dim)
+    struct.pack_into("<hh", header, 70, datatype, bitpix)
+    pixdim = [1.0, *zooms] + [1.0] * (7 - len(zooms))
+    struct.pack_into("<8f", header, 76, *pixdim)
+    # vox_offset
+    struct.pack_into("<f", header, 108, 352.0)
+    header[344:348] = b"n+1\0"
+    return bytes(header) + b"\0\0\0\0"
+
+
+def _write_image(path: Path, shape: Sequence[int], zooms: Sequence[float]) -> None:
+    with gzip.open(path, "wb", compresslevel=1) as fobj:
+        fobj.write(nifti_header(shape, zooms))
+
+
+def _write_json(path: Path, content: dict) -> None:
+    path.write_text(json.dumps(content, indent=2))
+
+
+def make_session(root: Path, subject: str, session: str | None, n_runs: int) -> int:
+    """Write the files of a session and return the number of files written."""
+    prefix = f"sub-{subject}" if session is None else f"sub-{subject}_ses-{session}"
+    session_dir = root / f"sub-{subject}"
+    if session is not None:
+        session_dir = session_dir / f"ses-{session}"
+    n_files = 0
+
+    anat = session_dir / "anat"
+    anat.mkdir(parents=True)
+    _write_image(anat / f"{prefix}_T1w.nii.gz", (176, 256, 256), (1.0, 1.0, 1.0))
+    n_files += 1
+
+    func = session_dir / "func"
+    func.mkdir()
+    bold_files = []
+    for run in range(1, n_runs + 1):
+        name = f"{prefix}_task-{TASK}_run-{run:02d}_bold"
+        _write_image(func / f"{name}.nii.gz", (64, 64, 32, 200), (3.0, 3.0, 3.5, 2.0))
+        _write_json(func / f"{name}.json", {"AcquisitionTime": f"10:{run:02d}:00"})
+        bold_files.append(f"func/{name}.nii.gz")
+        n_files += 2
+
+    dwi = session_dir / "dwi"
+    dwi.mkdir()
+    _write_image(dwi / f"{prefix}_dwi.nii.gz", (96, 96, 60, N_DIRECTIONS + 1), (2.0, 2.0, 2.0))
+    bvals = [0] + [1000 if i % 2 else 2000 for i in range(N_DIRECTIONS)]
+    (dwi / f"{prefix}_dwi.bval").write_text(" ".join(str(b) for b in bvals) + "\n")
+    (dwi / f"{prefix}_dwi.bvec").write_text(
+        "\n".join(" ".join("0.577" for _ in bvals) for _ in range(3)) + "\n"
+    )
+    n_files += 3
+
+    fmap = session_dir / "fmap"
+    fmap.mkdir()
+    intended_for = [
+        f"bids::sub-{subject}/{'' if session is None else f'ses-{session}/'}{path}"
+        for path in bold_files
+    ]
+    for suffix in ("magnitude1", "magnitude2", "phasediff"):
+        _write_image(fmap / f"{prefix}_{suffix}.nii.gz", (64, 64, 32), (3.0, 3.0, 3.5))
+        n_files += 1
+    _write_json(
+        fmap / f"{prefix}_phasediff.json",
+        {
+            "EchoTime1": 0.00492,
+            "EchoTime2": 0.00738,
+            "RepetitionTime": 0.4,
+            "FlipAngle": 60,
+            "PhaseEncodingDirection": "j-",
+            "IntendedFor": intended_for,
+        },
+    )
+    n_files += 1
+    return n_files
+
+
+def make_dataset(
+    root: str | Path, n_subjects: int = 10, n_sessions: int = 1, n_runs: int = 2
+) -> Path:
+    """Write a synthetic BIDS dataset.
+
+    Each session has a T1w image, ``n_runs`` BOLD runs with their sidecars,
+    a DWI image with its gradient files and a phase difference field map
+    intended for the BOLD runs.
+
+    Parameters
+    ----------
+    root : :obj:`str` or :obj:`pathlib.Path`
+        Directory where to write the dataset. Must not exist.
+
+    n_subjects : :obj:`int`
+        Number of subjects.
+
+    n_sessions : :obj:`int`
+        Number of sessions per subject. If 0, subjects have no session directory.
+
+    n_runs : :obj:`int`
+        Number of BOLD runs per session.
+
+    Returns
+    -------
+    root : :obj:`pathlib.Path`
+    """
+    root = Path(root)
+    root.mkdir(parents=True)
+    for filename, content in TOP_LEVEL_SIDECARS.items():
+        _write_json(root / filename, content)
+
+    width = max(len(str(n_subjects)), 2)
+    subjects = [f"{i:0{width}d}" for i in range(1, n_subjects + 1)]
+    (root / "participants.tsv").write_text(
+        "participant_id\n" + "".join(f"sub-{sub}\n" for sub in subjects)
+    )
+
+    sessions: list[str | None] = [f"{i:02d}" for i in range(1, n_sessions + 1)] or [None]
+    for sub in subjects:
+        for ses in sessions:
+            make_session(root, sub, ses, n_runs)
+    return root
+
+
+def main(args: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir", type=Path, help="Directory where to write the dataset.")
+    parser.add_argument("--subjects", type=int, default=10, help="Number of subjects.")
+    parser.add_argument("--sessions", type=int, default=1, help="Number of sessions.")
+    parser.add_argument("--runs", type=int, default=2, help="Number of BOLD runs per session.")
+    opts = parser.parse_args(args)
+    make_dataset(opts.output_dir, opts.subjects, opts.sessions, opts.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Benchmarks of the functions called for every subject."""
+
+from __future__ import annotations
+
+from bids.ext.reports import parameters, templates
+from bids.ext.reports.utils import FilenameIndex, MetadataCache, collect_associated_files
+
+
+def test_collect_associated_files(benchmark, layout):
+    files = layout.get(subject=layout.get_subjects()[0], extension=[".nii", ".nii.gz"])
+    groups = benchmark(collect_associated_files, files, extra_entities=["run"])
+    assert groups
+
+
+def test_intendedfor_targets(benchmark, layout):
+    fmap = layout.get(suffix="phasediff", extension=".nii.gz")[-1]
+    metadata = fmap.get_metadata()
+    filename_index = FilenameIndex(layout)
+    metadata_cache = MetadataCache()
+    targets = benchmark(
+        parameters.intendedfor_targets, metadata, layout, filename_index, metadata_cache
+    )
+    assert targets
+
+
+def test_filename_index(benchmark, layout):
+    """Build the lookup table of the IntendedFor targets."""
+    benchmark.pedantic(lambda: FilenameIndex(layout).index, rounds=3)
+
+
+def test_render(benchmark):
+    desc_data = {
+        "nb_runs": "Two runs",
+        "task_name": "rest",
+        "scan_type": "bold",
+        "multi_echo": "single-echo",
+        "seqs": "echo planar (EP)",
+        "nb_slices": 32,
+        "slice_order": " in sequential ascending order",
+        "tr": 2000,
+        "echo_time": 30,
+        "fov": "192x192",
+        "matrix_size": "64x64",
+        "voxel_size": "3x3x3.5",
+        "duration": "6:40",
+        "nb_vols": 200,
+    }
+    assert benchmark(templates.func_info, desc_data)
@@ -0,0 +1,30 @@
+"""Benchmarks of the indexing of the dataset."""
+
+from __future__ import annotations
+
+from bids.layout import BIDSLayout
+
+from bids.ext.reports.layout_db import load_layout
+
+
+def test_index_cold(benchmark, dataset):
+    """Index the dataset from scratch."""
+    benchmark.pedantic(BIDSLayout, args=(dataset,), rounds=1, iterations=1)
+
+
+def test_index_warm(benchmark, dataset, tmp_path):
+    """Load the layout from a database stored by a previous run."""
+    database_path = tmp_path / "db"
+    load_layout(dataset, database_path=database_path)
+    layout = benchmark.pedantic(
+        load_layout, args=(dataset,), kwargs={"database_path": database_path}, rounds=3
+    )
+    assert not layout.connection_manager._database_reset
+
+
+def test_index_one_participant(benchmark, dataset):
+    """Index a single participant, as with '--participant_label'."""
+    layout = benchmark.pedantic(
+        load_layout, args=(dataset,), kwargs={"participant_label": ["01"]}, rounds=3
+    )
+    assert layout.get_subjects() == ["01"]
@@ -0,0 +1,39 @@
+"""Benchmarks of the generation of reports."""
+
+from __future__ import annotations
+
+from bids.ext.reports import BIDSReport
+from bids.ext.reports.utils import index_files_by_subject_session
+
+from .conftest import peak_memory
+
+
+def _first_subject(layout):
+    subject = layout.get_subjects()[0]
+    files = layout.get(subject=subject, extension=[".nii", ".nii.gz"])
+    return subject, index_files_by_subject_session(files)[subject]
+
+
+def test_report_subject_cold(benchmark, layout):
+    """Describe a subject with empty caches."""
+    subject, sessions = _first_subject(layout)
+
+    def setup():
+        return (BIDSReport(layout), subject, sessions), {}
+
+    benchmark.pedantic(lambda report, *args: report._report_subject(*args), setup=setup, rounds=5)
+
+
+def test_report_subject_warm(benchmark, layout):
+    """Describe a subject whose metadata and headers are already cached."""
+    subject, sessions = _first_subject(layout)
+    report = BIDSReport(layout)
+    report._report_subject(subject, sessions)
+    benchmark(report._report_subject, subject, sessions)
+
+
+def test_generate(benchmark, layout):
+    """Generate the report of the whole dataset, and measure its peak memory."""
+    benchmark.extra_info["peak_memory_mib"] = peak_memory(BIDSReport(layout).generate)
+    counter = benchmark.pedantic(lambda: BIDSReport(layout).generate(), rounds=1, iterations=1)
+    assert len(counter) == 1
@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
-from . import _version, parameters, parsing, report
+import importlib
+from typing import Any
+
+from . import _version
 from .due import Doi, due
-from .report import BIDSReport
 
 __all__ = ["BIDSReport", "parameters", "parsing", "report"]
 
@@ -18,3 +20,18 @@ due.cite(
 del due, Doi
 
 __version__ = _version.__version__
+
+
+def __getattr__(name: str) -> Any:
+    # Import the submodules on first use, to keep importing the package fast.
+    if name == "BIDSReport":
+        from .report import BIDSReport
+
+        return BIDSReport
+    if name in ("parameters", "parsing", "report"):
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
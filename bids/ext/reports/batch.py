@@ -0,0 +1,256 @@
+"""Report on many datasets in a single process.
+
+Running ``pybids_reports`` once per dataset pays for starting the interpreter
+and importing pybids, numpy and the templates again for every dataset.
+:func:`run_batch` reports on the datasets in the current process,
+or in a pool of worker processes that each report on several datasets.
+"""
+
+from __future__ import annotations
+
+import csv
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
+
+from .layout_db import load_layout
+from .logger import pybids_reports_logger, setup_logging
+from .nifti import HEADER_CACHE_FILENAME, HeaderCache
+from .output import write_report
+from .report import BIDSReport, _effective_n_jobs
+
+LOGGER = pybids_reports_logger()
+
+LAYOUT_DB_DIRNAME = "layout_db"
+
+
+class DatasetResult(NamedTuple):
+    """Outcome of the report on a dataset, as returned by :func:`run_batch`."""
+
+    dataset: str
+    """Path of the dataset."""
+
+    output_dir: str
+    """Directory where the report of the dataset was written."""
+
+    wall_time: float
+    """Time spent on the dataset, in seconds."""
+
+    n_subjects: int
+    """Number of subjects described."""
+
+    n_patterns: int
+    """Number of unique descriptions found."""
+
+    error: str | None
+    """Error that stopped the report, None if it succeeded."""
+
+
+def read_dataset_list(path: str | Path) -> list[Path]:
+    """Read a file listing one dataset per line.
+
+    Blank lines and lines starting with ``#`` are skipped.
+    Relative paths are relative to the directory of the file.
+    """
+    path = Path(path)
+    datasets = []
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            datasets.append(path.parent / line)
+    return datasets
+
+
+def output_dirs(datasets: list[Path], output_dir: Path) -> list[Path]:
+    """Return the output directory of each dataset, named after the dataset.
+
+    A number is appended to the names shared by several datasets.
+    """
+    seen: dict[str, int] = {}
+    dirs = []
+    for dataset in datasets:
+        name = Path(dataset).absolute().name
+        seen[name] = seen.get(name, 0) + 1
+        dirs.append(output_dir / (name if seen[name] == 1 else f"{name}-{seen[name]}"))
+    return dirs
+
+
+def report_dataset(
+    bids_dir: Path, output_dir: Path, cache_dir: Path | None = None, io_threads: int = 4
+) -> DatasetResult:
+    """Write the report of a dataset to its output directory.
+
+    Errors are logged and returned instead of being raised,
+    so that they do not stop the other reports of a batch.
+
+    Parameters
+    ----------
+    bids_dir : :obj:`pathlib.Path`
+        Root of the BIDS dataset.
+
+    output_dir : :obj:`pathlib.Path`
+        Output directory of the dataset.
+
+    cache_dir : :obj:`pathlib.Path`, optional
+        Directory where to store the image header cache and the layout database
+        of the dataset, so that later batches can reuse them.
+
+    io_threads : :obj:`int`
+        Maximum number of threads used to read the image headers of a session.
+    """
+    start = perf_counter()
+    n_subjects = n_patterns = 0
+    error = None
+    try:
+        layout = load_layout(
+            bids_dir,
+            database_path=None if cache_dir is None else cache_dir / LAYOUT_DB_DIRNAME,
+        )
+        # the cache is flushed and closed even if the report fails
+        with HeaderCache(
+            None if cache_dir is None else cache_dir / HEADER_CACHE_FILENAME
+        ) as header_cache:
+            report = BIDSReport(layout, header_cache=header_cache, io_threads=io_threads)
+            counter = report.generate()
+        write_report(counter, output_dir)
+        n_subjects = sum(len(subjects) for subjects in report.patterns.values())
+        n_patterns = len(report.patterns)
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        LOGGER.error(f"Report on {bids_dir} failed: {error}")
+        LOGGER.debug("", exc_info=True)
+
+    return DatasetResult(
+        dataset=str(bids_dir),
+        output_dir=str(output_dir),
+        wall_time=perf_counter() - start,
+        n_subjects=n_subjects,
+        n_patterns=n_patterns,
+        error=error,
+    )
+
+
+def run_batch(
+    datasets: list[Path],
+    output_dir: Path,
+    n_workers: int | None = None,
+    cache_dir: Path | None = None,
+    io_threads: int = 4,
+) -> list[DatasetResult]:
+    """Report on several datasets, each in its own output directory.
+
+    Parameters
+    ----------
+    datasets : :obj:`list` of :obj:`pathlib.Path`
+        Roots of the BIDS datasets.
+
+    output_dir : :obj:`pathlib.Path`
+        Directory containing the output directory of each dataset,
+        as returned by :func:`output_dirs`.
+
+    n_workers : :obj:`int`, optional
+        Number of processes reporting on datasets in parallel.
+        None or 1 means reporting on one dataset at a time in the current process,
+        -1 means using all processors.
+
+    cache_dir : :obj:`pathlib.Path`, optional
+        Directory where to store the caches of the datasets,
+        in subdirectories named as their output directories.
+
+    io_threads : :obj:`int`
+        Maximum number of threads used to read the image headers of a session.
+
+    Returns
+    -------
+    results : :obj:`list` of :obj:`DatasetResult`
+        Outcome of each report, in the order of ``datasets``.
+    """
+    tasks = [
+        (
+            Path(dataset).absolute(),
+            dataset_output_dir,
+            None if cache_dir is None else cache_dir / dataset_output_dir.name,
+            io_threads,
+        )
+        for dataset, dataset_output_dir in zip(
+            datasets, output_dirs(datasets, output_dir), strict=True
+        )
+    ]
+    n_workers = _effective_n_jobs(n_workers)
+    if n_workers == 1 or len(tasks) <= 1:
+        return [report_dataset(*task) for task in tasks]
+
+    with ProcessPoolExecutor(
+        max_workers=min(n_workers, len(tasks)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(LOGGER.level,),
+    ) as executor:
+        return list(executor.map(_report_dataset_worker, tasks))
+
+
+def _init_worker(log_level: int) -> None:
+    setup_logging()
+    LOGGER.setLevel(log_level)
+
+
+def _report_dataset_worker(task: tuple[Path, Path, Path | None, int]) -> DatasetResult:
+    return report_dataset(*task)
+
+
+SUMMARY_COLUMNS = ("dataset", "subjects", "patterns", "wall time (s)", "status")
+
+
+def _summary_rows(results: list[DatasetResult]) -> list[tuple[str, ...]]:
+    return [
+        (
+            Path(result.output_dir).name,
+            str(result.n_subjects),
+            str(result.n_patterns),
+            f"{result.wall_time:.2f}",
+            "ok" if result.error is None else result.error,
+        )
+        for result in results
+    ]
+
+
+def summary_table(results: list[DatasetResult]) -> str:
+    """Return the outcome of each report as a text table."""
+    rows = [SUMMARY_COLUMNS, *_summary_rows(results)]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(SUMMARY_COLUMNS) - 1)]
+    lines = [
+        "  ".join(
+            [
+                row[0].ljust(widths[0]),
+                *(cell.rjust(width) for cell, width in zip(row[1:-1], widths[1:], strict=True)),
+                row[-1],
+            ]
+        )
+        for row in rows
+    ]
+    lines.insert(1, "  ".join("-" * width for width in [*widths, len(SUMMARY_COLUMNS[-1])]))
+    n_failed = sum(result.error is not None for result in results)
+    total = sum(result.wall_time for result in results)
+    lines.append(f"{len(results)} datasets, {n_failed} failed, {total:.2f} s in total")
+    return "\n".join(lines)
+
+
+def write_summary(results: list[DatasetResult], path: Path) -> None:
+    """Write the outcome of each report to a TSV file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(DatasetResult._fields)
+        for result in results:
+            writer.writerow(
+                [
+                    result.dataset,
+                    result.output_dir,
+                    f"{result.wall_time:.3f}",
+                    result.n_subjects,
+                    result.n_patterns,
+                    "" if result.error is None else result.error,
+                ]
+            )
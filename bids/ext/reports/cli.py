@@ -3,20 +3,46 @@
 from __future__ import annotations
 
 import argparse
+import json
+import sys
+from collections import Counter
 from collections.abc import Sequence
+from contextlib import nullcontext
 from pathlib import Path
-from typing import IO
+from typing import IO, TYPE_CHECKING
 
-import rich
 from bids.ext.reports._version import __version__
-from bids.layout import BIDSLayout
 
-from bids.ext.reports import BIDSReport
-from bids.ext.reports.logger import pybids_reports_logger
+from bids.ext.reports.layout_db import load_layout
+from bids.ext.reports.logger import pybids_reports_logger, setup_logging
+from bids.ext.reports.nifti import HEADER_CACHE_FILENAME, HeaderCache
+from bids.ext.reports.output import write_report
+from bids.ext.reports.profiling import Profiler
+from bids.ext.reports.shards import (
+    SHARD_FILENAME,
+    merge_patterns,
+    parse_shard,
+    read_patterns,
+    shard_subjects,
+    write_patterns,
+)
 
-# from bids.reports import BIDSReport
+if TYPE_CHECKING:
+    from bids.ext.reports import BIDSReport
+
+# BIDSReport, rich and their dependencies are imported when they are first used,
+# so that '--help' and '--version' return quickly.
 LOGGER = pybids_reports_logger()
 
+MANIFESTS_DIRNAME = "manifests"
+SUBJECTS_FILENAME = "subjects.jsonl"
+PATTERNS_FILENAME = "patterns.json"
+PROFILE_FILENAME = "profile.json"
+SUMMARY_FILENAME = "batch_summary.tsv"
+
+# Subcommands, selected by the first argument unless it is an existing path.
+SUBCOMMANDS = ("merge", "batch", "serve")
+
 
 def _path_exists(path, parser):
     """Ensure a given path exists."""
@@ -26,8 +52,18 @@ def _path_exists(path, parser):
     return Path(path).absolute()
 
 
+def _shard(shard: str) -> tuple[int, int]:
+    """Parse a shard specification."""
+    try:
+        return parse_shard(shard)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+
+
 class MuhParser(argparse.ArgumentParser):
     def _print_message(self, message: str, file: IO[str] | None = None) -> None:
+        import rich
+
         rich.print(message, file=file)
 
 
@@ -38,6 +74,11 @@ def base_parser() -> MuhParser:
         prog="pybids_reports",
         description="Report generator for BIDS datasets.",
         epilog="""
+        Subcommands: 'pybids_reports merge' combines the files written with '--shard',
+        'pybids_reports batch' reports on many datasets,
+        'pybids_reports serve' answers report requests on datasets kept in memory.
+        Run them with '--help' for their options.
+        A dataset directory named after a subcommand is not mistaken for it.
         For a more readable version of this help section,
         see the online doc https://cohort-creator.readthedocs.io/en/latest/
         """,
@@ -67,10 +108,117 @@ The label corresponds to sub-<participant_label> from the BIDS spec
 
 If this parameter is not provided, The first subject will be used.
 Multiple participants can be specified with a space separated list.
+Only the directories of these participants are indexed,
+along with the files at the top level of the dataset.
         """,
         nargs="+",
         default=None,
     )
+    parser.add_argument(
+        "--n-jobs",
+        action="store",
+        type=int,
+        default=1,
+        help="Number of processes used to report on subjects in parallel. "
+        "-1 means using all processors.",
+    )
+    parser.add_argument(
+        "--io-threads",
+        action="store",
+        type=int,
+        default=4,
+        help="Maximum number of threads used to read the image headers of a session. "
+        "Lower it to reduce the load on network file systems.",
+    )
+    parser.add_argument(
+        "--no-image-io",
+        dest="image_io",
+        action="store_false",
+        help="""\
+Do not read the images, only their sidecar metadata and file names.
+Much faster on large datasets, but the matrix size, voxel size, field of view
+and number of volumes are only reported when the metadata gives them.
+        """,
+    )
+    parser.add_argument(
+        "--header-cache",
+        action="store_true",
+        help="""\
+Cache the headers of the images in a SQLite file,
+so they do not have to be read again in later runs
+as long as the images are not modified.
+The cache is stored in the output directory,
+unless a different location is given with '--cache-dir'.
+        """,
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"""\
+Store the description of each participant along with a manifest of its files,
+and only report again on the participants whose files changed since the previous run.
+The manifests are stored in a '{MANIFESTS_DIRNAME}' directory
+in the output directory, unless a different location is given with '--cache-dir'.
+        """,
+    )
+    parser.add_argument(
+        "--cache-dir",
+        action="store",
+        type=Path,
+        default=None,
+        help="Directory where to store the cache. Implies '--header-cache'.",
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help=f"""\
+Write the description of each participant to '{SUBJECTS_FILENAME}'
+in the output directory, one JSON object per line,
+as soon as the participant is done.
+With '--shard', the shard is added to the name of the file.
+        """,
+    )
+    parser.add_argument(
+        "--shard",
+        action="store",
+        type=_shard,
+        default=None,
+        metavar="i/N",
+        help=f"""\
+Only report on the i-th of N disjoint subsets of the participants,
+with i from 0 to N-1.
+The patterns found and their participants are written
+to '{SHARD_FILENAME.format(index="i", count="N")}' in the output directory
+instead of the report.
+Combine the files of all shards with 'pybids_reports merge'.
+        """,
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"""\
+Measure the time spent in each stage of the report, per datatype,
+print it as a table and write it to '{PROFILE_FILENAME}' in the output directory.
+With '--shard', the shard is added to the name of the file.
+        """,
+    )
+    parser.add_argument(
+        "--layout-db",
+        action="store",
+        type=Path,
+        default=None,
+        help="""\
+Directory where to store the database of the dataset index,
+so that the dataset does not have to be indexed again in later runs.
+The database is reused as long as the content of dataset_description.json
+and the modification times of the dataset directories do not change.
+        """,
+    )
+    parser.add_argument(
+        "--reset-db",
+        action="store_true",
+        help="Index the dataset again and overwrite the database given with '--layout-db'.",
+    )
     parser.add_argument(
         "-v",
         "--version",
@@ -89,7 +237,192 @@ Multiple participants can be specified with a space separated list.
     return parser
 
 
+def merge_parser() -> MuhParser:
+    from functools import partial
+
+    parser = MuhParser(
+        prog="pybids_reports merge",
+        description="Merge the results of runs with '--shard' into a single report.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+
+    PathExists = partial(_path_exists, parser=parser)
+
+    parser.add_argument(
+        "output_dir",
+        action="store",
+        type=Path,
+        help="Output path.",
+    )
+    parser.add_argument(
+        "shard_files",
+        action="store",
+        type=PathExists,
+        nargs="+",
+        help="Files written by the runs with '--shard'.",
+    )
+    parser.add_argument(
+        "--verbosity",
+        required=False,
+        choices=[0, 1, 2, 3],
+        default=2,
+        type=int,
+        nargs=1,
+        help="Verbosity level.",
+    )
+    return parser
+
+
+def batch_parser() -> MuhParser:
+    from functools import partial
+
+    parser = MuhParser(
+        prog="pybids_reports batch",
+        description="Report on many datasets in a single process.",
+        epilog=f"""
+        The report of each dataset is written to a subdirectory of the output directory
+        named after the dataset, and the outcome of each report to '{SUMMARY_FILENAME}'.
+        """,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+
+    PathExists = partial(_path_exists, parser=parser)
+
+    parser.add_argument(
+        "output_dir",
+        action="store",
+        type=Path,
+        help="Output path.",
+    )
+    parser.add_argument(
+        "bids_dirs",
+        action="store",
+        type=PathExists,
+        nargs="*",
+        help="Paths to BIDS datasets.",
+    )
+    parser.add_argument(
+        "--datasets-file",
+        action="store",
+        type=PathExists,
+        default=None,
+        help="""\
+File listing the paths to BIDS datasets, one per line,
+in addition to the datasets given as arguments.
+Relative paths are relative to the directory of the file.
+        """,
+    )
+    parser.add_argument(
+        "--n-workers",
+        action="store",
+        type=int,
+        default=1,
+        help="Number of processes reporting on datasets in parallel. "
+        "-1 means using all processors.",
+    )
+    parser.add_argument(
+        "--io-threads",
+        action="store",
+        type=int,
+        default=4,
+        help="Maximum number of threads used to read the image headers of a session.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        action="store",
+        type=Path,
+        default=None,
+        help="""\
+Directory where to store the image header cache and the database of the index
+of each dataset, so that later batches can reuse them.
+        """,
+    )
+    parser.add_argument(
+        "--verbosity",
+        required=False,
+        choices=[0, 1, 2, 3],
+        default=1,
+        type=int,
+        nargs=1,
+        help="Verbosity level.",
+    )
+    return parser
+
+
+def serve_parser() -> MuhParser:
+    from functools import partial
+
+    parser = MuhParser(
+        prog="pybids_reports serve",
+        description="Keep datasets indexed and answer report requests over HTTP.",
+        epilog="""
+        Routes: GET /datasets, POST /datasets with {"name": ..., "path": ...},
+        GET and DELETE /datasets/NAME,
+        GET /datasets/NAME/report?subject=...&session=...&datatype=...,
+        POST /datasets/NAME/invalidate.
+        """,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+
+    PathExists = partial(_path_exists, parser=parser)
+
+    parser.add_argument(
+        "bids_dirs",
+        action="store",
+        type=PathExists,
+        nargs="*",
+        help="Paths to BIDS datasets to register, named after their directory.",
+    )
+    parser.add_argument(
+        "--port",
+        action="store",
+        type=int,
+        default=8765,
+        help="Port of the local host to listen to.",
+    )
+    parser.add_argument(
+        "--socket",
+        action="store",
+        type=Path,
+        default=None,
+        help="Path of a Unix socket to listen to instead of a port.",
+    )
+    parser.add_argument(
+        "--check-interval",
+        action="store",
+        type=float,
+        default=1.0,
+        help="""\
+Minimum number of seconds between two checks of whether a dataset changed,
+in which case it is indexed again before answering.
+A check compares the modification times of the directories and files of the dataset,
+so sidecars edited in place are noticed.
+A negative value disables the checks:
+datasets are then only indexed again on 'POST /datasets/NAME/invalidate'.
+        """,
+    )
+    parser.add_argument(
+        "--io-threads",
+        action="store",
+        type=int,
+        default=4,
+        help="Maximum number of threads used to read the image headers of a session.",
+    )
+    parser.add_argument(
+        "--verbosity",
+        required=False,
+        choices=[0, 1, 2, 3],
+        default=2,
+        type=int,
+        nargs=1,
+        help="Verbosity level.",
+    )
+    return parser
+
+
 def set_verbosity(verbosity: int | list[int]) -> None:
+    setup_logging()
+
     if isinstance(verbosity, list):
         verbosity = verbosity[0]
 
@@ -105,6 +438,12 @@ def set_verbosity(verbosity: int | list[int]) -> None:
 
 def cli(args: Sequence[str] | None = None, namespace=None) -> None:
     """Entry point."""
+    args = sys.argv[1:] if args is None else list(args)
+    if args and args[0] in SUBCOMMANDS and not Path(args[0]).exists():
+        subcommands = {"merge": merge, "batch": batch, "serve": serve}
+        subcommands[args[0]](args[1:], namespace)
+        return
+
     parser = base_parser()
     opts = parser.parse_args(args, namespace)
 
@@ -116,18 +455,180 @@ def cli(args: Sequence[str] | None = None, namespace=None) -> None:
 
     LOGGER.debug(bids_dir)
 
-    layout = BIDSLayout(bids_dir)
+    if opts.shard is not None:
+        index, count = opts.shard
+        subjects = participant_label or sorted(
+            path.name[len("sub-") :] for path in bids_dir.glob("sub-*") if path.is_dir()
+        )
+        participant_label = shard_subjects(subjects, index, count)
+        LOGGER.info(f"Shard {index}/{count}: {len(participant_label)} participants.")
+        shard_file = output_dir / SHARD_FILENAME.format(index=index, count=count)
+        if not participant_label:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            write_patterns({}, shard_file, shard=opts.shard)
+            return
+
+    profiler = Profiler() if opts.profile else nullcontext()
+    with profiler:
+        # only index the directories of the selected participants
+        layout = load_layout(
+            bids_dir,
+            database_path=opts.layout_db,
+            reset_database=opts.reset_db,
+            participant_label=participant_label,
+        )
+
+        cache_dir = (opts.cache_dir or output_dir).absolute()
+        header_cache = None
+        if opts.header_cache or opts.cache_dir:
+            header_cache = HeaderCache(cache_dir / HEADER_CACHE_FILENAME)
 
-    report = BIDSReport(layout)
-    if participant_label:
-        counter = report.generate(subject=participant_label)
-    else:
-        counter = report.generate()
+        from bids.ext.reports import BIDSReport
 
-    common_patterns = counter.most_common()
-    if not common_patterns:
-        LOGGER.warning("No common patterns found.")
-    else:
+        report = BIDSReport(
+            layout,
+            header_cache=header_cache,
+            io_threads=opts.io_threads,
+            manifest_dir=cache_dir / MANIFESTS_DIRNAME if opts.incremental else None,
+            image_io=opts.image_io,
+        )
+        filters = {"subject": participant_label} if participant_label else {}
+        if opts.jsonl:
+            subjects_file = output_dir / SUBJECTS_FILENAME
+            if opts.shard is not None:
+                subjects_file = _shard_output(shard_file, SUBJECTS_FILENAME)
+            counter = stream_subjects(report, subjects_file, n_jobs=opts.n_jobs, **filters)
+        else:
+            counter = report.generate(n_jobs=opts.n_jobs, **filters)
+
+    if isinstance(profiler, Profiler):
+        profile_file = output_dir / PROFILE_FILENAME
+        if opts.shard is not None:
+            profile_file = _shard_output(shard_file, PROFILE_FILENAME)
+        write_profile(profiler, profile_file)
+
+    if header_cache is not None:
+        header_cache.close()
+        LOGGER.info(
+            f"Image header cache: {header_cache.reused} entries reused, "
+            f"{header_cache.refreshed} refreshed."
+        )
+
+    if opts.shard is not None:
         output_dir.mkdir(parents=True, exist_ok=True)
-        with open(output_dir / "report.txt", "w") as f:
-            f.write(str(counter.most_common()[0][0]))
+        write_patterns(report.patterns, shard_file, shard=opts.shard)
+        return
+
+    write_report(counter, output_dir)
+
+
+def _shard_output(shard_file: Path, filename: str) -> Path:
+    """Return the path of an output file specific to a shard."""
+    stem, suffix = filename.split(".")
+    return shard_file.with_name(shard_file.name.replace("report", stem)).with_suffix(f".{suffix}")
+
+
+def write_profile(profiler: Profiler, profile_file: Path) -> None:
+    """Write the timings of a report to a JSON file and print them as a table."""
+    profile_file.parent.mkdir(parents=True, exist_ok=True)
+    profile_file.write_text(json.dumps(profiler.summary(), indent=2))
+    LOGGER.info(f"Time spent in each stage written to {profile_file}")
+    # printed without the log handler, which wraps long lines
+    print(profiler.table(), file=sys.stderr)
+
+
+def stream_subjects(
+    report: BIDSReport, subjects_file: Path, n_jobs: int | None = None, **kwargs
+) -> Counter[str]:
+    """Write the description of each subject to a JSONL file as soon as it is done."""
+    subjects_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(subjects_file, "w") as f:
+        for subject_report in report.iter_subjects(n_jobs=n_jobs, **kwargs):
+            f.write(json.dumps(subject_report.to_dict()) + "\n")
+            # let other tools read the results while the report is running
+            f.flush()
+
+    counter = Counter({desc: len(subs) for desc, subs in report.patterns.items()})
+    LOGGER.info(f"Number of patterns detected: {len(counter.keys())}")
+    return counter
+
+
+def merge(args: Sequence[str] | None = None, namespace=None) -> None:
+    """Entry point of the merge subcommand."""
+    parser = merge_parser()
+    opts = parser.parse_args(args, namespace)
+
+    set_verbosity(opts.verbosity)
+
+    patterns = merge_patterns(read_patterns(shard_file) for shard_file in opts.shard_files)
+    LOGGER.info(f"Number of patterns detected: {len(patterns)}")
+
+    output_dir = opts.output_dir.absolute()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    write_patterns(patterns, output_dir / PATTERNS_FILENAME)
+    write_report(Counter({desc: len(subs) for desc, subs in patterns.items()}), output_dir)
+
+
+def batch(args: Sequence[str] | None = None, namespace=None) -> None:
+    """Entry point of the batch subcommand.
+
+    Exits with status 1 if the report on any dataset failed.
+    """
+    parser = batch_parser()
+    opts = parser.parse_args(args, namespace)
+
+    datasets = list(opts.bids_dirs)
+    if opts.datasets_file is not None:
+        from bids.ext.reports.batch import read_dataset_list
+
+        datasets += read_dataset_list(opts.datasets_file)
+    if not datasets:
+        parser.error("No dataset given.")
+
+    set_verbosity(opts.verbosity)
+
+    from bids.ext.reports.batch import run_batch, summary_table, write_summary
+
+    output_dir = opts.output_dir.absolute()
+    results = run_batch(
+        datasets,
+        output_dir,
+        n_workers=opts.n_workers,
+        cache_dir=None if opts.cache_dir is None else opts.cache_dir.absolute(),
+        io_threads=opts.io_threads,
+    )
+    write_summary(results, output_dir / SUMMARY_FILENAME)
+    # printed without the log handler, which wraps long lines
+    print(summary_table(results), file=sys.stderr)
+
+    if any(result.error is not None for result in results):
+        sys.exit(1)
+
+
+def serve(args: Sequence[str] | None = None, namespace=None) -> None:
+    """Entry point of the serve subcommand."""
+    parser = serve_parser()
+    opts = parser.parse_args(args, namespace)
+
+    set_verbosity(opts.verbosity)
+
+    from bids.ext.reports.batch import output_dirs
+    from bids.ext.reports.server import ReportServer, make_http_server
+
+    reports = ReportServer(io_threads=opts.io_threads, check_interval=opts.check_interval)
+    for bids_dir, name_dir in zip(
+        opts.bids_dirs, output_dirs(opts.bids_dirs, Path()), strict=True
+    ):
+        reports.register(name_dir.name, bids_dir)
+
+    server = make_http_server(reports, port=opts.port, socket_path=opts.socket)
+    LOGGER.info(
+        f"Serving {len(reports.datasets)} datasets on "
+        + (str(opts.socket) if opts.socket else f"http://127.0.0.1:{server.server_address[1]}")
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,232 @@
+"""Limit and reuse the indexing of a BIDSLayout.
+
+Indexing a large dataset with :class:`bids.layout.BIDSLayout` can take minutes.
+:func:`load_layout` only indexes the directories of the requested participants.
+pybids can also store the index in a SQLite database with ``database_path``,
+but never checks whether the dataset changed since it was indexed.
+:func:`load_layout` stores a fingerprint of the dataset along with the database
+and only reuses the database while the fingerprint still matches.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+import bids
+from bids.layout import BIDSLayout, BIDSLayoutIndexer
+
+from . import profiling
+from .logger import pybids_reports_logger
+
+LOGGER = pybids_reports_logger()
+
+FINGERPRINT_FILENAME = "pybids_reports_fingerprint.json"
+
+# Levels of directories below the subject directories whose modification times
+# are part of the fingerprint: sessions and datatypes.
+SUBJECT_TREE_DEPTH = 2
+
+# Top-level directories not indexed when indexing only some participants.
+SKIPPED_DIRECTORIES = ("code", "derivatives", "models", "sourcedata", "stimuli")
+
+
+def participant_ignore_patterns(participant_label: Sequence[str]) -> list[re.Pattern[str]]:
+    """Return the patterns to ignore all directories but those of some participants.
+
+    Files at the top level of the dataset are still indexed.
+    The patterns are meant for the ``ignore`` parameter of
+    :class:`bids.layout.BIDSLayoutIndexer`,
+    which matches them against paths relative to the root of the dataset.
+
+    Parameters
+    ----------
+    participant_label : :obj:`list` of :obj:`str`
+        Labels of the participants to index, without the ``sub-`` prefix.
+    """
+    labels = "|".join(re.escape(label) for label in sorted(set(participant_label)))
+    return [
+        re.compile(rf"^/({'|'.join(SKIPPED_DIRECTORIES)})(/|$)"),
+        re.compile(rf"^/sub-(?!({labels})(/|$))"),
+    ]
+
+
+def tree_fingerprint(
+    bids_dir: str | Path,
+    participant_label: Sequence[str] | None = None,
+    files: bool = False,
+    **layout_kwargs: Any,
+) -> str:
+    """Compute a fingerprint of the layout of a BIDS dataset.
+
+    The fingerprint is based on the content of ``dataset_description.json``
+    and on the modification times of the top-level directories,
+    of the subject directories and of their sessions and datatypes directories.
+    Adding, removing or renaming files changes the modification time
+    of the directory containing them, but editing a file in place does not,
+    so use ``reset_database`` in :func:`load_layout` after such changes,
+    or include the files in the fingerprint.
+
+    Parameters
+    ----------
+    bids_dir : :obj:`str` or :obj:`pathlib.Path`
+        Root of the BIDS dataset.
+
+    participant_label : :obj:`list` of :obj:`str`, optional
+        Labels of the indexed participants.
+        Only their directories are part of the fingerprint.
+        If None, all participants are indexed.
+
+    files : :obj:`bool`
+        Also include the modification times of the files at the top level
+        and in the directories of the subjects, e.g. of sidecars edited in place.
+        This stats every file of the dataset.
+
+    layout_kwargs
+        Options used to index the dataset, also part of the fingerprint.
+
+    Returns
+    -------
+    fingerprint : :obj:`str`
+        Hexadecimal digest.
+    """
+    bids_dir = Path(bids_dir).absolute()
+    digest = hashlib.sha256()
+    digest.update(str(bids_dir).encode())
+    digest.update(bids.__version__.encode())
+    digest.update(json.dumps(layout_kwargs, sort_keys=True, default=repr).encode())
+    subjects = None if participant_label is None else {f"sub-{p}" for p in participant_label}
+    digest.update(json.dumps(None if subjects is None else sorted(subjects)).encode())
+
+    description = bids_dir / "dataset_description.json"
+    if description.exists():
+        digest.update(description.read_bytes())
+
+    for path, mtime_ns in _directory_mtimes(bids_dir, subjects, files):
+        digest.update(f"{path}\0{mtime_ns}\0".encode())
+
+    return digest.hexdigest()
+
+
+def _directory_mtimes(
+    bids_dir: Path, subjects: set[str] | None, files: bool = False
+) -> list[tuple[str, int]]:
+    """List the modification times of the directories, and files, included in the fingerprint."""
+    mtimes = [(".", bids_dir.stat().st_mtime_ns)]
+    for entry in sorted(os.scandir(bids_dir), key=lambda entry: entry.name):
+        if entry.name.startswith("."):
+            continue
+        if not entry.is_dir():
+            if files:
+                mtimes.append((entry.name, entry.stat().st_mtime_ns))
+            continue
+        if entry.name.startswith("sub-") and subjects is not None and entry.name not in subjects:
+            continue
+        mtimes.append((entry.name, entry.stat().st_mtime_ns))
+        if entry.name.startswith("sub-"):
+            mtimes += _subdirectory_mtimes(Path(entry.path), entry.name, SUBJECT_TREE_DEPTH, files)
+    return mtimes
+
+
+def _subdirectory_mtimes(
+    directory: Path, relpath: str, depth: int, files: bool = False
+) -> list[tuple[str, int]]:
+    if depth == 0 and not files:
+        return []
+    mtimes = []
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        entry_relpath = f"{relpath}/{entry.name}"
+        if not entry.is_dir():
+            if files:
+                mtimes.append((entry_relpath, entry.stat().st_mtime_ns))
+        elif depth > 0:
+            mtimes.append((entry_relpath, entry.stat().st_mtime_ns))
+            mtimes += _subdirectory_mtimes(Path(entry.path), entry_relpath, depth - 1, files)
+    return mtimes
+
+
+def load_layout(
+    bids_dir: str | Path,
+    database_path: str | Path | None = None,
+    reset_database: bool = False,
+    participant_label: Sequence[str] | None = None,
+    **layout_kwargs: Any,
+) -> BIDSLayout:
+    """Create a BIDSLayout, reusing its database if the dataset did not change.
+
+    Parameters
+    ----------
+    bids_dir : :obj:`str` or :obj:`pathlib.Path`
+        Root of the BIDS dataset.
+
+    database_path : :obj:`str` or :obj:`pathlib.Path`, optional
+        Directory where to store the database of the layout.
+        If None, the dataset is indexed in memory.
+
+    reset_database : :obj:`bool`
+        Index the dataset again even if the fingerprint of the stored database matches.
+
+    participant_label : :obj:`list` of :obj:`str`, optional
+        Labels of the participants to index, without the ``sub-`` prefix.
+        The directories of the other participants
+        and the directories listed in :data:`SKIPPED_DIRECTORIES` are not indexed.
+        If None, all participants are indexed.
+
+    layout_kwargs
+        Keyword arguments passed to :class:`bids.layout.BIDSLayout`.
+
+    Returns
+    -------
+    layout : :obj:`bids.layout.BIDSLayout`
+    """
+    indexer = None
+    if participant_label:
+        indexer = BIDSLayoutIndexer(
+            validate=layout_kwargs.get("validate", True),
+            ignore=participant_ignore_patterns(participant_label),
+        )
+
+    if database_path is None:
+        with profiling.timer("index"):
+            return BIDSLayout(bids_dir, indexer=indexer, **layout_kwargs)
+
+    database_path = Path(database_path).absolute()
+    fingerprint_file = database_path / FINGERPRINT_FILENAME
+    fingerprint = tree_fingerprint(bids_dir, participant_label or None, **layout_kwargs)
+
+    stored_fingerprint = None
+    if fingerprint_file.exists():
+        stored_fingerprint = json.loads(fingerprint_file.read_text()).get("fingerprint")
+
+    if reset_database:
+        LOGGER.info("Indexing the dataset again as requested.")
+    elif stored_fingerprint is None:
+        reset_database = True
+        LOGGER.info(f"Indexing the dataset in {database_path}.")
+    elif stored_fingerprint != fingerprint:
+        reset_database = True
+        LOGGER.info("The dataset changed since it was indexed: indexing it again.")
+    else:
+        LOGGER.info(f"Reusing the layout database in {database_path}.")
+
+    if reset_database:
+        # remove the fingerprint first, so an interrupted indexing is not reused
+        fingerprint_file.unlink(missing_ok=True)
+
+    with profiling.timer("index"):
+        layout = BIDSLayout(
+            bids_dir,
+            database_path=database_path,
+            reset_database=reset_database,
+            indexer=indexer,
+            **layout_kwargs,
+        )
+
+    if reset_database:
+        fingerprint_file.write_text(json.dumps({"fingerprint": fingerprint}))
+    return layout
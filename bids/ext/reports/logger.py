@@ -3,11 +3,23 @@
 from __future__ import annotations
 
 import logging
+from functools import cache
 
-from rich.logging import RichHandler
 
+def pybids_reports_logger(log_level: str = "INFO") -> logging.Logger:  # noqa: ARG001
+    """Return the logger of the package.
+
+    Its handler is only set up by :func:`setup_logging`,
+    so that importing the package does not import rich.
+    """
+    return logging.getLogger("pybids_reports")
+
+
+@cache
+def setup_logging(log_level: str = "INFO") -> None:
+    """Log to the console with rich, unless logging was already configured."""
+    from rich.logging import RichHandler
 
-def pybids_reports_logger(log_level: str = "INFO") -> logging.Logger:
     FORMAT = "%(message)s"
 
     logging.basicConfig(
@@ -16,5 +28,3 @@ def pybids_reports_logger(log_level: str = "INFO") -> logging.Logger:
         datefmt="[%X]",
         handlers=[RichHandler()],
     )
-
-    return logging.getLogger("pybids_reports")
@@ -0,0 +1,174 @@
+"""Store the report of each subject along with a manifest of its files.
+
+A later report can reuse the report of a subject
+as long as the manifest of the subject did not change.
+
+The manifest of a subject lists the sizes and modification times of its files
+and the hashes of its JSON sidecars.
+It also includes a key common to all subjects of a report,
+computed from the version of the package, the configuration of the report
+and the top-level sidecars of the dataset, which are inherited by all subjects.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from bids.layout import BIDSFile
+
+from .utils import FileRecord
+
+MANIFEST_VERSION = 1
+
+
+def _sha256(path: str | Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def report_key(
+    root: str | Path, config: dict[str, Any], separator: str, image_io: bool = True
+) -> str:
+    """Compute the part of the manifests common to all subjects of a report.
+
+    Parameters
+    ----------
+    root : :obj:`str` or :obj:`pathlib.Path`
+        Root of the BIDS dataset.
+
+    config : :obj:`dict`
+        Configuration info for methods generation.
+
+    separator : :obj:`str`
+        String used to join the paragraphs of a subject description.
+
+    image_io : :obj:`bool`
+        Whether the headers of the images are read.
+
+    Returns
+    -------
+    key : :obj:`str`
+        Hexadecimal digest.
+    """
+    # Imported here to avoid a circular import
+    from . import __version__
+
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [MANIFEST_VERSION, __version__, config, separator, image_io], sort_keys=True
+        ).encode()
+    )
+    for sidecar in sorted(Path(root).glob("*.json")):
+        digest.update(f"{sidecar.name}\0{_sha256(sidecar)}\0".encode())
+    return digest.hexdigest()
+
+
+def subject_manifest(
+    root: str | Path,
+    subject: str,
+    sessions: dict[str | None, list[BIDSFile]] | dict[str | None, list[FileRecord]],
+    key: str,
+) -> dict[str, Any]:
+    """Describe the files a subject description depends on.
+
+    Parameters
+    ----------
+    root : :obj:`str` or :obj:`pathlib.Path`
+        Root of the BIDS dataset.
+
+    subject : :obj:`str`
+        Subject ID.
+
+    sessions : :obj:`dict`
+        Data files of the subject used in the report, grouped by session.
+
+    key : :obj:`str`
+        Key returned by :func:`report_key`.
+
+    Returns
+    -------
+    manifest : :obj:`dict`
+        The selected data files,
+        the size and modification time of the files in the subject directory,
+        and the hashes of the JSON sidecars of the subject.
+        Sidecars are compared by content only,
+        so that touching them does not invalidate the manifest.
+    """
+    root = Path(root)
+    files = {}
+    sidecars = {}
+    for dirpath, dirnames, filenames in os.walk(root / f"sub-{subject}"):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = Path(dirpath) / filename
+            relpath = path.relative_to(root).as_posix()
+            if filename.endswith(".json"):
+                sidecars[relpath] = _sha256(path)
+            else:
+                stat = path.stat()
+                files[relpath] = [stat.st_size, stat.st_mtime_ns]
+
+    return {
+        "key": key,
+        "data_files": {
+            str(ses): sorted(Path(f.path).relative_to(root).as_posix() for f in data_files)
+            for ses, data_files in sessions.items()
+        },
+        "files": files,
+        "sidecars": sidecars,
+    }
+
+
+def _manifest_file(manifest_dir: str | Path, subject: str) -> Path:
+    return Path(manifest_dir) / f"sub-{subject}.json"
+
+
+def load_subject_report(
+    manifest_dir: str | Path, subject: str, manifest: dict[str, Any] | None = None
+) -> dict[str, Any] | None:
+    """Return the stored report of a subject if its manifest did not change.
+
+    Parameters
+    ----------
+    manifest_dir : :obj:`str` or :obj:`pathlib.Path`
+        Directory where the reports are stored.
+
+    subject : :obj:`str`
+        Subject ID.
+
+    manifest : :obj:`dict`, optional
+        Current manifest of the subject, as returned by :func:`subject_manifest`.
+        If None, the stored report is returned without checking its manifest.
+
+    Returns
+    -------
+    report : :obj:`dict` or None
+        Report as returned by :meth:`~bids.ext.reports.report.SubjectReport.to_dict`,
+        or None if there is no stored report or if the manifest changed.
+    """
+    manifest_file = _manifest_file(manifest_dir, subject)
+    if not manifest_file.exists():
+        return None
+    try:
+        stored = json.loads(manifest_file.read_text())
+    except json.JSONDecodeError:
+        return None
+    if manifest is not None and stored.get("manifest") != manifest:
+        return None
+    return stored.get("report")
+
+
+def save_subject_report(
+    manifest_dir: str | Path, subject: str, report: dict[str, Any], manifest: dict[str, Any]
+) -> None:
+    """Store the report of a subject along with its manifest."""
+    manifest_file = _manifest_file(manifest_dir, subject)
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first, so an interrupted run leaves no partial manifest
+    tmp_file = manifest_file.with_suffix(".tmp")
+    tmp_file.write_text(json.dumps({"manifest": manifest, "report": report}))
+    tmp_file.replace(manifest_file)
@@ -0,0 +1,269 @@
+"""Read the information needed for the reports from NIfTI headers.
+
+Only the first 348 (NIfTI-1) or 540 (NIfTI-2) bytes of a file are read,
+so that the image data never has to be opened nor decompressed.
+
+The headers can also be cached on disk with :class:`HeaderCache`
+to avoid reading them again in later runs.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import sqlite3
+import struct
+import threading
+from os import PathLike
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+# Name of the header cache file in the cache directory of a dataset.
+HEADER_CACHE_FILENAME = "header_cache.sqlite"
+
+NIFTI1_HEADER_SIZE = 348
+NIFTI2_HEADER_SIZE = 540
+
+
+class NiftiHeader:
+    """Compact record of the header fields used in the reports.
+
+    Parameters
+    ----------
+    shape : :obj:`tuple` of :obj:`int`
+        Number of voxels along each dimension.
+
+    zooms : :obj:`tuple` of :obj:`float`
+        Size of the voxels along each dimension.
+
+    datatype : :obj:`int`
+        NIfTI datatype code of the image data.
+    """
+
+    __slots__ = ("datatype", "shape", "zooms")
+
+    def __init__(self, shape: tuple[int, ...], zooms: tuple[float, ...], datatype: int):
+        self.shape = shape
+        self.zooms = zooms
+        self.datatype = datatype
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}("
+            f"shape={self.shape}, zooms={self.zooms}, datatype={self.datatype})"
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, NiftiHeader):
+            return NotImplemented
+        return (self.shape, self.zooms, self.datatype) == (
+            other.shape,
+            other.zooms,
+            other.datatype,
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.shape, self.zooms, self.datatype))
+
+
+def read_nifti_header(path: str | PathLike[str]) -> NiftiHeader:
+    """Read the shape, voxel size and datatype of a NIfTI-1 or NIfTI-2 file.
+
+    Parameters
+    ----------
+    path : :obj:`str` or :obj:`os.PathLike`
+        Path to a ``.nii`` or ``.nii.gz`` file.
+
+    Returns
+    -------
+    header : :obj:`NiftiHeader`
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist.
+    ValueError
+        If the file is not a valid NIfTI file.
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    try:
+        with opener(path, "rb") as fobj:
+            raw = fobj.read(NIFTI1_HEADER_SIZE)
+            if len(raw) == NIFTI1_HEADER_SIZE and _header_size(raw) == NIFTI2_HEADER_SIZE:
+                raw += fobj.read(NIFTI2_HEADER_SIZE - NIFTI1_HEADER_SIZE)
+    except (gzip.BadGzipFile, EOFError) as exc:
+        raise ValueError(f"Could not read NIfTI header of {path}: {exc}") from exc
+
+    if len(raw) < NIFTI1_HEADER_SIZE:
+        raise ValueError(f"File too short to be a NIfTI file: {path}")
+
+    header_size = _header_size(raw)
+    if header_size == NIFTI1_HEADER_SIZE:
+        return _parse_nifti1(raw)
+    if header_size == NIFTI2_HEADER_SIZE and len(raw) == NIFTI2_HEADER_SIZE:
+        return _parse_nifti2(raw)
+    raise ValueError(f"Not a NIfTI file: {path}")
+
+
+def _endianness(raw: bytes, expected: int) -> str | None:
+    for endian in ("<", ">"):
+        if struct.unpack_from(f"{endian}i", raw, 0)[0] == expected:
+            return endian
+    return None
+
+
+def _header_size(raw: bytes) -> int | None:
+    for size in (NIFTI1_HEADER_SIZE, NIFTI2_HEADER_SIZE):
+        if _endianness(raw, size) is not None:
+            return size
+    return None
+
+
+def _parse_nifti1(raw: bytes) -> NiftiHeader:
+    endian = _endianness(raw, NIFTI1_HEADER_SIZE)
+    dim = struct.unpack_from(f"{endian}8h", raw, 40)
+    (datatype,) = struct.unpack_from(f"{endian}h", raw, 70)
+    pixdim = struct.unpack_from(f"{endian}8f", raw, 76)
+    return _make_header(dim, pixdim, datatype)
+
+
+def _parse_nifti2(raw: bytes) -> NiftiHeader:
+    endian = _endianness(raw, NIFTI2_HEADER_SIZE)
+    (datatype,) = struct.unpack_from(f"{endian}h", raw, 12)
+    dim = struct.unpack_from(f"{endian}8q", raw, 16)
+    pixdim = struct.unpack_from(f"{endian}8d", raw, 104)
+    return _make_header(dim, pixdim, datatype)
+
+
+def _make_header(dim: tuple[int, ...], pixdim: tuple[float, ...], datatype: int) -> NiftiHeader:
+    ndim = dim[0]
+    if not 0 < ndim <= 7:
+        raise ValueError(f"Invalid number of dimensions in NIfTI header: {ndim}")
+    shape = tuple(int(d) for d in dim[1 : ndim + 1])
+    zooms = tuple(float(p) for p in pixdim[1 : ndim + 1])
+    return NiftiHeader(shape=shape, zooms=zooms, datatype=int(datatype))
+
+
+class HeaderCache:
+    """Cache of NIfTI headers, optionally persisted in a SQLite file.
+
+    Entries are keyed by path, size and modification time of the files,
+    so that a modified file is automatically read again.
+    Headers can be read from several threads,
+    but the cache must be flushed and closed from the thread that created it.
+
+    Parameters
+    ----------
+    db_file : :obj:`str` or :obj:`pathlib.Path`, optional
+        SQLite file where to persist the cache.
+        If None, the cache is only kept in memory.
+
+    Attributes
+    ----------
+    reused : :obj:`int`
+        Number of headers taken from the cache.
+    refreshed : :obj:`int`
+        Number of headers that had to be read from the files.
+    """
+
+    def __init__(self, db_file: str | Path | None = None):
+        self.db_file = None if db_file is None else Path(db_file)
+        self.reused = 0
+        self.refreshed = 0
+        self._entries: dict[str, tuple[int, int, NiftiHeader]] = {}
+        self._pending: dict[str, tuple[int, int, NiftiHeader]] = {}
+        self._connection: sqlite3.Connection | None = None
+        # headers can be read from several threads
+        self._lock = threading.Lock()
+        if self.db_file is not None:
+            self._connection = self._connect(self.db_file)
+            self._load(self._connection)
+
+    def __enter__(self) -> HeaderCache:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _connect(db_file: Path) -> sqlite3.Connection:
+        db_file.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(db_file)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS headers ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "shape TEXT, zooms TEXT, datatype INTEGER)"
+        )
+        return connection
+
+    def _load(self, connection: sqlite3.Connection) -> None:
+        rows = connection.execute(
+            "SELECT path, size, mtime_ns, shape, zooms, datatype FROM headers"
+        )
+        for path, size, mtime_ns, shape, zooms, datatype in rows:
+            header = NiftiHeader(
+                shape=tuple(json.loads(shape)), zooms=tuple(json.loads(zooms)), datatype=datatype
+            )
+            self._entries[path] = (size, mtime_ns, header)
+
+    def get(self, path: str | PathLike[str]) -> NiftiHeader:
+        """Return the header of a file, reading it only if it is not cached.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file does not exist.
+        ValueError
+            If the file is not a valid NIfTI file.
+        """
+        key = os.fspath(path)
+        stat = Path(key).stat()
+        entry = self._entries.get(key)
+        if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            with self._lock:
+                self.reused += 1
+            return entry[2]
+
+        header = read_nifti_header(key)
+        with self._lock:
+            self.refreshed += 1
+            self._entries[key] = self._pending[key] = (stat.st_size, stat.st_mtime_ns, header)
+        return header
+
+    def flush(self) -> None:
+        """Write the new entries to the SQLite file."""
+        if self._connection is None or not self._pending:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        path,
+                        size,
+                        mtime_ns,
+                        json.dumps(header.shape),
+                        json.dumps(header.zooms),
+                        header.datatype,
+                    )
+                    for path, (size, mtime_ns, header) in self._pending.items()
+                ],
+            )
+        self._pending.clear()
+
+    def close(self) -> None:
+        """Write the new entries to the SQLite file and close it."""
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
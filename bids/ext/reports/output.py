@@ -0,0 +1,23 @@
+"""Write the results of a report to its output directory."""
+
+from __future__ import annotations
+
+from collections import Counter
+from pathlib import Path
+
+from .logger import pybids_reports_logger
+
+LOGGER = pybids_reports_logger()
+
+REPORT_FILENAME = "report.txt"
+
+
+def write_report(counter: Counter[str], output_dir: Path) -> None:
+    """Write the most common pattern to the report file."""
+    common_patterns = counter.most_common()
+    if not common_patterns:
+        LOGGER.warning("No common patterns found.")
+    else:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        with open(output_dir / REPORT_FILENAME, "w") as f:
+            f.write(str(counter.most_common()[0][0]))
@@ -3,16 +3,25 @@
 from __future__ import annotations
 
 import math
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
 import numpy as np
 from bids.layout import BIDSFile, BIDSLayout
-from nibabel import Nifti1Image
 from num2words import num2words
 
 from .logger import pybids_reports_logger
-from .utils import list_to_str, num_to_str, remove_duplicates
+from .nifti import NiftiHeader
+from .utils import (
+    FilenameIndex,
+    FileRecord,
+    MetadataCache,
+    default_metadata_cache,
+    list_to_str,
+    num_to_str,
+    remove_duplicates,
+)
 
 LOGGER = pybids_reports_logger()
 
@@ -41,7 +50,7 @@ def func_duration(nb_vols: int, tr: float) -> str:
     return f"{mins}:{secs}"
 
 
-def get_nb_vols(all_imgs: list[Nifti1Image | None]) -> list[int] | None:
+def get_nb_vols(all_imgs: list[NiftiHeader | None]) -> list[int] | None:
     """Get number of volumes from list of files.
 
     If all files have the same nb of vols it will return the number of volumes,
@@ -66,7 +75,7 @@ def get_nb_vols(all_imgs: list[Nifti1Image | None]) -> list[int] | None:
     return [min_vols, max_vols]
 
 
-def nb_vols(all_imgs: list[Nifti1Image]) -> str:
+def nb_vols(all_imgs: list[NiftiHeader]) -> str:
     """Generate description of number of volumes from files."""
     nb_vols = get_nb_vols(all_imgs)
     if nb_vols is None:
@@ -74,7 +83,7 @@ def nb_vols(all_imgs: list[Nifti1Image]) -> str:
     return f"{nb_vols[0]}-{nb_vols[1]}" if len(nb_vols) > 1 else str(nb_vols[0])
 
 
-def duration(all_imgs: list[Nifti1Image], metadata: dict[str, Any]) -> str:
+def duration(all_imgs: list[NiftiHeader], metadata: dict[str, Any]) -> str:
     """Generate general description of scan length from files."""
     nb_vols = get_nb_vols(all_imgs)
     if nb_vols is None:
@@ -88,20 +97,27 @@ def duration(all_imgs: list[Nifti1Image], metadata: dict[str, Any]) -> str:
     return f"{min_dur}-{max_dur}"
 
 
-def echo_time_ms(files: list[BIDSFile]) -> str:
+def echo_time_ms(
+    files: list[BIDSFile] | list[FileRecord], metadata_cache: MetadataCache | None = None
+) -> str:
     """Generate description of echo times from metadata field.
 
     Parameters
     ----------
-    files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to file collection.
 
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+        Required for :obj:`~.utils.FileRecord` objects.
+
     Returns
     -------
     te : str
         Description of echo times.
     """
-    echo_times = [f.get_metadata().get("EchoTime", None) for f in files]
+    metadata_cache = default_metadata_cache(files, metadata_cache)
+    echo_times = [metadata_cache.get(f).get("EchoTime", None) for f in files]
     echo_times = sorted(set(echo_times))
     if echo_times == [None]:
         return "UNKNOWN"
@@ -111,20 +127,27 @@ def echo_time_ms(files: list[BIDSFile]) -> str:
     return list_to_str(te)
 
 
-def multi_echo(files: list[BIDSFile]) -> str:
+def multi_echo(
+    files: list[BIDSFile] | list[FileRecord], metadata_cache: MetadataCache | None = None
+) -> str:
     """Generate description of echo times from metadata field.
 
     Parameters
     ----------
-    files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to file collection.
 
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+        Required for :obj:`~.utils.FileRecord` objects.
+
     Returns
     -------
     multi_echo : str
         Whether the data are multi-echo or single-echo.
     """
-    echo_times = [f.get_metadata().get("EchoTime", None) for f in files]
+    metadata_cache = default_metadata_cache(files, metadata_cache)
+    echo_times = [metadata_cache.get(f).get("EchoTime", None) for f in files]
     echo_times = sorted(set(echo_times))
     if echo_times == [None]:
         return ""
@@ -132,14 +155,20 @@ def multi_echo(files: list[BIDSFile]) -> str:
     return multi_echo
 
 
-def echo_times_fmap(files: list[BIDSFile]) -> tuple[float, float]:
+def echo_times_fmap(
+    files: list[BIDSFile] | list[FileRecord], metadata_cache: MetadataCache | None = None
+) -> tuple[float, float]:
     """Generate description of echo times from metadata field for fmaps.
 
     Parameters
     ----------
-    files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to file collection.
 
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+        Required for :obj:`~.utils.FileRecord` objects.
+
     Returns
     -------
     te_str :
@@ -147,8 +176,9 @@ def echo_times_fmap(files: list[BIDSFile]) -> tuple[float, float]:
     """
     # TODO handle all types of fieldmaps
 
-    echo_times1 = [f.get_metadata()["EchoTime1"] for f in files]
-    echo_times2 = [f.get_metadata()["EchoTime2"] for f in files]
+    metadata_cache = default_metadata_cache(files, metadata_cache)
+    echo_times1 = [metadata_cache.get(f)["EchoTime1"] for f in files]
+    echo_times2 = [metadata_cache.get(f)["EchoTime2"] for f in files]
     echo_times1 = sorted(set(echo_times1))
     echo_times2 = sorted(set(echo_times2))
     if len(echo_times1) <= 1 and len(echo_times2) <= 1:
@@ -159,41 +189,205 @@ def echo_times_fmap(files: list[BIDSFile]) -> tuple[float, float]:
     return te1, te2
 
 
-def bvals(bval_file: str | Path) -> str:
-    """Generate description of dMRI b-values."""
-    # Parse bval file
+# b-values up to this value are considered as b=0, in s/mm²
+B0_THRESHOLD = 50
+
+# consecutive b-values closer than this belong to the same shell, in s/mm²
+SHELL_TOLERANCE = 50
+
+
+class GradientTable:
+    """Shells of a dMRI scan, as read from its .bval and .bvec files.
+
+    Parameters
+    ----------
+    shells : :obj:`tuple` of (:obj:`int`, :obj:`int`)
+        b-value of each shell, in increasing order, and its number of volumes.
+        The b=0 volumes, if any, form the first shell.
+
+    n_volumes : :obj:`int`
+        Number of volumes, one per b-value.
+    """
+
+    __slots__ = ("n_volumes", "shells")
+
+    def __init__(self, shells: tuple[tuple[int, int], ...], n_volumes: int):
+        self.shells = shells
+        self.n_volumes = n_volumes
+
+    @property
+    def n_directions(self) -> int:
+        """Number of diffusion-weighted volumes, across all shells."""
+        return sum(n for bval, n in self.shells if bval > 0)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(shells={self.shells}, n_volumes={self.n_volumes})"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, GradientTable):
+            return NotImplemented
+        return (self.shells, self.n_volumes) == (other.shells, other.n_volumes)
+
+    def __hash__(self) -> int:
+        return hash((self.shells, self.n_volumes))
+
+
+def cluster_shells(
+    bvals: Any, tolerance: float = SHELL_TOLERANCE, b0_threshold: float = B0_THRESHOLD
+) -> tuple[tuple[int, int], ...]:
+    """Cluster b-values into shells.
+
+    b-values are sorted, and a new shell starts wherever two consecutive values
+    differ by more than ``tolerance``, so that e.g. 995 and 1005 form a single shell.
+    b-values up to ``b0_threshold`` form the b=0 shell.
+
+    Returns
+    -------
+    shells : :obj:`tuple` of (:obj:`int`, :obj:`int`)
+        Mean b-value of each shell, rounded, and its number of volumes.
+    """
+    bvals = np.sort(np.asarray(bvals, dtype=float).ravel())
+    if bvals.size == 0:
+        return ()
+    is_b0 = bvals <= b0_threshold
+    bvals[is_b0] = 0
+    breaks = (np.diff(bvals) > tolerance) | (is_b0[1:] != is_b0[:-1])
+    labels = np.concatenate(([0], np.cumsum(breaks)))
+    counts = np.bincount(labels)
+    means = np.bincount(labels, weights=bvals) / counts
+    return tuple((round(bval), int(n)) for bval, n in zip(means, counts, strict=True))
+
+
+def read_gradients(bval_file: str | Path, bvec_file: str | Path | None = None) -> GradientTable:
+    """Read the gradient table of a dMRI scan and cluster its b-values into shells.
+
+    Volumes whose gradient direction is null in the .bvec file count as b=0.
+    The tables are cached, keyed by the path, size and modification time of the files,
+    so that the files of a scan are read once per report.
+
+    Parameters
+    ----------
+    bval_file : :obj:`str` or :obj:`pathlib.Path`
+        Path of the .bval file.
+
+    bvec_file : :obj:`str` or :obj:`pathlib.Path`, optional
+        Path of the .bvec file, next to the .bval file by default.
+        It is ignored if missing.
+
+    Raises
+    ------
+    OSError
+        If the .bval file cannot be read.
+
+    ValueError
+        If the .bval file is not a list of numbers.
+    """
+    bval_file = Path(bval_file)
+    bvec_file = bval_file.with_suffix(".bvec") if bvec_file is None else Path(bvec_file)
+    bval_stat = bval_file.stat()
+    try:
+        bvec_stat = bvec_file.stat()
+        bvec_key: tuple[int, int] | None = (bvec_stat.st_size, bvec_stat.st_mtime_ns)
+    except OSError:
+        bvec_key = None
+    return _read_gradients(
+        str(bval_file),
+        (bval_stat.st_size, bval_stat.st_mtime_ns),
+        str(bvec_file),
+        bvec_key,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _read_gradients(
+    bval_file: str,
+    bval_key: tuple[int, int],  # noqa: ARG001, only part of the cache key
+    bvec_file: str,
+    bvec_key: tuple[int, int] | None,
+) -> GradientTable:
     with open(bval_file) as file_object:
-        raw_bvals = file_object.read().splitlines()
-    # Flatten list of space-separated values
-    bvals = [item for sublist in [line.split(" ") for line in raw_bvals] for item in sublist]
-    bvals_as_int = sorted([int(v) for v in set(bvals) if v != ""])
-    bvals_as_list = [num_to_str(v) for v in bvals_as_int]
-    return list_to_str(bvals_as_list)
+        bvals = np.array(file_object.read().split(), dtype=float)
+
+    if bvec_key is not None:
+        with open(bvec_file) as file_object:
+            bvecs = np.array(file_object.read().split(), dtype=float)
+        if bvecs.size == 3 * bvals.size:
+            # one row per axis
+            norms = np.linalg.norm(bvecs.reshape(3, -1), axis=0)
+            bvals = np.where(norms > 0, bvals, 0.0)
+        else:
+            LOGGER.warning(
+                f"{Path(bvec_file).name} has {bvecs.size} values "
+                f"for {bvals.size} b-values, ignoring it."
+            )
+
+    return GradientTable(shells=cluster_shells(bvals), n_volumes=int(bvals.size))
+
+
+def bvals(bval_file: str | Path) -> str:
+    """Generate description of dMRI b-values, one per shell."""
+    shells = read_gradients(bval_file).shells
+    return list_to_str([num_to_str(bval) for bval, _ in shells])
+
+
+def intendedfor_targets(
+    metadata: dict[str, Any],
+    layout: BIDSLayout,
+    filename_index: FilenameIndex | None = None,
+    metadata_cache: MetadataCache | None = None,
+) -> str:
+    """Generate description of intended for targets.
+
+    Parameters
+    ----------
+    metadata : :obj:`dict`
+        The metadata for the scan.
 
+    layout : :obj:`bids.layout.BIDSLayout`
+        Layout object for a BIDS dataset.
 
-def intendedfor_targets(metadata: dict[str, Any], layout: BIDSLayout) -> str:
-    """Generate description of intended for targets."""
+    filename_index : :obj:`~bids.ext.reports.utils.FilenameIndex`, optional
+        Lookup table used to find the targets in the layout.
+        Pass one to share it across calls.
+
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the targets.
+
+    Returns
+    -------
+    intended_for : :obj:`str`
+        Description of the runs the scan is intended for.
+    """
     if "IntendedFor" not in metadata:
         return ""
 
     scans = metadata["IntendedFor"]
+    if isinstance(scans, str):
+        scans = [scans]
+
+    if filename_index is None:
+        filename_index = FilenameIndex(layout)
+    if metadata_cache is None:
+        metadata_cache = MetadataCache(layout=layout)
 
     tmp_dict: dict[str, list[int]] = {}
 
     for scan in scans:
-        fn = Path(scan).name
-
-        if_file = next(f for f in layout.get(extension=[".nii", ".nii.gz"]) if fn in f.path)
+        if_file = filename_index.get(scan)
+        if if_file is None:
+            LOGGER.warning(f"IntendedFor target not found: {scan}")
+            continue
 
-        target_type = if_file.entities["suffix"].upper()
+        if_entities = metadata_cache.entities(if_file)
+        target_type = if_entities["suffix"].upper()
         if target_type == "BOLD":
-            iff_meta = layout.get_metadata(if_file.path)
-            task = iff_meta.get("TaskName", if_file.entities["task"])
+            iff_meta = metadata_cache.get(if_file)
+            task = iff_meta.get("TaskName", if_entities["task"])
             target_type_str = f"{task} {target_type} scan"
         else:
             target_type_str = f"{target_type} scan"
 
-        run_num = int(if_file.entities["run"])
+        run_num = int(if_entities["run"])
         if target_type_str in tmp_dict:
             tmp_dict[target_type_str].append(run_num)
         else:
@@ -202,6 +396,8 @@ def intendedfor_targets(metadata: dict[str, Any], layout: BIDSLayout) -> str:
     run_dict: dict[str, list[str]] = {
         scan: [num2words(r, ordinal=True) for r in sorted(tmp_dict[scan])] for scan in tmp_dict
     }
+    if not run_dict:
+        return ""
 
     out_list = []
     for scan in run_dict:
@@ -308,13 +504,21 @@ def sequence(metadata: dict[str, Any], config: dict[str, dict[str, str]]) -> str
     return seqs_as_str
 
 
-def matrix_size(img: None | Nifti1Image) -> str:
+def matrix_size(img: None | NiftiHeader, metadata: dict[str, Any] | None = None) -> str:
     """Extract and reformat voxel size, matrix size, FOV, and number of slices into strings.
 
     Parameters
     ----------
-    img : :obj:`nibabel.Nifti1Image`
-        Image from scan from which to derive parameters.
+    img : :obj:`~bids.ext.reports.nifti.NiftiHeader` or None
+        Header of the scan from which to derive parameters.
+
+    metadata : :obj:`dict`, optional
+        The metadata for the scan, used if the header is not available.
+        BIDS has no field for the matrix size, so it is read from the fields
+        that dcm2niix adds to the sidecars of Siemens scans:
+        ``BaseResolution`` along the readout direction,
+        and ``ReconMatrixPE``, or else ``AcquisitionMatrixPE``,
+        along the phase encoding direction.
 
     Returns
     -------
@@ -322,18 +526,22 @@ def matrix_size(img: None | Nifti1Image) -> str:
         Matrix size string (e.g., '128x128')
     """
     if img is None:
-        return "?x?"
+        metadata = metadata or {}
+        n_pe = metadata.get("ReconMatrixPE", metadata.get("AcquisitionMatrixPE"))
+        if n_pe is None:
+            return "?x?"
+        return f"{metadata.get('BaseResolution', '?')}x{n_pe}"
     n_x, n_y = img.shape[:2]
     return f"{n_x}x{n_y}"
 
 
-def voxel_size(img: None | Nifti1Image) -> str:
+def voxel_size(img: None | NiftiHeader) -> str:
     """Extract and reformat voxel size.
 
     Parameters
     ----------
-    img : :obj:`nibabel.Nifti1Image`
-        Image from scan from which to derive parameters.
+    img : :obj:`~bids.ext.reports.nifti.NiftiHeader` or None
+        Header of the scan from which to derive parameters.
 
     Returns
     -------
@@ -342,17 +550,17 @@ def voxel_size(img: None | Nifti1Image) -> str:
     """
     if img is None:
         return "?x?x?"
-    voxel_dims = np.array(img.header.get_zooms()[:3])
+    voxel_dims = np.array(img.zooms[:3])
     return "x".join([num_to_str(s) for s in voxel_dims])
 
 
-def field_of_view(img: None | Nifti1Image) -> str:
+def field_of_view(img: None | NiftiHeader) -> str:
     """Extract and reformat FOV.
 
     Parameters
     ----------
-    img : :obj:`nibabel.Nifti1Image`
-        Image from scan from which to derive parameters.
+    img : :obj:`~bids.ext.reports.nifti.NiftiHeader` or None
+        Header of the scan from which to derive parameters.
 
     Returns
     -------
@@ -362,6 +570,6 @@ def field_of_view(img: None | Nifti1Image) -> str:
     if img is None:
         return "?x?"
     n_x, n_y = img.shape[:2]
-    voxel_dims = np.array(img.header.get_zooms()[:3])
+    voxel_dims = np.array(img.zooms[:3])
     fov = [n_x, n_y] * voxel_dims[:2]
     return "x".join([num_to_str(s) for s in fov])
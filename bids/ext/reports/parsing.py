@@ -2,37 +2,68 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from functools import partial
 from pathlib import Path
 from typing import Any
 
-import nibabel as nib
 from bids.layout import BIDSFile, BIDSLayout
-from nibabel.filebasedimages import ImageFileError
 
-from . import parameters, templates
+from . import parameters, profiling, templates
 from .logger import pybids_reports_logger
-from .utils import collect_associated_files
+from .nifti import HeaderCache, NiftiHeader, read_nifti_header
+from .utils import (
+    FilenameIndex,
+    FileRecord,
+    MetadataCache,
+    collect_associated_files,
+    default_metadata_cache,
+    file_records,
+)
 
 LOGGER = pybids_reports_logger()
 
+# Name of the template and data used to render a paragraph of a description,
+# the name is None for empty paragraphs.
+Paragraph = tuple[str | None, dict[str, Any]]
 
-def institution_info(files: list[BIDSFile]):
+# Templates named after the datatype they describe, used to profile their rendering.
+_TEMPLATE_DATATYPES = ("anat", "dwi", "fmap", "func", "meeg", "perf", "pet")
+
+
+def institution_info(
+    files: list[BIDSFile] | list[FileRecord], metadata_cache: MetadataCache | None = None
+):
+    metadata_cache = default_metadata_cache(files, metadata_cache)
     first_file = files[0]
-    metadata = first_file.get_metadata()
+    metadata = metadata_cache.get(first_file)
     if metadata.get("InstitutionName"):
         return templates.institution_info(metadata)
     else:
         return ""
 
 
-def mri_scanner_info(files: list[BIDSFile]):
+def mri_scanner_info(
+    files: list[BIDSFile] | list[FileRecord], metadata_cache: MetadataCache | None = None
+):
+    metadata_cache = default_metadata_cache(files, metadata_cache)
     first_file = files[0]
-    metadata = first_file.get_metadata()
+    metadata = metadata_cache.get(first_file)
     return templates.mri_scanner_info(metadata)
 
 
+def _metadata_cache(metadata_cache: MetadataCache | None, layout: BIDSLayout) -> MetadataCache:
+    """Return a metadata cache able to read the records of the files of a layout."""
+    if metadata_cache is None:
+        return MetadataCache(layout=layout)
+    if metadata_cache.layout is None:
+        metadata_cache.layout = layout
+    return metadata_cache
+
+
 def common_mri_desc(
-    img: None | nib.Nifti1Image,
+    img: None | NiftiHeader,
     metadata: dict[str, Any],
     config: dict[str, dict[str, str]],
 ) -> dict[str, Any]:
@@ -51,7 +82,7 @@ def common_mri_desc(
         **metadata,
         "tr": tr,
         "fov": parameters.field_of_view(img),
-        "matrix_size": parameters.matrix_size(img),
+        "matrix_size": parameters.matrix_size(img, metadata),
         "voxel_size": parameters.voxel_size(img),
         "variants": parameters.variants(metadata, config),
         "seqs": parameters.sequence(metadata, config),
@@ -59,12 +90,20 @@ def common_mri_desc(
     }
 
 
-def func_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout: BIDSLayout) -> str:
-    """Generate a paragraph describing T2*-weighted functional scans.
+@profiling.timed("describe", "func")
+def func_desc_data(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> dict[str, Any]:
+    """Collect the data describing T2*-weighted functional scans.
 
     Parameters
     ----------
-    files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to DWI scan.
 
     config : :obj:`dict`
@@ -74,60 +113,99 @@ def func_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout:
     layout : :obj:`bids.layout.BIDSLayout`
         Layout object for a BIDS dataset.
 
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+
+    header_cache : :obj:`~bids.ext.reports.nifti.HeaderCache`, optional
+        Cache used to read the headers of the images.
+
+    image_io : :obj:`bool`
+        Read the headers of the images.
+        If False, the parameters derived from them are read from the metadata
+        where possible, and unknown otherwise.
+
     Returns
     -------
-    desc : :obj:`str`
-        A description of the scan's acquisition information.
+    desc_data : :obj:`dict`
+        Data used to render the description of the scan's acquisition information.
     """
     errored_files = []
 
+    metadata_cache = _metadata_cache(metadata_cache, layout)
+    files = file_records(layout, files)
     first_file = files[0]
-    metadata = first_file.get_metadata()
-    img = try_load_nii(first_file.path)
-    if img is None:
-        errored_files.append(Path(first_file.path).relative_to(layout.root))
+    metadata = metadata_cache.get(first_file)
 
     all_imgs = []
-    for f in files:
-        img = try_load_nii(f)
-        if img is None:
-            errored_files.append(Path(f).relative_to(layout.root))
+    for f in files if image_io else []:
+        f_img = try_load_nii(f, header_cache)
+        if f_img is None:
+            errored_files.append(Path(f.path).relative_to(layout.root))
         else:
-            all_imgs.append(img)
+            all_imgs.append(f_img)
+    img = all_imgs[0] if all_imgs else None
     if errored_files:
         files_not_found_warning(list(set(errored_files)))
 
-    task_name = first_file.get_entities()["task"]
+    task_name = first_file.task
 
-    all_runs = sorted({f.get_entities().get("run", 1) for f in files})
+    all_runs = sorted({1 if f.run is None else f.run for f in files})
 
     nb_vols = "UNKNOWN"
     duration = "UNKNOWN"
     if all_imgs:
         nb_vols = parameters.nb_vols(all_imgs)
         duration = parameters.duration(all_imgs, metadata)
+    elif "VolumeTiming" in metadata:
+        # sparse acquisitions list the onset of each volume
+        nb_vols = str(len(metadata["VolumeTiming"]))
 
     desc_data = {
         **common_mri_desc(img, metadata, config),
-        "echo_time": parameters.echo_time_ms(files),
+        "echo_time": parameters.echo_time_ms(files, metadata_cache),
         "slice_order": parameters.slice_order(metadata),
         "nb_runs": parameters.nb_runs(all_runs),
         "task_name": metadata.get("TaskName", task_name),
-        "multi_echo": parameters.multi_echo(files),
+        "multi_echo": parameters.multi_echo(files, metadata_cache),
         "nb_vols": nb_vols,
         "duration": duration,
-        "scan_type": first_file.get_entities()["suffix"].replace("w", "-weighted"),
+        "scan_type": first_file.suffix.replace("w", "-weighted"),
     }
 
-    return templates.func_info(desc_data)
+    return desc_data
 
 
-def anat_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout: BIDSLayout) -> str:
-    """Generate a paragraph describing T1- and T2-weighted structural scans.
+def func_info(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> str:
+    """Generate a paragraph describing T2*-weighted functional scans.
+
+    See :func:`func_desc_data` for the parameters.
+    """
+    return templates.func_info(
+        func_desc_data(files, config, layout, metadata_cache, header_cache, image_io)
+    )
+
+
+@profiling.timed("describe", "anat")
+def anat_desc_data(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> dict[str, Any]:
+    """Collect the data describing T1- and T2-weighted structural scans.
 
     Parameters
     ----------
-    files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to DWI scan.
 
     config : :obj:`dict`
@@ -137,36 +215,72 @@ def anat_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout:
     layout : :obj:`bids.layout.BIDSLayout`
         Layout object for a BIDS dataset.
 
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+
+    header_cache : :obj:`~bids.ext.reports.nifti.HeaderCache`, optional
+        Cache used to read the headers of the images.
+
+    image_io : :obj:`bool`
+        Read the headers of the images.
+        If False, the parameters derived from them are read from the metadata
+        where possible, and unknown otherwise.
+
     Returns
     -------
-    desc : :obj:`str`
-        A description of the scan's acquisition information.
+    desc_data : :obj:`dict`
+        Data used to render the description of the scan's acquisition information.
     """
+    metadata_cache = _metadata_cache(metadata_cache, layout)
+    files = file_records(layout, files)
     first_file = files[0]
-    metadata = first_file.get_metadata()
-    img = try_load_nii(first_file.path)
-    if img is None:
-        files_not_found_warning(Path(first_file.path).relative_to(layout.root))
+    metadata = metadata_cache.get(first_file)
+    img = _read_header(first_file, layout, header_cache, image_io)
 
-    all_runs = sorted({f.get_entities().get("run", 1) for f in files})
+    all_runs = sorted({1 if f.run is None else f.run for f in files})
 
     desc_data = {
         **common_mri_desc(img, metadata, config),
-        "echo_time": parameters.echo_time_ms(files),
+        "echo_time": parameters.echo_time_ms(files, metadata_cache),
         "slice_order": parameters.slice_order(metadata),
         "nb_runs": parameters.nb_runs(all_runs),
-        "multi_echo": parameters.multi_echo(files),
+        "multi_echo": parameters.multi_echo(files, metadata_cache),
     }
 
-    return templates.anat_info(desc_data)
+    return desc_data
 
 
-def dwi_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout: BIDSLayout) -> str:
-    """Generate a paragraph describing DWI scan acquisition information.
+def anat_info(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> str:
+    """Generate a paragraph describing T1- and T2-weighted structural scans.
+
+    See :func:`anat_desc_data` for the parameters.
+    """
+    return templates.anat_info(
+        anat_desc_data(files, config, layout, metadata_cache, header_cache, image_io)
+    )
+
+
+@profiling.timed("describe", "dwi")
+def dwi_desc_data(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> dict[str, Any]:
+    """Collect the data describing DWI scan acquisition information.
 
     Parameters
     ----------
-    files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to DWI scan.
 
     config : :obj:`dict`
@@ -176,41 +290,82 @@ def dwi_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout: B
     layout : :obj:`bids.layout.BIDSLayout`
         Layout object for a BIDS dataset.
 
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+
+    header_cache : :obj:`~bids.ext.reports.nifti.HeaderCache`, optional
+        Cache used to read the headers of the images.
+
+    image_io : :obj:`bool`
+        Read the headers of the images.
+        If False, the parameters derived from them are read from the metadata
+        where possible, and unknown otherwise.
+
     Returns
     -------
-    desc : :obj:`str`
-        A description of the DWI scan's acquisition information.
+    desc_data : :obj:`dict`
+        Data used to render the description of the scan's acquisition information.
     """
+    metadata_cache = _metadata_cache(metadata_cache, layout)
+    files = file_records(layout, files)
     first_file = files[0]
-    metadata = first_file.get_metadata()
-    img = try_load_nii(first_file.path)
-    if img is None:
-        files_not_found_warning(Path(first_file.path).relative_to(layout.root))
-    bval_file = first_file.path.replace(".nii.gz", ".bval").replace(".nii", ".bval")
+    metadata = metadata_cache.get(first_file)
+    img = _read_header(first_file, layout, header_cache, image_io)
+    bval_file = _bval_file(first_file.path)
 
-    all_runs = sorted({f.get_entities().get("run", 1) for f in files})
+    all_runs = sorted({1 if f.run is None else f.run for f in files})
 
-    dmri_dir = "UNKNOWN"
-    if img is not None:
-        dmri_dir = img.shape[3]
+    try:
+        gradients = parameters.read_gradients(bval_file)
+        bvals = parameters.bvals(bval_file)
+    except (OSError, ValueError):
+        files_not_found_warning(Path(bval_file).relative_to(layout.root))
+        gradients = None
+        bvals = "UNKNOWN"
 
     desc_data = {
         **common_mri_desc(img, metadata, config),
-        "echo_time": parameters.echo_time_ms(files),
+        "echo_time": parameters.echo_time_ms(files, metadata_cache),
         "nb_runs": parameters.nb_runs(all_runs),
-        "bvals": parameters.bvals(bval_file),
-        "dmri_dir": dmri_dir,
+        "bvals": bvals,
+        "dmri_dir": "UNKNOWN" if gradients is None else gradients.n_directions,
     }
 
-    return templates.dwi_info(desc_data)
+    return desc_data
 
 
-def fmap_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout: BIDSLayout) -> str:
-    """Generate a paragraph describing field map acquisition information.
+def dwi_info(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> str:
+    """Generate a paragraph describing DWI scan acquisition information.
+
+    See :func:`dwi_desc_data` for the parameters.
+    """
+    return templates.dwi_info(
+        dwi_desc_data(files, config, layout, metadata_cache, header_cache, image_io)
+    )
+
+
+@profiling.timed("describe", "fmap")
+def fmap_desc_data(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    filename_index: FilenameIndex | None = None,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> dict[str, Any]:
+    """Collect the data describing field map acquisition information.
 
     Parameters
     ----------
-    files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to field map scan.
 
     config : :obj:`dict`
@@ -220,91 +375,177 @@ def fmap_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout:
     layout : :obj:`bids.layout.BIDSLayout`
         Layout object for a BIDS dataset.
 
+    filename_index : :obj:`~bids.ext.reports.utils.FilenameIndex`, optional
+        Lookup table used to resolve the IntendedFor targets.
+
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+
+    header_cache : :obj:`~bids.ext.reports.nifti.HeaderCache`, optional
+        Cache used to read the headers of the images.
+
+    image_io : :obj:`bool`
+        Read the headers of the images.
+        If False, the parameters derived from them are read from the metadata
+        where possible, and unknown otherwise.
 
     Returns
     -------
-    desc : :obj:`str`
-        A description of the field map's acquisition information.
+    desc_data : :obj:`dict`
+        Data used to render the description of the scan's acquisition information.
     """
+    metadata_cache = _metadata_cache(metadata_cache, layout)
+    files = file_records(layout, files)
     first_file = files[0]
-    metadata = first_file.get_metadata()
-    img = try_load_nii(first_file.path)
-    if img is None:
-        files_not_found_warning(Path(first_file.path).relative_to(layout.root))
+    metadata = metadata_cache.get(first_file)
+    img = _read_header(first_file, layout, header_cache, image_io)
 
     direction = "UNKNOWN PHASE ENCODING"
     if PhaseEncodingDirection := metadata.get("PhaseEncodingDirection"):
         direction = config["dir"].get(PhaseEncodingDirection, "UNKNOWN PHASE ENCODING")
 
+    te_1, te_2 = parameters.echo_times_fmap(files, metadata_cache)
+
     desc_data = {
         **common_mri_desc(img, metadata, config),
-        "te_1": parameters.echo_times_fmap(files)[0],
-        "te_2": parameters.echo_times_fmap(files)[1],
+        "te_1": te_1,
+        "te_2": te_2,
         "slice_order": parameters.slice_order(metadata),
         "dir": direction,
-        "intended_for": parameters.intendedfor_targets(metadata, layout),
+        "intended_for": parameters.intendedfor_targets(
+            metadata, layout, filename_index, metadata_cache
+        ),
     }
 
-    return templates.fmap_info(desc_data)
+    return desc_data
+
+
+def fmap_info(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    filename_index: FilenameIndex | None = None,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> str:
+    """Generate a paragraph describing field map acquisition information.
+
+    See :func:`fmap_desc_data` for the parameters.
+    """
+    return templates.fmap_info(
+        fmap_desc_data(
+            files, config, layout, filename_index, metadata_cache, header_cache, image_io
+        )
+    )
 
 
-def perf_info(files: list[BIDSFile], config: dict[str, dict[str, str]], layout: BIDSLayout) -> str:
+@profiling.timed("describe", "perf")
+def perf_desc_data(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> dict[str, Any]:
+    metadata_cache = _metadata_cache(metadata_cache, layout)
+    files = file_records(layout, files)
     first_file = files[0]
-    metadata = first_file.get_metadata()
-    img = try_load_nii(first_file.path)
-    if img is None:
-        files_not_found_warning(Path(first_file.path).relative_to(layout.root))
+    metadata = metadata_cache.get(first_file)
+    img = _read_header(first_file, layout, header_cache, image_io)
 
-    all_runs = sorted({f.get_entities().get("run", 1) for f in files})
+    all_runs = sorted({1 if f.run is None else f.run for f in files})
 
     desc_data = {
         **common_mri_desc(img, metadata, config),
-        "echo_time": parameters.echo_time_ms(files),
+        "echo_time": parameters.echo_time_ms(files, metadata_cache),
         "nb_runs": parameters.nb_runs(all_runs),
     }
 
-    return templates.perf_info(desc_data)
+    return desc_data
 
 
-def pet_info(files: list[BIDSFile], layout: BIDSLayout) -> str:
+def perf_info(
+    files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> str:
+    """Generate a paragraph describing ASL scans.
+
+    See :func:`perf_desc_data` for the parameters.
+    """
+    return templates.perf_info(
+        perf_desc_data(files, config, layout, metadata_cache, header_cache, image_io)
+    )
+
+
+@profiling.timed("describe", "pet")
+def pet_desc_data(
+    files: list[BIDSFile] | list[FileRecord],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> dict[str, Any]:
+    metadata_cache = _metadata_cache(metadata_cache, layout)
+    files = file_records(layout, files)
     first_file = files[0]
-    metadata = first_file.get_metadata()
-    img = try_load_nii(first_file.path)
-    if img is None:
-        files_not_found_warning(Path(first_file.path).relative_to(layout.root))
+    metadata = metadata_cache.get(first_file)
+    img = _read_header(first_file, layout, header_cache, image_io)
 
-    all_runs = sorted({f.get_entities().get("run", 1) for f in files})
+    all_runs = sorted({1 if f.run is None else f.run for f in files})
 
     desc_data = {
         **metadata,
         "fov": parameters.field_of_view(img),
-        "matrix_size": parameters.matrix_size(img),
+        "matrix_size": parameters.matrix_size(img, metadata),
         "voxel_size": parameters.voxel_size(img),
         "nb_runs": parameters.nb_runs(all_runs),
     }
 
-    return templates.pet_info(desc_data)
+    return desc_data
 
 
-def meg_info(files: list[BIDSFile]) -> str:
+def pet_info(
+    files: list[BIDSFile] | list[FileRecord],
+    layout: BIDSLayout,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    image_io: bool = True,
+) -> str:
+    """Generate a paragraph describing PET scans.
+
+    See :func:`pet_desc_data` for the parameters.
+    """
+    return templates.pet_info(pet_desc_data(files, layout, metadata_cache, header_cache, image_io))
+
+
+def meg_info(
+    files: list[BIDSFile] | list[FileRecord], metadata_cache: MetadataCache | None = None
+) -> str:
     """Generate a paragraph describing meg acquisition information.
 
     Parameters
     ----------
-    files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to meg scan.
 
-    config : :obj:`dict`
-        A dictionary with relevant information regarding sequences, sequence
-        variants, phase encoding directions, and task names.
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+        Required for :obj:`~.utils.FileRecord` objects.
 
     Returns
     -------
     desc : :obj:`str`
         A description of the field map's acquisition information.
     """
+    metadata_cache = default_metadata_cache(files, metadata_cache)
     first_file = files[0]
-    metadata = first_file.get_metadata()
+    metadata = metadata_cache.get(first_file)
 
     return templates.meg_info(metadata)
 
@@ -332,7 +573,14 @@ def final_paragraph(metadata: dict[str, Any]) -> str:
 
 
 def parse_files(
-    layout: BIDSLayout, data_files: list[BIDSFile], config: dict[str, dict[str, str]]
+    layout: BIDSLayout,
+    data_files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    filename_index: FilenameIndex | None = None,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    io_threads: int = 1,
+    image_io: bool = True,
 ) -> list[str]:
     """Loop through files in a BIDSLayout and generate appropriate descriptions.
 
@@ -343,38 +591,122 @@ def parse_files(
     layout : :obj:`bids.layout.BIDSLayout`
         Layout object for a BIDS dataset.
 
-    data_files : :obj:`list` of :obj:`bids.layout.models.BIDSFile`
+    data_files : :obj:`list` of :obj:`~bids.layout.BIDSFile` or :obj:`~.utils.FileRecord`
         List of nifti files in layout corresponding to subject/session combo.
 
     config : :obj:`dict`
         Configuration info for methods generation.
+
+    filename_index : :obj:`~bids.ext.reports.utils.FilenameIndex`, optional
+        Lookup table used to resolve the IntendedFor targets of field maps.
+        Pass one to share it across calls.
+
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`, optional
+        Cache used to read the metadata of the files.
+        Pass one to share it across calls.
+
+    header_cache : :obj:`~bids.ext.reports.nifti.HeaderCache`, optional
+        Cache used to read the headers of the images.
+        Pass one to share it across calls.
+
+    io_threads : :obj:`int`
+        Maximum number of threads used to read the image headers
+        before generating the descriptions.
+        If 1, the headers are read one at a time when they are needed.
+
+    image_io : :obj:`bool`
+        Read the headers of the images.
+        If False, the descriptions are only built from the metadata and the file names,
+        and the parameters derived from the images are unknown
+        unless the metadata gives them.
     """
+    paragraphs = describe_files(
+        layout,
+        data_files,
+        config,
+        filename_index,
+        metadata_cache,
+        header_cache,
+        io_threads,
+        image_io,
+    )
+    return [render_paragraph(paragraph) for paragraph in paragraphs]
+
+
+def render_paragraph(paragraph: Paragraph) -> str:
+    """Render a paragraph returned by :func:`describe_files`."""
+    template_name, desc_data = paragraph
+    if template_name is None:
+        return ""
+    datatype = template_name.split(".")[0]
+    with profiling.timer("render", datatype if datatype in _TEMPLATE_DATATYPES else None):
+        return templates.render(template_name=template_name, data=desc_data)
+
+
+def describe_files(
+    layout: BIDSLayout,
+    data_files: list[BIDSFile] | list[FileRecord],
+    config: dict[str, dict[str, str]],
+    filename_index: FilenameIndex | None = None,
+    metadata_cache: MetadataCache | None = None,
+    header_cache: HeaderCache | None = None,
+    io_threads: int = 1,
+    image_io: bool = True,
+) -> list[Paragraph]:
+    """Collect the data describing files in a BIDSLayout, without rendering it.
+
+    Takes the same parameters as :func:`parse_files`.
+
+    Returns
+    -------
+    paragraphs : :obj:`list` of :obj:`tuple`
+        Name of the template and data used to render each paragraph
+        of the description.
+        The name of the template is None for empty paragraphs.
+    """
+    filename_index = FilenameIndex(layout) if filename_index is None else filename_index
+    metadata_cache = _metadata_cache(metadata_cache, layout)
+    header_cache = HeaderCache() if header_cache is None else header_cache
+
     # Group files into individual runs
-    data_files = collect_associated_files(layout, data_files, extra_entities=["run"])
+    records = file_records(layout, data_files)
+    with profiling.timer("collect_associated_files"):
+        groups = collect_associated_files(records, extra_entities=["run"])
+
+    if io_threads > 1:
+        with profiling.timer("prefetch"):
+            prefetch(groups, metadata_cache, header_cache, io_threads, image_io)
 
     # Will only get institution from the first file.
     # This assumes that ALL files from ALL datatypes
     # were acquired in the same institution.
-    description_list = [institution_info(data_files[0])]
+    metadata = metadata_cache.get(groups[0][0])
+    paragraphs: list[Paragraph] = [
+        ("institution.mustache", metadata) if metadata.get("InstitutionName") else (None, {})
+    ]
 
     # %% MRI
     mri_datatypes = ["anat", "func", "fmap", "perf", "dwi"]
     mri_scanner_info_done = False
-    for group in data_files:
-        if group[0].entities["datatype"] not in mri_datatypes:
+    for group in groups:
+        datatype, suffix = group[0].datatype, group[0].suffix
+        if datatype not in mri_datatypes:
             continue
 
         # assume all MRI data was acquires on the same scanner
         if not mri_scanner_info_done:
-            description_list.append(mri_scanner_info(group))
+            paragraphs.append(("mri_scanner_info.mustache", metadata_cache.get(group[0])))
             mri_scanner_info_done = True
 
-        group_description = ""
+        paragraph: Paragraph = (None, {})
 
-        if group[0].entities["datatype"] == "func":
-            group_description = func_info(group, config, layout)
+        if datatype == "func":
+            paragraph = (
+                "func.mustache",
+                func_desc_data(group, config, layout, metadata_cache, header_cache, image_io),
+            )
 
-        elif (group[0].entities["datatype"] == "anat") and group[0].entities["suffix"] in (
+        elif (datatype == "anat") and suffix in (
             "T1w",
             "T2w",
             "PDw",
@@ -385,59 +717,173 @@ def parse_files(
             "PDT2",
             "angio",
         ):
-            group_description = anat_info(group, config, layout)
-
-        elif group[0].entities["datatype"] == "dwi":
-            group_description = dwi_info(group, config, layout)
-
-        elif group[0].entities["datatype"] == "perf":
-            group_description = perf_info(group, config, layout)
-
-        elif (group[0].entities["datatype"] == "fmap") and group[0].entities[
-            "suffix"
-        ] == "phasediff":
-            group_description = fmap_info(group, config, layout)
-
-        description_list.append(group_description)
+            paragraph = (
+                "anat.mustache",
+                anat_desc_data(group, config, layout, metadata_cache, header_cache, image_io),
+            )
+
+        elif datatype == "dwi":
+            paragraph = (
+                "dwi.mustache",
+                dwi_desc_data(group, config, layout, metadata_cache, header_cache, image_io),
+            )
+
+        elif datatype == "perf":
+            paragraph = (
+                "perf.mustache",
+                perf_desc_data(group, config, layout, metadata_cache, header_cache, image_io),
+            )
+
+        elif (datatype == "fmap") and suffix == "phasediff":
+            paragraph = (
+                "fmap.mustache",
+                fmap_desc_data(
+                    group,
+                    config,
+                    layout,
+                    filename_index,
+                    metadata_cache,
+                    header_cache,
+                    image_io,
+                ),
+            )
+
+        paragraphs.append(paragraph)
 
     # %% other
-    for group in data_files:
-        if group[0].entities["datatype"] in mri_datatypes:
+    for group in groups:
+        datatype = group[0].datatype
+        if datatype in mri_datatypes:
             continue
 
-        group_description = ""
+        paragraph = (None, {})
 
-        if group[0].entities["datatype"] == [
+        if datatype == [
             "eeg",
             "meg",
             "ieeg",
         ]:
-            group_description = meg_info(group, config, layout)
+            paragraph = ("meeg.mustache", metadata_cache.get(group[0]))
 
-        if group[0].entities["datatype"] == "pet":
-            group_description = pet_info(group, layout)
+        if datatype == "pet":
+            paragraph = (
+                "pet.mustache",
+                pet_desc_data(group, layout, metadata_cache, header_cache, image_io),
+            )
 
-        if group[0].entities["datatype"] in [
+        if datatype in [
             "beh",
             "fnirs",
             "microscopy",
             "motion",
         ]:
-            LOGGER.warning(f" '{group[0].entities['datatype']}' not yet supported.")
+            LOGGER.warning(f" '{datatype}' not yet supported.")
 
         else:
             LOGGER.warning(f" '{group[0].filename}' not yet supported.")
 
-        description_list.append(group_description)
+        paragraphs.append(paragraph)
 
-    return description_list
+    return paragraphs
+
+
+def prefetch(
+    groups: list[list[FileRecord]],
+    metadata_cache: MetadataCache,
+    header_cache: HeaderCache,
+    io_threads: int,
+    image_io: bool = True,
+) -> None:
+    """Read in advance the metadata and image headers needed to describe groups of files.
+
+    Image headers and the gradient tables of dMRI scans are read concurrently,
+    as opening files is mostly latency-bound on network file systems.
+    Metadata come from the layout database,
+    whose session cannot be shared between threads,
+    so they are read sequentially.
+
+    Parameters
+    ----------
+    groups : :obj:`list` of :obj:`list` of :obj:`~bids.ext.reports.utils.FileRecord`
+        Files grouped by acquisition.
+
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`
+        Cache to fill with the metadata of the files.
+
+    header_cache : :obj:`~bids.ext.reports.nifti.HeaderCache`
+        Cache to fill with the headers of the images.
+
+    io_threads : :obj:`int`
+        Maximum number of threads used to read the image headers.
+
+    image_io : :obj:`bool`
+        Read the image headers, otherwise only the metadata and gradient tables.
+    """
+    images = []
+    datatypes = []
+    gradient_files = []
+    for group in groups:
+        datatype = group[0].datatype
+        with profiling.datatype(datatype):
+            for f in group:
+                metadata_cache.get(f)
+        if datatype == "dwi":
+            gradient_files.append(_bval_file(group[0].path))
+        # only the first image of a group is needed, except for functional runs
+        candidates = group if datatype == "func" else group[:1]
+        for f in candidates if image_io else []:
+            if f.path.endswith((".nii", ".nii.gz")):
+                images.append(f.path)
+                datatypes.append(datatype)
+
+    with ThreadPoolExecutor(max_workers=io_threads) as executor:
+        # errors are reported when the headers are read again to generate the descriptions
+        headers = executor.map(
+            partial(_prefetch_header, header_cache=header_cache), images, datatypes
+        )
+        gradients = executor.map(_prefetch_gradients, gradient_files)
+        list(headers)
+        list(gradients)
+
+
+def _prefetch_header(path: str, datatype: str | None, header_cache: HeaderCache) -> None:
+    # threads do not inherit the datatype of the calling thread
+    with profiling.datatype(datatype):
+        try_load_nii(path, header_cache)
+
+
+def _prefetch_gradients(bval_file: str) -> None:
+    # errors are reported when the gradients are read again to generate the descriptions
+    with suppress(OSError, ValueError):
+        parameters.read_gradients(bval_file)
+
+
+def _bval_file(path: str) -> str:
+    """Return the path of the .bval file next to a dMRI image."""
+    return path.replace(".nii.gz", ".bval").replace(".nii", ".bval")
+
+
+def _read_header(
+    file: FileRecord, layout: BIDSLayout, header_cache: HeaderCache | None, image_io: bool
+) -> NiftiHeader | None:
+    """Read the header of an image and warn if it fails, return None without image I/O."""
+    if not image_io:
+        return None
+    img = try_load_nii(file, header_cache)
+    if img is None:
+        files_not_found_warning(Path(file.path).relative_to(layout.root))
+    return img
 
 
-def try_load_nii(file: BIDSFile) -> None | nib.Nifti1Image:
-    """Try to load a nifti file, return None if it fails."""
+@profiling.timed("read_header")
+def try_load_nii(
+    file: BIDSFile | FileRecord | str | Path, header_cache: HeaderCache | None = None
+) -> None | NiftiHeader:
+    """Try to read the header of a nifti file, return None if it fails."""
+    path = file.path if isinstance(file, (BIDSFile, FileRecord)) else file
     try:
-        img = nib.load(file)
-    except (FileNotFoundError, ImageFileError):
+        img = read_nifti_header(path) if header_cache is None else header_cache.get(path)
+    except (OSError, ValueError):
         img = None
     return img
 
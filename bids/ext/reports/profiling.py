@@ -0,0 +1,278 @@
+"""Measure the time spent in each stage of a report.
+
+The stages on the hot path of a report are wrapped in :func:`timer`,
+which does nothing unless a collector was registered with :func:`add_collector`.
+A collector is any object with a ``record(stage, datatype, seconds, calls)`` method,
+so that the timings can be sent to an existing metrics system.
+:class:`Profiler` is a collector summing the time and calls of each stage::
+
+    with Profiler() as profiler:
+        report.generate()
+    print(profiler.table())
+
+Stages
+------
+index
+    Indexing of the dataset by :class:`bids.layout.BIDSLayout`.
+query
+    Queries to the layout.
+collect_associated_files
+    Grouping of the files of a session by acquisition.
+prefetch
+    Reading in advance the metadata and headers of a session.
+get_metadata
+    Reading the sidecar metadata of a file, on cache misses only.
+read_header
+    Reading the header of an image, from the cache or from the file.
+describe
+    Collecting the data describing a group of files.
+render
+    Rendering a paragraph from its template.
+
+Stages may be nested: the time of ``describe`` includes
+the time of the ``get_metadata`` and ``read_header`` calls it makes.
+The datatype of a stage is inherited by the stages nested in it.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Any, Protocol, TypeVar
+
+STAGES = (
+    "index",
+    "query",
+    "collect_associated_files",
+    "prefetch",
+    "get_metadata",
+    "read_header",
+    "describe",
+    "render",
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Time and number of calls of a stage for a datatype.
+Record = tuple[str, str | None, float, int]
+
+
+class Collector(Protocol):
+    """Receive the timings of the stages."""
+
+    def record(self, stage: str, datatype: str | None, seconds: float, calls: int = 1) -> None:
+        """Record ``calls`` calls of a stage that took ``seconds`` in total."""
+
+
+_COLLECTORS: list[Collector] = []
+
+_DATATYPE: ContextVar[str | None] = ContextVar("datatype", default=None)
+
+_NULL_CONTEXT = nullcontext()
+
+
+def add_collector(collector: Collector) -> None:
+    """Start sending the timings of the stages to a collector."""
+    _COLLECTORS.append(collector)
+
+
+def remove_collector(collector: Collector) -> None:
+    """Stop sending the timings of the stages to a collector."""
+    _COLLECTORS.remove(collector)
+
+
+def enabled() -> bool:
+    """Return whether any collector is registered."""
+    return bool(_COLLECTORS)
+
+
+def record(stage: str, datatype: str | None, seconds: float, calls: int = 1) -> None:
+    """Send timings measured elsewhere, e.g. in a worker process, to the collectors."""
+    for collector in _COLLECTORS:
+        collector.record(stage, datatype, seconds, calls)
+
+
+class _Timer:
+    __slots__ = ("_start", "_token", "datatype", "stage")
+
+    def __init__(self, stage: str, datatype: str | None):
+        self.stage = stage
+        self.datatype = datatype
+
+    def __enter__(self) -> _Timer:
+        self._token = None if self.datatype is None else _DATATYPE.set(self.datatype)
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        seconds = perf_counter() - self._start
+        if self._token is not None:
+            _DATATYPE.reset(self._token)
+        record(self.stage, _DATATYPE.get() if self.datatype is None else self.datatype, seconds)
+
+
+def timer(stage: str, datatype: str | None = None) -> AbstractContextManager[Any]:
+    """Time a stage if a collector is registered.
+
+    Parameters
+    ----------
+    stage : :obj:`str`
+        Name of the stage, usually one of :data:`STAGES`.
+
+    datatype : :obj:`str`, optional
+        Datatype the stage works on.
+        If None, the datatype of the enclosing stage is used.
+    """
+    if not _COLLECTORS:
+        return _NULL_CONTEXT
+    return _Timer(stage, datatype)
+
+
+def timed(stage: str, datatype: str | None = None) -> Callable[[F], F]:
+    """Time each call of the decorated function as a stage, see :func:`timer`."""
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _COLLECTORS:
+                return func(*args, **kwargs)
+            with _Timer(stage, datatype):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def datatype(name: str | None) -> AbstractContextManager[Any]:
+    """Attribute the stages run in this context to a datatype, without timing it.
+
+    Useful in threads, which do not inherit the datatype of the enclosing stage.
+    """
+    if not _COLLECTORS or name is None:
+        return _NULL_CONTEXT
+    return _DatatypeScope(name)
+
+
+class _DatatypeScope:
+    __slots__ = ("_token", "name")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self._token = _DATATYPE.set(self.name)
+
+    def __exit__(self, *exc_info: object) -> None:
+        _DATATYPE.reset(self._token)
+
+
+class Profiler:
+    """Collector summing the time and number of calls of each stage, per datatype.
+
+    Use it as a context manager to register it and measure the wall time.
+
+    Attributes
+    ----------
+    wall_time : :obj:`float`
+        Time spent in the context of the profiler, in seconds.
+    """
+
+    def __init__(self) -> None:
+        self.wall_time = 0.0
+        self._stats: dict[tuple[str, str | None], list[float]] = {}
+        self._lock = threading.Lock()
+        self._start: float | None = None
+
+    def __enter__(self) -> Profiler:
+        add_collector(self)
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._start is not None:
+            self.wall_time += perf_counter() - self._start
+            self._start = None
+        remove_collector(self)
+
+    def record(self, stage: str, datatype: str | None, seconds: float, calls: int = 1) -> None:
+        """Add the time and calls of a stage."""
+        with self._lock:
+            stats = self._stats.setdefault((stage, datatype), [0.0, 0])
+            stats[0] += seconds
+            stats[1] += calls
+
+    def records(self) -> list[Record]:
+        """Return the total time and calls of each stage and datatype."""
+        with self._lock:
+            return [
+                (stage, datatype, seconds, int(calls))
+                for (stage, datatype), (seconds, calls) in self._stats.items()
+            ]
+
+    def clear(self) -> None:
+        """Forget the recorded timings."""
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self) -> dict[str, Any]:
+        """Return the timings as a JSON serializable dictionary.
+
+        Returns
+        -------
+        summary : :obj:`dict`
+            ``wall_time`` in seconds,
+            ``stages`` with the total ``seconds`` and ``calls`` of each stage,
+            and ``datatypes`` with the same breakdown for each datatype.
+            Stages that ran outside of any datatype are only counted in ``stages``.
+        """
+        stages: dict[str, dict[str, Any]] = {}
+        datatypes: dict[str, dict[str, dict[str, Any]]] = {}
+        for stage, datatype, seconds, calls in sorted(self.records(), key=_record_order):
+            total = stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += seconds
+            total["calls"] += calls
+            if datatype is not None:
+                datatypes.setdefault(datatype, {})[stage] = {"seconds": seconds, "calls": calls}
+        return {
+            "wall_time": self.wall_time,
+            "stages": stages,
+            "datatypes": dict(sorted(datatypes.items())),
+        }
+
+    def table(self) -> str:
+        """Return the timings of each stage and datatype as a text table."""
+        header = ("stage", "datatype", "calls", "total (s)", "mean (ms)", "% wall")
+        rows = []
+        for stage, datatype, seconds, calls in sorted(self.records(), key=_record_order):
+            rows.append(
+                (
+                    stage,
+                    datatype or "-",
+                    str(calls),
+                    f"{seconds:.3f}",
+                    f"{1000 * seconds / calls:.3f}" if calls else "-",
+                    f"{100 * seconds / self.wall_time:.1f}" if self.wall_time else "-",
+                )
+            )
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+        lines = [
+            "  ".join(
+                cell.ljust(width) if i < 2 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths, strict=True))
+            )
+            for row in [header, *rows]
+        ]
+        lines.insert(1, "  ".join("-" * width for width in widths))
+        lines.append(f"wall time: {self.wall_time:.3f} s")
+        return "\n".join(lines)
+
+
+def _record_order(record: Record) -> tuple[int, str, str]:
+    stage, datatype = record[0], record[1]
+    index = STAGES.index(stage) if stage in STAGES else len(STAGES)
+    return index, stage, datatype or ""
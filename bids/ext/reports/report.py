@@ -2,19 +2,71 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
+import multiprocessing
+import os
+import tempfile
 from collections import Counter
+from collections.abc import Hashable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 
 from bids.layout import BIDSFile, BIDSLayout
 from rich import print
 
-from . import parsing, utils
-from .logger import pybids_reports_logger
+from . import manifest, parsing, profiling, templates, utils
+from .logger import pybids_reports_logger, setup_logging
+from .nifti import HeaderCache
 
 LOGGER = pybids_reports_logger()
 
+DATA_EXTENSIONS = [".nii", ".nii.gz", ".set", ".fif", ".edf", ".bdf", ".snirf"]
+
+# Paragraphs of each session of a subject and final paragraph of its description.
+SubjectDescription = tuple[list[tuple[str | None, list[parsing.Paragraph]]], str | None]
+
+
+class SubjectReport(NamedTuple):
+    """Description of a single subject, as yielded by :meth:`BIDSReport.iter_subjects`."""
+
+    subject: str
+    """Subject ID."""
+
+    session_descriptions: dict[str | None, str]
+    """Description of each session of the subject."""
+
+    fingerprint: str
+    """Hexadecimal digest identical for subjects with the same description."""
+
+    description: str
+    """Full description of the subject, as counted in the report."""
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the report as a JSON serializable dictionary."""
+        return {
+            "subject": self.subject,
+            "sessions": [
+                {"session": ses, "description": description}
+                for ses, description in self.session_descriptions.items()
+            ],
+            "fingerprint": self.fingerprint,
+            "description": self.description,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> SubjectReport:
+        """Create a report from a dictionary returned by :meth:`to_dict`."""
+        return cls(
+            subject=data["subject"],
+            session_descriptions={
+                session["session"]: session["description"] for session in data["sessions"]
+            },
+            fingerprint=data["fingerprint"],
+            description=data["description"],
+        )
+
 
 class BIDSReport:
     """Generate publication-quality data acquisition section from BIDS dataset.
@@ -38,6 +90,44 @@ class BIDSReport:
             'seqvar':   a dictionary of sequence variant abbreviations
                         (e.g., SP) and corresponding names (e.g., spoiled)
 
+    header_cache : :obj:`~bids.ext.reports.nifti.HeaderCache`, optional
+        Cache used to read the headers of the images.
+        Pass one backed by a SQLite file to reuse the headers across runs.
+        If None, the headers are only cached in memory.
+
+    io_threads : :obj:`int`
+        Maximum number of threads used to read the image headers of a session.
+        Lower it to reduce the load on network file systems.
+
+    manifest_dir : :obj:`str` or :obj:`pathlib.Path`, optional
+        Directory where to store the description of each subject
+        along with a manifest of its files.
+        Subjects whose manifest did not change since the previous report
+        are not described again.
+        If None, all subjects are described.
+
+    image_io : :obj:`bool`
+        Read the headers of the images.
+        If False, the descriptions are only built from the sidecar metadata
+        and the file names, which is much faster on large datasets:
+        matrix size, voxel size, field of view and number of volumes
+        are read from the metadata when it gives them, and unknown otherwise.
+
+    Attributes
+    ----------
+    filename_index : :obj:`~bids.ext.reports.utils.FilenameIndex`
+        Lookup table used to resolve the IntendedFor targets of field maps.
+
+    metadata_cache : :obj:`~bids.ext.reports.utils.MetadataCache`
+        Cache of the sidecar metadata of the files,
+        shared by all the subjects of the report.
+        Its hit and miss statistics are available with ``cache_info()``.
+
+    patterns : :obj:`dict`
+        Unique descriptions found by the last call to :meth:`generate`
+        or :meth:`generate_from_files`,
+        along with the IDs of the subjects they describe.
+
     Warning
     -------
     pybids' automatic report generation is experimental and currently under
@@ -49,8 +139,15 @@ class BIDSReport:
     """
 
     def __init__(
-        self, layout: BIDSLayout, config: None | str | Path | dict[str, dict[str, str]] = None
+        self,
+        layout: BIDSLayout,
+        config: None | str | Path | dict[str, dict[str, str]] = None,
+        header_cache: HeaderCache | None = None,
+        io_threads: int = 4,
+        manifest_dir: str | Path | None = None,
+        image_io: bool = True,
     ):
+        setup_logging()
         self.layout = layout
         if config is None:
             config = Path(__file__).absolute().parent / "templates" / "config" / "converters.json"
@@ -67,14 +164,28 @@ class BIDSReport:
             )
 
         self.config = config
-
-    def generate_from_files(self, files: list[BIDSFile]) -> Counter[str]:
+        self.filename_index = utils.FilenameIndex(layout)
+        self.metadata_cache = utils.MetadataCache(layout=layout)
+        self.header_cache = HeaderCache() if header_cache is None else header_cache
+        self.io_threads = io_threads
+        self.manifest_dir = None if manifest_dir is None else Path(manifest_dir)
+        self.image_io = image_io
+        self.patterns: dict[str, list[str]] = {}
+
+    def generate_from_files(
+        self, files: list[BIDSFile], n_jobs: int | None = None
+    ) -> Counter[str]:
         r"""Generate a methods section from a list of files.
 
         Parameters
         ----------
         files : list of :obj:`~bids.layout.BIDSImageFile` objects
             List of files from which to generate methods description.
+            Each subject is described with the sessions it has files in.
+
+        n_jobs : :obj:`int`, optional
+            Number of processes used to report on subjects in parallel.
+            None or 1 means no parallel processing, -1 means using all processors.
 
         Returns
         -------
@@ -85,47 +196,32 @@ class BIDSReport:
             pattern is most likely the most complete. In cases where the
             file list contains multiple protocols, each pattern will need to be
             inspected manually.
+            The subjects behind each pattern are available in :attr:`patterns`.
         """
-        descriptions = []
-
-        subjects = sorted({f.get_entities().get("subject") for f in files})
-        sessions = sorted({f.get_entities().get("session") for f in files})
-        for sub in subjects:
-            subject_files = [f for f in files if f.get_entities().get("subject") == sub]
-            description_list = []
-            for ses in sessions:
-                data_files = [f for f in subject_files if f.get_entities().get("session") == ses]
-
-                if data_files:
-                    ses_description = parsing.parse_files(
-                        self.layout,
-                        data_files,
-                        self.config,
-                    )
-                    ses_description[0] = f"In session {ses}, " + ses_description[0]
-                    description_list += ses_description
-                    metadata = self.layout.get_metadata(data_files[0].path)
-                else:
-                    raise Exception(f"No imaging files for subject {sub}")
+        # bucket the files by subject and session in a single pass
+        files_index = utils.index_files_by_subject_session(utils.file_records(self.layout, files))
+        sessions = {ses for subject_sessions in files_index.values() for ses in subject_sessions}
+        for sub, subject_sessions in files_index.items():
+            if missing := sessions.difference(subject_sessions):
+                LOGGER.debug(f"No files for subject {sub} in sessions {sorted(missing, key=str)}.")
 
-            # Assume all data were converted the same way and use the last nifti
-            # file's json for conversion information.
-            if "metadata" not in vars():
-                raise Exception("No valid jsons found. Cannot generate final paragraph.")
+        for _ in self._iter_subjects(files_index, n_jobs=n_jobs, separator="\n\t"):
+            pass
 
-            description = "\n\t".join(description_list)
-            description += f"\n\n{parsing.final_paragraph(metadata)}"
-            descriptions.append(description)
-        counter = Counter(descriptions)
+        counter = Counter({desc: len(subs) for desc, subs in self.patterns.items()})
         print(f"Number of patterns detected: {len(counter.keys())}")
         print(utils.reminder())
         return counter
 
-    def generate(self, **kwargs: Any) -> Counter[str]:
+    def generate(self, n_jobs: int | None = None, **kwargs: Any) -> Counter[str]:
         r"""Generate the methods section.
 
         Parameters
         ----------
+        n_jobs : :obj:`int`, optional
+            Number of processes used to report on subjects in parallel.
+            None or 1 means no parallel processing, -1 means using all processors.
+
         kwargs : dict
             Keyword arguments passed to BIDSLayout to select subsets of the
             dataset.
@@ -139,22 +235,194 @@ class BIDSReport:
             pattern is most likely the most complete. In cases where the
             dataset contains multiple protocols, each pattern will need to be
             inspected manually.
+            The subjects behind each pattern are available in :attr:`patterns`.
         """
-        descriptions = []
+        for _ in self.iter_subjects(n_jobs=n_jobs, **kwargs):
+            pass
 
-        subjects = self.layout.get_subjects(**kwargs)
-        kwargs = {k: v for k, v in kwargs.items() if k != "subject"}
-        for sub in subjects:
-            descriptions.append(self._report_subject(subject=sub, **kwargs))
-
-        counter = Counter(descriptions)
+        counter = Counter({desc: len(subs) for desc, subs in self.patterns.items()})
         LOGGER.info(f"Number of patterns detected: {len(counter.keys())}")
+        LOGGER.debug(f"Metadata cache: {self.metadata_cache.cache_info()}")
 
         LOGGER.info(utils.reminder())
 
         return counter
 
-    def _report_subject(self, subject: str, **kwargs: Any) -> str:
+    def iter_subjects(self, n_jobs: int | None = None, **kwargs: Any) -> Iterator[SubjectReport]:
+        """Generate the description of each subject as soon as it is done.
+
+        Only the unique descriptions are kept in memory, in :attr:`patterns`,
+        which is complete once all subjects have been generated.
+
+        Parameters
+        ----------
+        n_jobs : :obj:`int`, optional
+            Number of processes used to report on subjects in parallel.
+            None or 1 means no parallel processing, -1 means using all processors.
+
+        kwargs : dict
+            Keyword arguments passed to BIDSLayout to select subsets of the
+            dataset.
+
+        Yields
+        ------
+        subject_report : :obj:`SubjectReport`
+            Description of a subject, in the order of the subject IDs.
+        """
+        with profiling.timer("query"):
+            subjects = utils.get_subjects(self.layout, **kwargs)
+            kwargs = {k: v for k, v in kwargs.items() if k != "subject"}
+
+            # Fetch all data files for the selected subjects in a single query
+            # and bucket them by subject and session,
+            # so that each file is only queried and parsed once.
+            data_files = self.layout.get(subject=subjects, extension=DATA_EXTENSIONS, **kwargs)
+        # only keep compact records of the files, whose entities are read with a few queries
+        files_index = utils.index_files_by_subject_session(
+            utils.file_records(self.layout, data_files)
+        )
+        del data_files
+
+        yield from self._iter_subjects(
+            {sub: files_index.get(sub, {}) for sub in subjects}, n_jobs=n_jobs
+        )
+
+    def _iter_subjects(
+        self,
+        files_index: dict[str, dict[str | None, list[utils.FileRecord]]],
+        n_jobs: int | None = None,
+        separator: str = "\n",
+    ) -> Iterator[SubjectReport]:
+        """Describe the subjects, possibly in parallel, and update :attr:`patterns`.
+
+        The data describing each subject are collected first,
+        and only the subjects with a new fingerprint are rendered.
+        Subjects with an unchanged manifest in :attr:`manifest_dir`
+        reuse their stored description.
+
+        Parameters
+        ----------
+        files_index : :obj:`dict`
+            Data files of each subject, grouped by session.
+
+        n_jobs : :obj:`int`, optional
+            Number of processes to use.
+
+        separator : :obj:`str`
+            String used to join the paragraphs of a subject description.
+
+        Yields
+        ------
+        subject_report : :obj:`SubjectReport`
+            Description of a subject, in the order of ``files_index``.
+        """
+        self.patterns = {}
+
+        # manifests of the subjects to describe, their stored report is reused otherwise
+        manifests: dict[str, dict[str, Any]] = {}
+        stored: set[str] = set()
+        if self.manifest_dir is not None:
+            key = manifest.report_key(self.layout.root, self.config, separator, self.image_io)
+            for sub, sessions in files_index.items():
+                subject_manifest = manifest.subject_manifest(self.layout.root, sub, sessions, key)
+                if (
+                    manifest.load_subject_report(self.manifest_dir, sub, subject_manifest)
+                    is not None
+                ):
+                    stored.add(sub)
+                else:
+                    manifests[sub] = subject_manifest
+            LOGGER.info(
+                f"Reusing the descriptions of {len(stored)} of {len(files_index)} subjects."
+            )
+
+        to_describe = {sub: ses for sub, ses in files_index.items() if sub not in stored}
+        n_jobs = _effective_n_jobs(n_jobs)
+        if n_jobs == 1 or len(to_describe) <= 1:
+            subject_descriptions: Iterator[SubjectDescription] = (
+                self._describe_subject(subject=sub, sessions=sessions)
+                for sub, sessions in to_describe.items()
+            )
+        else:
+            subject_descriptions = self._describe_subjects_parallel(to_describe, n_jobs)
+
+        rendered: dict[Hashable, SubjectReport] = {}
+        for subject in files_index:
+            if subject in stored:
+                # read again to only keep the unique descriptions in memory
+                subject_report = SubjectReport.from_dict(
+                    manifest.load_subject_report(self.manifest_dir, subject)
+                )
+            else:
+                subject_description = next(subject_descriptions)
+                key = _subject_fingerprint(subject_description)
+                if key not in rendered:
+                    rendered[key] = _render_subject(subject_description, separator, key)
+                subject_report = rendered[key]._replace(subject=subject)
+                if self.manifest_dir is not None:
+                    manifest.save_subject_report(
+                        self.manifest_dir,
+                        subject,
+                        subject_report.to_dict(),
+                        manifests.pop(subject),
+                    )
+
+            self.patterns.setdefault(subject_report.description, []).append(subject)
+            yield subject_report
+
+        LOGGER.debug(f"Rendered {len(rendered)} descriptions for {len(to_describe)} subjects.")
+
+    def _describe_subjects_parallel(
+        self,
+        files_index: dict[str, dict[str | None, list[utils.FileRecord]]],
+        n_jobs: int,
+    ) -> Iterator[SubjectDescription]:
+        """Collect the data describing each subject in parallel processes."""
+        # records are sent as they are, workers do not have to look the files up
+        tasks = list(files_index.items())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            database_file = self.layout.connection_manager.database_file
+            if database_file is None:
+                # Workers load the index from disk instead of indexing the dataset again.
+                self.layout.save(tmpdir, replace_connection=False)
+                database_path = Path(tmpdir)
+            else:
+                database_path = Path(database_file).parent
+
+            # flush so that workers can reuse the headers already read
+            self.header_cache.flush()
+            with ProcessPoolExecutor(
+                max_workers=min(n_jobs, len(tasks)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(
+                    database_path,
+                    self.config,
+                    self.header_cache.db_file,
+                    self.io_threads,
+                    self.image_io,
+                    LOGGER.level,
+                    templates.get_registry().bundle(),
+                    profiling.enabled(),
+                ),
+            ) as executor:
+                # map returns the results in the order of the tasks,
+                # so the output does not depend on the number of processes.
+                for subject_description, reused, refreshed, records in executor.map(
+                    _describe_subject_worker, tasks
+                ):
+                    self.header_cache.reused += reused
+                    self.header_cache.refreshed += refreshed
+                    for record in records:
+                        profiling.record(*record)
+                    yield subject_description
+
+    def _report_subject(
+        self,
+        subject: str,
+        sessions: dict[str | None, list[utils.FileRecord]],
+        separator: str = "\n",
+    ) -> str:
         """Write a report for a single subject.
 
         Parameters
@@ -162,13 +430,11 @@ class BIDSReport:
         subject : :obj:`str`
             Subject ID.
 
-        Attributes
-        ----------
-        layout : :obj:`bids.layout.BIDSLayout`
-            Layout object for a BIDS dataset.
+        sessions : :obj:`dict`
+            Data files of the subject, grouped by session.
 
-        config : :obj:`dict`
-            Configuration info for methods generation.
+        separator : :obj:`str`
+            String used to join the paragraphs of the description.
 
         Returns
         -------
@@ -176,37 +442,172 @@ class BIDSReport:
             A publication-ready report of the dataset's data acquisition
             information. Each scan type is given its own paragraph.
         """
-        description_list = []
-        # Remove session from kwargs if provided, else set session as all available
-        sessions = kwargs.pop("session", self.layout.get_sessions(subject=subject, **kwargs))
+        return _render_subject(self._describe_subject(subject, sessions), separator).description
+
+    def _describe_subject(
+        self,
+        subject: str,
+        sessions: dict[str | None, list[utils.FileRecord]],
+    ) -> SubjectDescription:
+        """Collect the data describing a single subject, without rendering it.
+
+        Parameters
+        ----------
+        subject : :obj:`str`
+            Subject ID.
+
+        sessions : :obj:`dict`
+            Data files of the subject, grouped by session.
+
+        Returns
+        -------
+        subject_description : :obj:`tuple`
+            Paragraphs of each session, as returned by
+            :func:`~bids.ext.reports.parsing.describe_files`,
+            and final paragraph of the description.
+        """
+        session_paragraphs = []
+        metadata = None
+
         if not sessions:
-            sessions = [None]
-        elif not isinstance(sessions, list):
-            sessions = [sessions]
-
-        for ses in sessions:
-            data_files = self.layout.get(
-                subject=subject,
-                extension=[".nii", ".nii.gz", ".set", ".fif", ".edf", ".bdf", ".snirf"],
-                **kwargs,
+            LOGGER.warning(f"No imaging files for subject {subject}")
+
+        # read the entities and metadata of the subject with a few queries
+        self.metadata_cache.prefetch(
+            self.layout, [f for data_files in sessions.values() for f in data_files]
+        )
+
+        for ses, data_files in sessions.items():
+            paragraphs = parsing.describe_files(
+                self.layout,
+                data_files,
+                self.config,
+                self.filename_index,
+                self.metadata_cache,
+                self.header_cache,
+                self.io_threads,
+                self.image_io,
             )
+            session_paragraphs.append((ses, paragraphs))
+            metadata = self.metadata_cache.get(data_files[0])
 
-            if data_files:
-                ses_description = parsing.parse_files(
-                    self.layout,
-                    data_files,
-                    self.config,
-                )
-                ses_description[0] = f"In session {ses}, " + ses_description[0]
-                description_list += ses_description
-                metadata = self.layout.get_metadata(data_files[0].path)
-            else:
-                LOGGER.warning(f"No imaging files for subject {subject}")
-                metadata = None
-
-        # Assume all data were converted the same way and use the first nifti
+        # Assume all data were converted the same way and use the last nifti
         # file's json for conversion information.
-        description = "\n".join(description_list)
-        if metadata:
-            description += f"\n\n{parsing.final_paragraph(metadata)}"
-        return description
+        final = parsing.final_paragraph(metadata) if metadata else None
+        return session_paragraphs, final
+
+
+def _subject_fingerprint(subject_description: SubjectDescription) -> Hashable:
+    """Return a hashable key identical for subjects with the same description."""
+    session_paragraphs, final = subject_description
+    return (
+        tuple(
+            (ses, tuple(templates.fingerprint(*paragraph) for paragraph in paragraphs))
+            for ses, paragraphs in session_paragraphs
+        ),
+        final,
+    )
+
+
+def _render_subject(
+    subject_description: SubjectDescription,
+    separator: str = "\n",
+    fingerprint: Hashable | None = None,
+) -> SubjectReport:
+    """Render the description of a subject returned by ``BIDSReport._describe_subject``.
+
+    The subject ID of the returned report is left empty.
+    The fingerprint of the description is computed if not given.
+    """
+    session_paragraphs, final = subject_description
+    session_descriptions = {}
+    for ses, paragraphs in session_paragraphs:
+        ses_description = [parsing.render_paragraph(paragraph) for paragraph in paragraphs]
+        ses_description[0] = f"In session {ses}, " + ses_description[0]
+        session_descriptions[ses] = separator.join(ses_description)
+
+    description = separator.join(session_descriptions.values())
+    if final:
+        description += f"\n\n{final}"
+
+    if fingerprint is None:
+        fingerprint = _subject_fingerprint(subject_description)
+    return SubjectReport(
+        subject="",
+        session_descriptions=session_descriptions,
+        fingerprint=hashlib.sha256(repr(fingerprint).encode()).hexdigest(),
+        description=description,
+    )
+
+
+def _effective_n_jobs(n_jobs: int | None) -> int:
+    """Return the number of processes to use."""
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    if n_jobs == 0:
+        raise ValueError("n_jobs must be a non-zero integer.")
+    return n_jobs
+
+
+# Report used by each worker process, set by _init_worker.
+_WORKER_REPORT: BIDSReport | None = None
+# Profiler of each worker process, if the main process is profiled.
+_WORKER_PROFILER: profiling.Profiler | None = None
+
+
+def _init_worker(
+    database_path: Path,
+    config: dict[str, dict[str, str]],
+    header_cache_file: Path | None,
+    io_threads: int,
+    image_io: bool,
+    log_level: int,
+    templates_bundle: dict[str, dict[str, str]],
+    profile: bool = False,
+) -> None:
+    """Load the layout and the templates once per worker process."""
+    global _WORKER_PROFILER, _WORKER_REPORT
+    LOGGER.setLevel(log_level)
+    if profile:
+        _WORKER_PROFILER = profiling.Profiler()
+        profiling.add_collector(_WORKER_PROFILER)
+    templates.set_registry(templates.TemplateRegistry(bundle=templates_bundle))
+    layout = BIDSLayout.load(database_path)
+    _WORKER_REPORT = BIDSReport(
+        layout,
+        config=config,
+        header_cache=HeaderCache(header_cache_file),
+        io_threads=io_threads,
+        image_io=image_io,
+    )
+
+
+def _describe_subject_worker(
+    task: tuple[str, dict[str | None, list[utils.FileRecord]]],
+) -> tuple[SubjectDescription, int, int, list[profiling.Record]]:
+    """Collect the data describing a single subject in a worker process.
+
+    Returns the description data of the subject,
+    the number of image headers reused from and added to the cache,
+    and the timings of the stages if the main process is profiled.
+    """
+    assert _WORKER_REPORT is not None
+    subject, sessions = task
+    report = _WORKER_REPORT
+    header_cache = report.header_cache
+    reused, refreshed = header_cache.reused, header_cache.refreshed
+    subject_description = report._describe_subject(subject=subject, sessions=sessions)
+    header_cache.flush()
+
+    records = []
+    if _WORKER_PROFILER is not None:
+        records = _WORKER_PROFILER.records()
+        _WORKER_PROFILER.clear()
+    return (
+        subject_description,
+        header_cache.reused - reused,
+        header_cache.refreshed - refreshed,
+        records,
+    )
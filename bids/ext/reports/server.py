@@ -0,0 +1,362 @@
+"""Serve reports on datasets kept indexed in memory.
+
+Each call of ``pybids_reports`` imports the package and indexes the dataset again.
+:class:`ReportServer` keeps a :class:`bids.layout.BIDSLayout`
+and a :class:`~bids.ext.reports.BIDSReport` per registered dataset,
+so that reports, filtered by subject, session or datatype, are generated
+from warm caches and reused until the dataset changes.
+
+A dataset is indexed again when it is explicitly invalidated,
+or when its fingerprint (see :func:`~bids.ext.reports.layout_db.tree_fingerprint`)
+changed since it was indexed.
+The fingerprint includes the modification times of the files of the subjects
+and at the top level of the dataset, so that editing a sidecar in place is noticed.
+
+:func:`make_http_server` exposes a :class:`ReportServer` over HTTP,
+on a port of the local host or on a Unix socket:
+
+``GET /datasets``
+    List the registered datasets.
+``POST /datasets``
+    Register the dataset given as ``{"name": ..., "path": ...}``.
+``GET /datasets/<name>``
+    Describe a registered dataset.
+``DELETE /datasets/<name>``
+    Forget a dataset.
+``GET /datasets/<name>/report?subject=01&session=01&datatype=func``
+    Report on a dataset, optionally filtered.
+    Each filter can be repeated to select several values.
+``POST /datasets/<name>/invalidate``
+    Index a dataset again.
+
+Requests are handled one at a time.
+"""
+
+from __future__ import annotations
+
+import json
+import socketserver
+from collections import Counter, OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from time import monotonic, perf_counter, time
+from typing import Any
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from bids.layout import BIDSLayout
+
+from .layout_db import tree_fingerprint
+from .logger import pybids_reports_logger
+from .nifti import HeaderCache
+from .report import BIDSReport
+from .utils import get_subjects
+
+LOGGER = pybids_reports_logger()
+
+# Filters accepted by report requests.
+FILTERS = ("subject", "session", "datatype")
+
+
+class UnknownDatasetError(KeyError):
+    """No dataset is registered under the requested name."""
+
+
+class _WarmDataset:
+    """Layout, report and cached results of a registered dataset."""
+
+    def __init__(self, root: Path, header_cache: HeaderCache):
+        self.root = root
+        self.header_cache = header_cache
+        self.layout: BIDSLayout
+        self.report: BIDSReport
+        self.fingerprint = ""
+        self.indexed_at = 0.0
+        self.checked_at = 0.0
+        self.results: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+
+class ReportServer:
+    """Keep registered datasets indexed and answer report requests on them.
+
+    Parameters
+    ----------
+    config : :obj:`dict`, optional
+        Configuration info for methods generation, see :class:`~bids.ext.reports.BIDSReport`.
+
+    io_threads : :obj:`int`
+        Maximum number of threads used to read the image headers of a session.
+
+    check_interval : :obj:`float`
+        Minimum time between two checks of the fingerprint of a dataset, in seconds.
+        Computing the fingerprint stats the files of the dataset,
+        so a positive interval keeps bursts of requests fast.
+        The check is skipped if negative.
+
+    max_results : :obj:`int`
+        Maximum number of reports kept per dataset.
+    """
+
+    def __init__(
+        self,
+        config: dict[str, dict[str, str]] | None = None,
+        io_threads: int = 4,
+        check_interval: float = 1.0,
+        max_results: int = 128,
+    ):
+        self.config = config
+        self.io_threads = io_threads
+        self.check_interval = check_interval
+        self.max_results = max_results
+        self.datasets: dict[str, _WarmDataset] = {}
+
+    def register(self, name: str, bids_dir: str | Path) -> dict[str, Any]:
+        """Index a dataset and keep it under a name.
+
+        A dataset already registered under the same name is replaced.
+
+        Returns
+        -------
+        info : :obj:`dict`
+            As returned by :meth:`info`.
+        """
+        dataset = _WarmDataset(Path(bids_dir).absolute(), HeaderCache())
+        self._index(name, dataset)
+        self.datasets[name] = dataset
+        return self.info(name)
+
+    def unregister(self, name: str) -> None:
+        """Forget a dataset."""
+        self._get(name)
+        del self.datasets[name]
+
+    def invalidate(self, name: str) -> dict[str, Any]:
+        """Index a dataset again and forget its reports.
+
+        Image headers are kept, as their cache checks the size
+        and modification time of the images.
+        """
+        self._index(name, self._get(name))
+        return self.info(name)
+
+    def info(self, name: str) -> dict[str, Any]:
+        """Return the path, number of subjects and indexing time of a dataset."""
+        dataset = self._get(name)
+        return {
+            "name": name,
+            "path": str(dataset.root),
+            "subjects": len(get_subjects(dataset.layout)),
+            "indexed_at": dataset.indexed_at,
+            "reports": len(dataset.results),
+        }
+
+    def report(self, name: str, **filters: str | list[str] | None) -> dict[str, Any]:
+        """Report on a dataset.
+
+        The dataset is indexed again first if its fingerprint changed.
+
+        Parameters
+        ----------
+        name : :obj:`str`
+            Name of the dataset.
+
+        filters : :obj:`str` or :obj:`list` of :obj:`str`
+            Subjects, sessions or datatypes to report on, see :data:`FILTERS`.
+
+        Returns
+        -------
+        result : :obj:`dict`
+            ``report`` with the most common description,
+            ``patterns`` with each unique description and its subjects,
+            ``cached`` telling whether the report was reused
+            and ``elapsed`` with the time spent on the request, in seconds.
+
+        Raises
+        ------
+        UnknownDatasetError
+            If no dataset is registered under this name.
+
+        ValueError
+            If a filter is not one of :data:`FILTERS`.
+        """
+        start = perf_counter()
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {sorted(unknown)}. Use one of {FILTERS}.")
+        filters = {key: value for key, value in filters.items() if value}
+
+        dataset = self._get(name)
+        self._refresh_if_changed(name, dataset)
+
+        key = json.dumps(filters, sort_keys=True)
+        cached = key in dataset.results
+        if cached:
+            dataset.results.move_to_end(key)
+        else:
+            for _ in dataset.report.iter_subjects(**filters):
+                pass
+            patterns = dataset.report.patterns
+            counter = Counter({desc: len(subs) for desc, subs in patterns.items()})
+            dataset.results[key] = {
+                "report": counter.most_common(1)[0][0] if counter else None,
+                "patterns": [
+                    {"description": description, "subjects": subjects}
+                    for description, subjects in patterns.items()
+                ],
+            }
+            if len(dataset.results) > self.max_results:
+                dataset.results.popitem(last=False)
+
+        return {
+            "dataset": name,
+            "filters": filters,
+            **dataset.results[key],
+            "cached": cached,
+            "elapsed": perf_counter() - start,
+        }
+
+    def _get(self, name: str) -> _WarmDataset:
+        if name not in self.datasets:
+            raise UnknownDatasetError(f"No dataset registered as '{name}'.")
+        return self.datasets[name]
+
+    def _index(self, name: str, dataset: _WarmDataset) -> None:
+        LOGGER.info(f"Indexing {name} ({dataset.root}).")
+        fingerprint = tree_fingerprint(dataset.root, files=True)
+        dataset.layout = BIDSLayout(dataset.root)
+        dataset.report = BIDSReport(
+            dataset.layout,
+            config=self.config,
+            header_cache=dataset.header_cache,
+            io_threads=self.io_threads,
+        )
+        dataset.fingerprint = fingerprint
+        dataset.indexed_at = time()
+        dataset.checked_at = monotonic()
+        dataset.results.clear()
+
+    def _refresh_if_changed(self, name: str, dataset: _WarmDataset) -> None:
+        if self.check_interval < 0 or monotonic() - dataset.checked_at < self.check_interval:
+            return
+        dataset.checked_at = monotonic()
+        if tree_fingerprint(dataset.root, files=True) != dataset.fingerprint:
+            LOGGER.info(f"{name} changed since it was indexed.")
+            self._index(name, dataset)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server: _HTTPServer | _UnixHTTPServer
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        segments = [unquote(segment) for segment in url.path.split("/") if segment]
+        reports = self.server.reports
+        try:
+            if method == "GET" and segments in ([], ["datasets"]):
+                self._send(HTTPStatus.OK, [reports.info(name) for name in reports.datasets])
+            elif method == "POST" and segments == ["datasets"]:
+                body = self._read_json()
+                if not isinstance(body, dict) or "path" not in body:
+                    raise ValueError("Expected a JSON object with a 'path'.")
+                if not Path(body["path"]).is_dir():
+                    raise ValueError(f"Not a directory: {body['path']}")
+                name = body.get("name") or Path(body["path"]).absolute().name
+                self._send(HTTPStatus.CREATED, reports.register(name, body["path"]))
+            elif len(segments) == 2 and segments[0] == "datasets" and method == "GET":
+                self._send(HTTPStatus.OK, reports.info(segments[1]))
+            elif len(segments) == 2 and segments[0] == "datasets" and method == "DELETE":
+                reports.unregister(segments[1])
+                self._send(HTTPStatus.OK, {"name": segments[1]})
+            elif segments[:1] == ["datasets"] and segments[2:] == ["report"] and method == "GET":
+                filters = parse_qs(url.query)
+                self._send(HTTPStatus.OK, reports.report(segments[1], **filters))
+            elif (
+                segments[:1] == ["datasets"]
+                and segments[2:] == ["invalidate"]
+                and method == "POST"
+            ):
+                self._send(HTTPStatus.OK, reports.invalidate(segments[1]))
+            else:
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown route: {method} {url.path}"})
+        except UnknownDatasetError as exc:
+            self._send(HTTPStatus.NOT_FOUND, {"error": exc.args[0]})
+        except ValueError as exc:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+        except Exception as exc:
+            LOGGER.exception(f"{method} {self.path} failed.")
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"})
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status: HTTPStatus, content: Any) -> None:
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # clients of a Unix socket have no address
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix socket"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        LOGGER.debug(f"{self.address_string()} - {format % args}")
+
+
+class _HTTPServer(HTTPServer):
+    def __init__(self, reports: ReportServer, port: int):
+        self.reports = reports
+        super().__init__(("127.0.0.1", port), _RequestHandler)
+
+
+class _UnixHTTPServer(socketserver.UnixStreamServer):
+    def __init__(self, reports: ReportServer, socket_path: Path):
+        self.reports = reports
+        self.socket_path = socket_path
+        # remove the socket left by a previous server
+        if socket_path.is_socket():
+            socket_path.unlink()
+        super().__init__(str(socket_path), _RequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self.socket_path.is_socket():
+            self.socket_path.unlink()
+
+
+def make_http_server(
+    reports: ReportServer, port: int = 0, socket_path: str | Path | None = None
+) -> socketserver.BaseServer:
+    """Create an HTTP server answering requests with a :class:`ReportServer`.
+
+    The server only listens on the local host, as it has no authentication.
+    Call ``serve_forever()`` on the returned server to start it.
+
+    Parameters
+    ----------
+    reports : :obj:`ReportServer`
+        Registered datasets.
+
+    port : :obj:`int`
+        Port of the local host to listen to. If 0, a free port is chosen.
+
+    socket_path : :obj:`str` or :obj:`pathlib.Path`, optional
+        Path of a Unix socket to listen to instead of a port.
+    """
+    if socket_path is not None:
+        return _UnixHTTPServer(reports, Path(socket_path))
+    return _HTTPServer(reports, port)
@@ -0,0 +1,120 @@
+"""Split the subjects of a report across independent runs and merge their results.
+
+Each shard reports on a deterministic subset of the subjects
+and writes the patterns it found, with their subjects, to a JSON file.
+Merging the files of all shards gives the same patterns as a single run.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from collections.abc import Iterable
+from pathlib import Path
+
+from bids.utils import natural_sort
+
+SHARD_FILENAME = "report_shard-{index}-of-{count}.json"
+
+
+def parse_shard(shard: str) -> tuple[int, int]:
+    """Parse a shard specification of the form ``i/N``, with ``0 <= i < N``.
+
+    Raises
+    ------
+    ValueError
+        If the specification is not valid.
+    """
+    try:
+        index, count = (int(value) for value in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be of the form 'i/N', got '{shard}'.") from None
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1}, got {index}.")
+    return index, count
+
+
+def shard_subjects(subjects: Iterable[str], index: int, count: int) -> list[str]:
+    """Return the subjects assigned to a shard.
+
+    Subjects are assigned from a checksum of their label,
+    so that a subject stays in the same shard when subjects are added to the dataset.
+
+    Parameters
+    ----------
+    subjects : iterable of :obj:`str`
+        Labels of all subjects.
+
+    index : :obj:`int`
+        Index of the shard, from 0 to ``count - 1``.
+
+    count : :obj:`int`
+        Number of shards.
+
+    Returns
+    -------
+    subjects : :obj:`list` of :obj:`str`
+        Sorted labels of the subjects of the shard.
+    """
+    return sorted(sub for sub in set(subjects) if zlib.crc32(sub.encode()) % count == index)
+
+
+def write_patterns(
+    patterns: dict[str, list[str]], path: str | Path, shard: tuple[int, int] | None = None
+) -> None:
+    """Write the patterns of a report and their subjects to a JSON file.
+
+    Parameters
+    ----------
+    patterns : :obj:`dict`
+        Unique descriptions along with the subjects they describe,
+        as in :attr:`~bids.ext.reports.BIDSReport.patterns`.
+
+    path : :obj:`str` or :obj:`pathlib.Path`
+        Output file.
+
+    shard : :obj:`tuple` of :obj:`int`, optional
+        Index and number of shards of the run that found the patterns.
+    """
+    content = {
+        "shard": None if shard is None else list(shard),
+        "patterns": [
+            {"description": description, "subjects": subjects}
+            for description, subjects in patterns.items()
+        ],
+    }
+    Path(path).write_text(json.dumps(content, separators=(",", ":")))
+
+
+def read_patterns(path: str | Path) -> dict[str, list[str]]:
+    """Read the patterns written by :func:`write_patterns`."""
+    content = json.loads(Path(path).read_text())
+    return {pattern["description"]: pattern["subjects"] for pattern in content["patterns"]}
+
+
+def merge_patterns(shard_patterns: Iterable[dict[str, list[str]]]) -> dict[str, list[str]]:
+    """Merge the patterns found by several shards.
+
+    Subjects are sorted in natural order and patterns are ordered by their first subject,
+    as in a single run on all subjects.
+
+    Raises
+    ------
+    ValueError
+        If a subject is part of several shards.
+    """
+    merged: dict[str, list[str]] = {}
+    seen: set[str] = set()
+    for patterns in shard_patterns:
+        for description, subjects in patterns.items():
+            duplicates = seen.intersection(subjects)
+            if duplicates:
+                raise ValueError(f"Subjects found in several shards: {sorted(duplicates)}")
+            seen.update(subjects)
+            merged.setdefault(description, []).extend(subjects)
+
+    merged = {description: natural_sort(subjects) for description, subjects in merged.items()}
+    rank = {subject: i for i, subject in enumerate(natural_sort(seen))}
+    return dict(
+        sorted(merged.items(), key=lambda item: rank[item[1][0]] if item[1] else len(rank))
+    )
@@ -1,27 +1,180 @@
 from __future__ import annotations
 
+from collections.abc import Hashable
 from pathlib import Path
 from typing import Any
 
 import chevron
+from chevron.tokenizer import tokenize
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+# Tokens of a compiled mustache template, as returned by chevron's tokenizer.
+Tokens = list[tuple[str, str]]
+
+
+class TemplateRegistry:
+    """Mustache templates and partials, compiled once and reused for every render.
+
+    Templates are tokenized the first time they are rendered,
+    so that later renders only substitute the data.
+
+    Parameters
+    ----------
+    templates_dir : :obj:`pathlib.Path`, optional
+        Directory with the ``templates`` and ``partials`` subdirectories.
+        Defaults to the templates of the package.
+
+    bundle : :obj:`dict`, optional
+        Preloaded templates, as returned by :meth:`bundle`.
+        If given, the templates are never read from ``templates_dir``.
+    """
+
+    def __init__(
+        self,
+        templates_dir: str | Path = TEMPLATES_DIR,
+        bundle: dict[str, dict[str, str]] | None = None,
+    ):
+        self.templates_dir = Path(templates_dir)
+        self._bundle = bundle
+        self._templates: dict[str, Tokens] = {}
+        self._partials: dict[str, Tokens] = {}
+        self._keys: dict[str, frozenset[str]] = {}
+
+    def bundle(self) -> dict[str, dict[str, str]]:
+        """Return the text of all templates and partials.
+
+        The bundle can be passed to another registry,
+        for example in a worker process, to avoid reading the files again.
+        """
+        if self._bundle is not None:
+            return self._bundle
+        return {
+            kind: {
+                path.name: path.read_text()
+                for path in sorted((self.templates_dir / kind).glob("*.mustache"))
+            }
+            for kind in ("templates", "partials")
+        }
+
+    def _read(self, kind: str, filename: str) -> str | None:
+        if self._bundle is not None:
+            return self._bundle.get(kind, {}).get(filename)
+        path = self.templates_dir / kind / filename
+        return path.read_text() if path.exists() else None
+
+    def _compile(self, template: str) -> Tokens:
+        tokens = list(tokenize(template))
+        for tag, key in tokens:
+            if tag == "partial" and key not in self._partials:
+                # registered before compiling it in case the partial includes itself
+                self._partials[key] = []
+                partial = self._read("partials", f"{key}.mustache")
+                # like chevron, render missing partials as empty strings
+                self._partials[key] = [] if partial is None else self._compile(partial)
+        return tokens
+
+    def tokens(self, template_name: str) -> Tokens:
+        """Return the compiled tokens of a template.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the template does not exist.
+        """
+        if template_name not in self._templates:
+            template = self._read("templates", template_name)
+            if template is None:
+                raise FileNotFoundError(f"Template not found: {template_name}")
+            self._templates[template_name] = self._compile(template)
+        return self._templates[template_name]
+
+    def render(self, template_name: str, data: dict[str, Any] | None = None) -> str:
+        """Render a template with some data."""
+        return chevron.render(
+            template=self.tokens(template_name),
+            data=data,
+            partials_dict=self._partials,
+            # only use the compiled partials
+            partials_path=None,
+        )
+
+    def keys(self, template_name: str) -> frozenset[str]:
+        """Return the keys of the data used by a template, including by its partials."""
+        if template_name not in self._keys:
+            self._keys[template_name] = frozenset(
+                self._tokens_keys(self.tokens(template_name), set())
+            )
+        return self._keys[template_name]
+
+    def _tokens_keys(self, tokens: Tokens, seen_partials: set[str]) -> set[str]:
+        keys = set()
+        for tag, key in tokens:
+            if tag in ("variable", "no escape", "section", "inverted section") and key != ".":
+                # only the top level key of dotted names
+                keys.add(key.split(".")[0])
+            elif tag == "partial" and key not in seen_partials:
+                seen_partials.add(key)
+                keys |= self._tokens_keys(self._partials.get(key, []), seen_partials)
+        return keys
+
+
+_REGISTRY = TemplateRegistry()
+
+
+def get_registry() -> TemplateRegistry:
+    """Return the registry used by :func:`render`."""
+    return _REGISTRY
+
+
+def set_registry(registry: TemplateRegistry) -> None:
+    """Set the registry used by :func:`render`.
+
+    Use it with a registry built from a bundle
+    to render the templates without reading the package directory.
+    """
+    global _REGISTRY
+    _REGISTRY = registry
 
 
 def render(template_name: str, data: dict[str, Any] | None = None) -> str:
     """Render a mustache template."""
-    template_file = Path(__file__).resolve().parent / "templates" / "templates" / template_name
-
-    with open(template_file) as template:
-        args = {
-            "template": template,
-            "data": data,
-            "partials_path": Path(__file__).parent.joinpath("templates", "partials"),
-            #  keep is only available if chevron is installed from github
-            # "keep": True,
-        }
-        tmp = chevron.render(**args)
-        tmp = highlight_missing_tags(tmp)
-
-        return tmp
+    return highlight_missing_tags(_REGISTRY.render(template_name, data))
+
+
+def template_keys(template_name: str) -> frozenset[str]:
+    """Return the keys of the data used by a mustache template, including by its partials."""
+    return _REGISTRY.keys(template_name)
+
+
+def fingerprint(template_name: str | None, data: dict[str, Any]) -> Hashable:
+    """Return a hashable key identifying the rendering of a template with some data.
+
+    Only the values used by the template are taken into account,
+    so that two sets of data giving the same text have the same fingerprint.
+    """
+    if template_name is None:
+        return None
+    keys = template_keys(template_name)
+    return (
+        template_name,
+        tuple(sorted((key, _freeze(value)) for key, value in data.items() if key in keys)),
+    )
+
+
+def _freeze(value: Any) -> Hashable:
+    """Convert nested dictionaries and lists to hashable tuples.
+
+    Scalars are tagged with their type, as e.g. ``8``, ``8.0`` and ``True``
+    compare equal but are rendered differently.
+    """
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((str(k), _freeze(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(_freeze(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    return (type(value).__name__, value)
 
 
 def highlight_missing_tags(foo: str, color="cyan") -> str:
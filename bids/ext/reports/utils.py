@@ -6,62 +6,571 @@ methods section from a BIDS dataset.
 
 from __future__ import annotations
 
+import json
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from operator import attrgetter, methodcaller
+from pathlib import Path
 from typing import Any
 
 from bids.layout import BIDSFile, BIDSLayout
+from bids.layout.models import Tag, type_map
+from bids.layout.utils import BIDSMetadata
+from bids.utils import natural_sort
 
+from . import profiling
 from .logger import pybids_reports_logger
 
 LOGGER = pybids_reports_logger()
 
+# Number of files whose tags are read per query,
+# below the maximum number of parameters of a query of old SQLite versions.
+TAG_QUERY_CHUNK_SIZE = 900
+
+MULTICONTRAST_ENTITIES = ["echo", "part", "ch", "direction"]
+MULTICONTRAST_SUFFIXES = [
+    ("bold", "phase"),
+    ("phase1", "phase2", "phasediff", "magnitude1", "magnitude2"),
+]
+_SUFFIX_FAMILIES = {suffix: family for family in MULTICONTRAST_SUFFIXES for suffix in family}
+
+
+class FileRecord:
+    """Compact and immutable record of the path and entities of a file.
+
+    Reports convert each :class:`bids.layout.BIDSFile` once with :func:`file_records`
+    and then only work with records, which unlike ``BIDSFile`` objects
+    hold no reference to the layout database and are cheap to send to other processes.
+
+    Parameters
+    ----------
+    path : :obj:`str`
+        Absolute path of the file.
+
+    subject, session, task, run, echo, datatype, suffix, extension : optional
+        Entities of the file, None if the file does not have them.
+
+    other_entities : :obj:`tuple`
+        Other entities of the file, as sorted ``(name, value)`` pairs.
+    """
+
+    __slots__ = (
+        "datatype",
+        "echo",
+        "extension",
+        "other_entities",
+        "path",
+        "run",
+        "session",
+        "subject",
+        "suffix",
+        "task",
+    )
+
+    # entities stored in their own attribute, in the order of the parameters
+    ENTITIES = ("subject", "session", "task", "run", "echo", "datatype", "suffix", "extension")
+
+    path: str
+    subject: str | None
+    session: str | None
+    task: str | None
+    run: int | None
+    echo: int | None
+    datatype: str | None
+    suffix: str | None
+    extension: str | None
+    other_entities: tuple[tuple[str, Any], ...]
+
+    def __init__(
+        self,
+        path: str,
+        subject: str | None = None,
+        session: str | None = None,
+        task: str | None = None,
+        run: int | None = None,
+        echo: int | None = None,
+        datatype: str | None = None,
+        suffix: str | None = None,
+        extension: str | None = None,
+        other_entities: tuple[tuple[str, Any], ...] = (),
+    ):
+        for name, value in zip(
+            ("path", *self.ENTITIES, "other_entities"),
+            (path, subject, session, task, run, echo, datatype, suffix, extension, other_entities),
+            strict=True,
+        ):
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_entities(cls, path: str, entities: dict[str, Any]) -> FileRecord:
+        """Create the record of a file from its entities, as returned by ``get_entities()``."""
+        return cls(
+            path,
+            *(entities.get(name) for name in cls.ENTITIES),
+            other_entities=tuple(
+                sorted((k, v) for k, v in entities.items() if k not in cls.ENTITIES)
+            ),
+        )
+
+    @property
+    def filename(self) -> str:
+        """Name of the file."""
+        return Path(self.path).name
+
+    def entity_items(self) -> Iterator[tuple[str, Any]]:
+        """Iterate over the ``(name, value)`` pairs of the entities of the file."""
+        for name in self.ENTITIES:
+            value = getattr(self, name)
+            if value is not None:
+                yield name, value
+        yield from self.other_entities
+
+    def get_entities(self) -> dict[str, Any]:
+        """Return the entities of the file, as ``BIDSFile.get_entities()`` does."""
+        return dict(self.entity_items())
+
+    def _astuple(self) -> tuple[Any, ...]:
+        return (self.path, *(getattr(self, name) for name in self.ENTITIES), self.other_entities)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self) -> tuple[type[FileRecord], tuple[Any, ...]]:
+        return self.__class__, self._astuple()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, FileRecord):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def __hash__(self) -> int:
+        return hash(self._astuple())
+
 
 def collect_associated_files(
-    layout: BIDSLayout, files: list[BIDSFile], extra_entities: list[str] | None = None
-) -> list[BIDSFile]:
+    files: list[BIDSFile] | list[FileRecord],
+    extra_entities: list[str] | None = None,
+    metadata_cache: MetadataCache | None = None,
+) -> list[list[BIDSFile]] | list[list[FileRecord]]:
     """Collect and group BIDSFiles with multiple files per acquisition.
 
+    Files are grouped in a single pass over the input list
+    and no additional query is made to the layout.
+
     Parameters
     ----------
-    layout : :obj:`bids.layout.BIDSLayout`
-        Layout object for a BIDS dataset.
-    files : :obj:`list` of :obj:`bids.layout.BIDSFile`
+    files : :obj:`list` of :obj:`bids.layout.BIDSFile` or :obj:`FileRecord`
         Files to group.
     extra_entities : :obj:`list` of :obj:`str`, optional
         Additional entities to use when grouping.
         Default is an empty list.
+    metadata_cache : :obj:`MetadataCache`, optional
+        Cache used to read the entities of the files that are not records.
+        If None, they are queried file by file.
 
     Returns
     -------
-    collected_files : :obj:`list` of :obj:`list` of :obj:`bids.layout.BIDSFile`
+    collected_files : :obj:`list` of :obj:`list`
+        Groups of files, in the order in which
+        the first file of each group appears in ``files``.
     """
-    if extra_entities is None:
-        extra_entities = []
-    MULTICONTRAST_ENTITIES = ["echo", "part", "ch", "direction"]
-    MULTICONTRAST_SUFFIXES = [
-        ("bold", "phase"),
-        ("phase1", "phase2", "phasediff", "magnitude1", "magnitude2"),
-    ]
-    if len(extra_entities):
-        MULTICONTRAST_ENTITIES += extra_entities
+    ignored_entities = set(MULTICONTRAST_ENTITIES)
+    if extra_entities:
+        ignored_entities.update(extra_entities)
 
-    collected_files: list[BIDSFile] = []
+    # Group files with differing multi-contrast entity values, but same
+    # everything else.
+    collected_files: dict[tuple[Any, ...], list[Any]] = {}
+    get_entities = (
+        methodcaller("get_entities") if metadata_cache is None else metadata_cache.entities
+    )
     for f in files:
-        if len(collected_files) and any(f in filegroup for filegroup in collected_files):
-            continue
-        ents = f.get_entities()
-        ents = {k: v for k, v in ents.items() if k not in MULTICONTRAST_ENTITIES}
-
-        # Group files with differing multi-contrast entity values, but same
-        # everything else.
-        all_suffixes = ents["suffix"]
-        for mcs in MULTICONTRAST_SUFFIXES:
-            if ents["suffix"] in mcs:
-                all_suffixes = mcs
-                break
-        ents.pop("suffix")
-        associated_files = layout.get(suffix=all_suffixes, **ents)
-        collected_files.append(associated_files)
-    return collected_files
+        if isinstance(f, FileRecord):
+            key = _acquisition_key(f.suffix, f.entity_items(), ignored_entities)
+        else:
+            ents = get_entities(f)
+            key = _acquisition_key(ents.get("suffix"), ents.items(), ignored_entities)
+        collected_files.setdefault(key, []).append(f)
+    return list(collected_files.values())
+
+
+def _acquisition_key(
+    suffix: str | None, entity_items: Iterable[tuple[str, Any]], ignored_entities: set[str]
+) -> tuple[Any, ...]:
+    """Compute a hashable key identifying the acquisition a file belongs to.
+
+    Multi-contrast entities are dropped
+    and the suffix is replaced by the family of suffixes it belongs to.
+    """
+    suffix_family = _SUFFIX_FAMILIES.get(suffix, suffix)
+    key = tuple(
+        sorted((k, v) for k, v in entity_items if k not in ignored_entities and k != "suffix")
+    )
+    return (suffix_family, *key)
+
+
+def index_files_by_subject_session(
+    files: list[BIDSFile] | list[FileRecord],
+    metadata_cache: MetadataCache | None = None,
+) -> dict[str | None, dict[str | None, list[Any]]]:
+    """Bucket files by subject and session in a single pass.
+
+    Parameters
+    ----------
+    files : :obj:`list` of :obj:`bids.layout.BIDSFile` or :obj:`FileRecord`
+        Files to index.
+
+    metadata_cache : :obj:`MetadataCache`, optional
+        Cache used to read the entities of the files that are not records.
+        If None, they are queried file by file.
+
+    Returns
+    -------
+    index : :obj:`dict`
+        Nested dictionary mapping each subject to a dictionary
+        mapping each of its sessions to its files.
+        Subjects and sessions are sorted,
+        files keep the order they had in the input list.
+        Files without a session are stored under the ``None`` key.
+    """
+    index: dict[str | None, dict[str | None, list[Any]]] = {}
+    get_entities = attrgetter("entities") if metadata_cache is None else metadata_cache.entities
+    for f in files:
+        if isinstance(f, FileRecord):
+            subject, session = f.subject, f.session
+        else:
+            ents = get_entities(f)
+            subject, session = ents.get("subject"), ents.get("session")
+        index.setdefault(subject, {}).setdefault(session, []).append(f)
+    return {
+        sub: dict(sorted(index[sub].items(), key=lambda item: _sort_key(item[0])))
+        for sub in sorted(index, key=_sort_key)
+    }
+
+
+def _sort_key(label: str | None) -> tuple[bool, str]:
+    """Sort key for entity labels that may be missing."""
+    return (label is not None, label or "")
+
+
+class FilenameIndex:
+    """Lookup table from paths to the NIfTI files of a layout.
+
+    The table is only built the first time a file is looked up,
+    and then reused for all subsequent lookups.
+
+    Parameters
+    ----------
+    layout : :obj:`bids.layout.BIDSLayout`
+        Layout object for a BIDS dataset.
+    """
+
+    def __init__(self, layout: BIDSLayout):
+        self.layout = layout
+        self._index: dict[str, BIDSFile] | None = None
+
+    @property
+    def index(self) -> dict[str, BIDSFile]:
+        """Return the lookup table, building it if needed."""
+        if self._index is None:
+            self._index = self._build()
+        return self._index
+
+    def _build(self) -> dict[str, BIDSFile]:
+        index: dict[str, BIDSFile] = {}
+        root = Path(self.layout.root)
+        with profiling.timer("query"):
+            files = self.layout.get(extension=[".nii", ".nii.gz"])
+        for f in files:
+            index[Path(f.path).relative_to(root).as_posix()] = f
+            index.setdefault(f.filename, f)
+        return index
+
+    def get(self, target: str) -> BIDSFile | None:
+        """Return the file an IntendedFor target points to.
+
+        Parameters
+        ----------
+        target : :obj:`str`
+            Path relative to the dataset root,
+            path relative to the subject folder,
+            or BIDS URI (``bids::sub-01/func/sub-01_task-rest_bold.nii.gz``).
+
+        Returns
+        -------
+        file : :obj:`bids.layout.BIDSFile` or None
+            None if no file matches the target.
+        """
+        if target.startswith("bids:"):
+            # bids:<dataset-name>:<relative-path>
+            target = target.split(":", 2)[-1]
+        target = target.lstrip("/")
+        if target in self.index:
+            return self.index[target]
+        return self.index.get(Path(target).name)
+
+
+def fetch_tags(
+    layout: BIDSLayout, paths: Iterable[str], metadata: bool = True
+) -> tuple[dict[str, dict[str, Any]], dict[str, dict[str, Any]]]:
+    """Read the entities and metadata of many files with a few queries.
+
+    :meth:`bids.layout.BIDSFile.get_entities` and
+    :meth:`bids.layout.BIDSFile.get_metadata` make a query per file.
+    This function reads the tags of :data:`TAG_QUERY_CHUNK_SIZE` files per query instead.
+
+    Parameters
+    ----------
+    layout : :obj:`bids.layout.BIDSLayout`
+        Layout the files belong to.
+
+    paths : iterable of :obj:`str`
+        Paths of the files.
+
+    metadata : :obj:`bool`
+        Also read the metadata of the files.
+
+    Returns
+    -------
+    entities : :obj:`dict`
+        Entities of each file, as returned by ``get_entities()``.
+
+    metadata : :obj:`dict`
+        Metadata of each file, as returned by ``get_metadata()``.
+        Empty if ``metadata`` is False.
+    """
+    paths = list(dict.fromkeys(paths))
+    entities: dict[str, dict[str, Any]] = {path: {} for path in paths}
+    file_metadata: dict[str, dict[str, Any]] = (
+        {path: BIDSMetadata(path) for path in paths} if metadata else {}
+    )
+    session = layout.connection_manager.session
+    for start in range(0, len(paths), TAG_QUERY_CHUNK_SIZE):
+        query = session.query(
+            Tag.file_path, Tag.entity_name, Tag._value, Tag._dtype, Tag.is_metadata
+        ).filter(Tag.file_path.in_(paths[start : start + TAG_QUERY_CHUNK_SIZE]))
+        if not metadata:
+            query = query.filter(Tag.is_metadata.is_(False))
+        for path, name, value, dtype, is_metadata in query:
+            tags = file_metadata[path] if is_metadata else entities[path]
+            tags[name] = _tag_value(value, dtype)
+    return entities, file_metadata
+
+
+def file_records(layout: BIDSLayout, files: Iterable[BIDSFile | FileRecord]) -> list[FileRecord]:
+    """Convert files to :class:`FileRecord`, reading their entities with a few queries.
+
+    Parameters
+    ----------
+    layout : :obj:`bids.layout.BIDSLayout`
+        Layout the files belong to.
+
+    files : iterable of :obj:`bids.layout.BIDSFile` or :obj:`FileRecord`
+        Files to convert. Records are returned as is.
+
+    Returns
+    -------
+    records : :obj:`list` of :obj:`FileRecord`
+        Records of the files, in the same order.
+    """
+    files = list(files)
+    paths = [f.path for f in files if not isinstance(f, FileRecord)]
+    entities: dict[str, dict[str, Any]] = {}
+    if paths:
+        with profiling.timer("query"):
+            entities, _ = fetch_tags(layout, paths, metadata=False)
+    return [
+        f if isinstance(f, FileRecord) else FileRecord.from_entities(f.path, entities[f.path])
+        for f in files
+    ]
+
+
+def get_subjects(layout: BIDSLayout, **filters: Any) -> list[str]:
+    """Return the subjects of the files matching some filters.
+
+    Same as ``layout.get_subjects(**filters)``,
+    which makes two queries per file to read their entities.
+
+    Parameters
+    ----------
+    layout : :obj:`bids.layout.BIDSLayout`
+        Layout object for a BIDS dataset.
+
+    filters
+        Filters passed to :meth:`bids.layout.BIDSLayout.get`.
+    """
+    files = layout.get(**filters)
+    entities, _ = fetch_tags(layout, (f.path for f in files), metadata=False)
+    return natural_sort({ents["subject"] for ents in entities.values() if "subject" in ents})
+
+
+def _tag_value(value: str, dtype: str) -> Any:
+    """Decode the value of a tag as :class:`bids.layout.models.Tag` does."""
+    if dtype == "json":
+        return json.loads(value)
+    if dtype == "bool":
+        return value == "True"
+    return type_map[dtype](value)
+
+
+class MetadataCache:
+    """Cache of the entities and sidecar metadata of files.
+
+    Metadata are evicted in least-recently-used order,
+    entities are small and kept for all the files seen
+    that are not :class:`FileRecord` objects.
+
+    Parameters
+    ----------
+    maxsize : :obj:`int`
+        Maximum number of files whose metadata is kept in the cache.
+
+    layout : :obj:`bids.layout.BIDSLayout`, optional
+        Layout the files belong to.
+        Required to read the metadata of :class:`FileRecord` objects.
+
+    Attributes
+    ----------
+    hits : :obj:`int`
+        Number of lookups answered from the cache.
+    misses : :obj:`int`
+        Number of files whose metadata had to be read,
+        by a lookup or by :meth:`prefetch`.
+    """
+
+    def __init__(self, maxsize: int = 4096, layout: BIDSLayout | None = None):
+        self.maxsize = maxsize
+        self.layout = layout
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._entities: dict[str, dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, file: BIDSFile | FileRecord) -> dict[str, Any]:
+        """Return the metadata of a file.
+
+        The returned dictionary is shared between calls and must not be modified.
+        """
+        key = file.path
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.misses += 1
+        with profiling.timer("get_metadata"):
+            if not isinstance(file, FileRecord):
+                metadata = file.get_metadata()
+            elif self.layout is None:
+                raise ValueError("The layout of the cache is needed to read records.")
+            else:
+                metadata = fetch_tags(self.layout, [key])[1][key]
+        self._store(key, metadata)
+        return metadata
+
+    def _store(self, key: str, metadata: dict[str, Any]) -> None:
+        self._cache[key] = metadata
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def entities(self, file: BIDSFile | FileRecord) -> dict[str, Any]:
+        """Return the entities of a file, as returned by ``get_entities()``.
+
+        The returned dictionary is shared between calls and must not be modified.
+        """
+        if isinstance(file, FileRecord):
+            return file.get_entities()
+        entities = self._entities.get(file.path)
+        if entities is None:
+            entities = self._entities[file.path] = file.get_entities()
+        return entities
+
+    def prefetch(
+        self,
+        layout: BIDSLayout,
+        files: Iterable[BIDSFile | FileRecord],
+        metadata: bool = True,
+    ) -> None:
+        """Read the entities and metadata of files not in the cache with a few queries.
+
+        See :func:`fetch_tags`.
+
+        Parameters
+        ----------
+        layout : :obj:`bids.layout.BIDSLayout`
+            Layout the files belong to.
+
+        files : iterable of :obj:`bids.layout.BIDSFile` or :obj:`FileRecord`
+            Files whose entities and metadata will be needed.
+            Only pass as many files as the cache can hold.
+
+        metadata : :obj:`bool`
+            Also read the metadata of the files, otherwise only their entities.
+        """
+        paths = []
+        # records already hold their entities
+        entities_needed = set()
+        for f in files:
+            needs_entities = not isinstance(f, FileRecord) and f.path not in self._entities
+            if needs_entities:
+                entities_needed.add(f.path)
+            if needs_entities or (metadata and f.path not in self._cache):
+                paths.append(f.path)
+        if not paths:
+            return
+        with profiling.timer("query"):
+            entities, file_metadata = fetch_tags(layout, paths, metadata)
+        self._entities.update((path, entities[path]) for path in entities_needed)
+        for path, path_metadata in file_metadata.items():
+            if path not in self._cache:
+                self.misses += 1
+                self._store(path, path_metadata)
+
+    def cache_info(self) -> dict[str, int]:
+        """Return the hit and miss statistics of the cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "maxsize": self.maxsize,
+            "currsize": len(self._cache),
+        }
+
+    def clear(self) -> None:
+        """Empty the cache and reset its statistics."""
+        self._cache.clear()
+        self._entities.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def default_metadata_cache(
+    files: Iterable[BIDSFile | FileRecord], metadata_cache: MetadataCache | None = None
+) -> MetadataCache:
+    """Return the cache to read the metadata of files with, a new one if None.
+
+    Raises
+    ------
+    ValueError
+        If no cache is given for :class:`FileRecord` objects,
+        whose metadata can only be read through the layout of a cache.
+    """
+    if metadata_cache is not None:
+        return metadata_cache
+    if any(isinstance(f, FileRecord) for f in files):
+        raise ValueError(
+            "A MetadataCache with the layout of the files is needed to read "
+            "the metadata of FileRecord objects."
+        )
+    return MetadataCache()
 
 
 def reminder() -> str:
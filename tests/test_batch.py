@@ -0,0 +1,70 @@
+"""Tests for bids.ext.reports.batch."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from bids.ext.reports import batch
+
+
+def test_read_dataset_list(tmp_path):
+    datasets_file = tmp_path / "datasets.txt"
+    datasets_file.write_text("# nightly\nds001\n\n/data/ds002\n")
+    assert batch.read_dataset_list(datasets_file) == [
+        tmp_path / "ds001",
+        Path("/data/ds002"),
+    ]
+
+
+def test_output_dirs(tmp_path):
+    datasets = [Path("a/ds001"), Path("b/ds001"), Path("ds002")]
+    assert batch.output_dirs(datasets, tmp_path) == [
+        tmp_path / "ds001",
+        tmp_path / "ds001-2",
+        tmp_path / "ds002",
+    ]
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_run_batch(testdataset, tmp_path, n_workers):
+    """Failures should be reported without stopping the other datasets."""
+    missing = tmp_path / "missing"
+    results = batch.run_batch(
+        [testdataset, missing, testdataset], tmp_path / "output", n_workers=n_workers
+    )
+
+    assert [Path(result.output_dir).name for result in results] == [
+        "synthetic",
+        "missing",
+        "synthetic-2",
+    ]
+    assert [result.error is None for result in results] == [True, False, True]
+    for result in results[::2]:
+        assert result.n_subjects == 5
+        assert result.n_patterns == 1
+        assert (Path(result.output_dir) / "report.txt").is_file()
+
+    table = batch.summary_table(results).splitlines()
+    assert table[-1].startswith("3 datasets, 1 failed")
+
+
+def test_report_dataset_closes_header_cache(testdataset, tmp_path, monkeypatch):
+    """The header cache should be closed even if the report fails."""
+    closed = []
+    close = batch.HeaderCache.close
+
+    def _close(self):
+        closed.append(self.db_file)
+        close(self)
+
+    def _fail(self, *args, **kwargs):
+        raise RuntimeError("report failed")
+
+    monkeypatch.setattr(batch.HeaderCache, "close", _close)
+    monkeypatch.setattr(batch.BIDSReport, "generate", _fail)
+    result = batch.report_dataset(testdataset, tmp_path / "output", tmp_path / "cache")
+
+    assert result.error == "RuntimeError: report failed"
+    assert closed == [tmp_path / "cache" / batch.HEADER_CACHE_FILENAME]
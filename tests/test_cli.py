@@ -2,9 +2,15 @@
 
 from __future__ import annotations
 
+import json
 import os
+import shutil
+
+import pytest
 
 from bids.ext.reports import cli
+from bids.ext.reports.layout_db import FINGERPRINT_FILENAME
+from bids.ext.reports.shards import SHARD_FILENAME, read_patterns
 
 
 def test_cli(testdataset, tmp_path_factory):
@@ -19,3 +25,147 @@ def test_cli(testdataset, tmp_path_factory):
 
     cli.cli(args)
     assert os.path.isfile(os.path.join(tempdir, "report.txt")), os.listdir(tempdir)
+
+
+def test_cli_help_lists_subcommands(capsys):
+    with pytest.raises(SystemExit):
+        cli.cli(["--help"])
+    help_text = capsys.readouterr().out
+    for subcommand in cli.SUBCOMMANDS:
+        assert f"pybids_reports {subcommand}" in help_text
+
+
+def test_cli_dataset_named_as_subcommand(testdataset, tmp_path, monkeypatch):
+    """A dataset directory named after a subcommand should be reported on."""
+    shutil.copytree(testdataset, tmp_path / "merge")
+    monkeypatch.chdir(tmp_path)
+    cli.cli(["merge", "output", "--verbosity", "0"])
+    assert (tmp_path / "output" / "report.txt").is_file()
+
+
+def test_cli_header_cache(testdataset, tmp_path_factory, caplog):
+    """Headers should be read from the cache in a second run."""
+    tempdir = tmp_path_factory.mktemp("test_cli_header_cache")
+    cache_dir = tmp_path_factory.mktemp("cache")
+    args = [str(testdataset), str(tempdir), "--cache-dir", str(cache_dir)]
+
+    cli.cli(args)
+    assert os.path.isfile(os.path.join(cache_dir, cli.HEADER_CACHE_FILENAME))
+
+    caplog.clear()
+    with caplog.at_level("INFO", logger="pybids_reports"):
+        cli.cli(args)
+    assert "0 refreshed" in caplog.text
+
+
+def test_cli_layout_db(testdataset, tmp_path_factory, caplog):
+    """The layout database should be reused in a second run."""
+    tempdir = tmp_path_factory.mktemp("test_cli_layout_db")
+    database_path = tmp_path_factory.mktemp("db")
+    args = [str(testdataset), str(tempdir), "--layout-db", str(database_path)]
+
+    cli.cli(args)
+    assert os.path.isfile(os.path.join(database_path, FINGERPRINT_FILENAME))
+
+    caplog.clear()
+    with caplog.at_level("INFO", logger="pybids_reports"):
+        cli.cli(args)
+    assert "Reusing the layout database" in caplog.text
+
+    caplog.clear()
+    with caplog.at_level("INFO", logger="pybids_reports"):
+        cli.cli([*args, "--reset-db"])
+    assert "Indexing the dataset again" in caplog.text
+
+
+def test_cli_shard_merge(testdataset, tmp_path_factory):
+    """Merging the results of all shards should give the same report as a single run."""
+    single_dir = tmp_path_factory.mktemp("test_cli_single")
+    cli.cli([str(testdataset), str(single_dir), "--verbosity", "0"])
+
+    shard_dir = tmp_path_factory.mktemp("test_cli_shards")
+    shard_files = []
+    for i in range(3):
+        cli.cli([str(testdataset), str(shard_dir), "--shard", f"{i}/3", "--verbosity", "0"])
+        shard_files.append(str(shard_dir / SHARD_FILENAME.format(index=i, count=3)))
+        assert os.path.isfile(shard_files[-1])
+    assert not os.path.isfile(shard_dir / "report.txt")
+
+    merged_dir = tmp_path_factory.mktemp("test_cli_merged")
+    cli.cli(["merge", str(merged_dir), *shard_files, "--verbosity", "0"])
+
+    with open(single_dir / "report.txt") as f, open(merged_dir / "report.txt") as g:
+        assert f.read() == g.read()
+    patterns = read_patterns(merged_dir / cli.PATTERNS_FILENAME)
+    assert sorted(sub for subs in patterns.values() for sub in subs) == [
+        "01",
+        "02",
+        "03",
+        "04",
+        "05",
+    ]
+
+
+def test_cli_incremental(testdataset, tmp_path_factory, caplog):
+    """Descriptions should be reused in a second incremental run."""
+    tempdir = tmp_path_factory.mktemp("test_cli_incremental")
+    args = [str(testdataset), str(tempdir), "--incremental"]
+
+    cli.cli(args)
+    assert os.path.isdir(os.path.join(tempdir, cli.MANIFESTS_DIRNAME))
+
+    caplog.clear()
+    with caplog.at_level("INFO", logger="pybids_reports"):
+        cli.cli(args)
+    assert "Reusing the descriptions of 5 of 5 subjects." in caplog.text
+
+
+def test_cli_no_image_io(testdataset, tmp_path_factory):
+    """Reports should be written without reading the images."""
+    tempdir = tmp_path_factory.mktemp("test_cli_no_image_io")
+    cli.cli([str(testdataset), str(tempdir), "--no-image-io", "--participant_label", "01"])
+    assert os.path.isfile(os.path.join(tempdir, "report.txt"))
+
+
+def test_cli_jsonl(testdataset, tmp_path_factory):
+    """The description of each participant should be written to a JSONL file."""
+    tempdir = tmp_path_factory.mktemp("test_cli_jsonl")
+    cli.cli([str(testdataset), str(tempdir), "--jsonl", "--participant_label", "01", "02"])
+
+    with open(tempdir / cli.SUBJECTS_FILENAME) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line["subject"] for line in lines] == ["01", "02"]
+    with open(tempdir / "report.txt") as f:
+        assert f.read() == lines[0]["description"]
+
+
+def test_cli_profile(testdataset, tmp_path_factory, capsys):
+    """The time spent in each stage should be printed and written to a JSON file."""
+    tempdir = tmp_path_factory.mktemp("test_cli_profile")
+    cli.cli([str(testdataset), str(tempdir), "--profile", "--participant_label", "01"])
+
+    with open(tempdir / cli.PROFILE_FILENAME) as f:
+        profile = json.load(f)
+    assert "index" in profile["stages"]
+    assert "func" in profile["datatypes"]
+    assert "wall time" in capsys.readouterr().err
+
+
+def test_cli_batch(testdataset, tmp_path_factory, capsys):
+    """Each dataset should be reported on in its own directory."""
+    tempdir = tmp_path_factory.mktemp("test_cli_batch")
+    datasets_file = tempdir / "datasets.txt"
+    datasets_file.write_text(f"{testdataset}\n")
+    cli.cli(["batch", str(tempdir), str(testdataset), "--datasets-file", str(datasets_file)])
+
+    assert (tempdir / "synthetic" / "report.txt").is_file()
+    assert (tempdir / "synthetic-2" / "report.txt").is_file()
+    with open(tempdir / cli.SUMMARY_FILENAME) as f:
+        assert len(f.readlines()) == 3
+    assert "2 datasets, 0 failed" in capsys.readouterr().err
+
+    not_bids = tempdir / "not_bids"
+    not_bids.mkdir()
+    with pytest.raises(SystemExit) as exc_info:
+        cli.cli(["batch", str(tempdir), str(not_bids), "--verbosity", "0"])
+    assert exc_info.value.code == 1
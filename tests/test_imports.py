@@ -0,0 +1,61 @@
+"""Tests for the import time of the package."""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "bids.ext.reports.parameters",
+    "bids.ext.reports.parsing",
+    "bids.ext.reports.report",
+    "chevron",
+    "nibabel",
+    "num2words",
+    "numpy",
+    "rich",
+]
+
+# Import time of the command-line interface, on top of pybids itself.
+# On a loaded machine, importing the CLI may take as long as importing pybids.
+IMPORT_TIME_BUDGET = 0.1
+
+
+def _run(code: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def test_cli_import_is_lazy():
+    """Importing the command-line interface should not import the heavy dependencies."""
+    result = _run(
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import bids\n"
+        "baseline = time.perf_counter() - start\n"
+        "start = time.perf_counter()\n"
+        "import bids.ext.reports.cli\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'baseline': baseline, 'elapsed': elapsed, 'loaded': loaded}))\n"
+    )
+    assert result["loaded"] == []
+    assert result["elapsed"] < max(IMPORT_TIME_BUDGET, result["baseline"])
+
+
+def test_lazy_attributes():
+    result = _run(
+        "import json, sys\n"
+        "import bids.ext.reports as reports\n"
+        "before = 'bids.ext.reports.report' in sys.modules\n"
+        "cls = reports.BIDSReport.__name__\n"
+        "print(json.dumps({'before': before, 'cls': cls, 'parsing': reports.parsing.__name__}))\n"
+    )
+    assert result == {
+        "before": False,
+        "cls": "BIDSReport",
+        "parsing": "bids.ext.reports.parsing",
+    }
@@ -0,0 +1,113 @@
+"""Tests for bids.ext.reports.layout_db."""
+
+from __future__ import annotations
+
+import os
+import shutil
+
+import pytest
+
+from bids.ext.reports import BIDSReport
+from bids.ext.reports.layout_db import (
+    FINGERPRINT_FILENAME,
+    load_layout,
+    participant_ignore_patterns,
+    tree_fingerprint,
+)
+
+
+@pytest.fixture
+def dataset_copy(testdataset, tmp_path):
+    """A copy of the test dataset that can be modified."""
+    return shutil.copytree(testdataset, tmp_path / "dataset")
+
+
+def test_tree_fingerprint(dataset_copy):
+    fingerprint = tree_fingerprint(dataset_copy)
+    assert tree_fingerprint(dataset_copy) == fingerprint
+    assert tree_fingerprint(dataset_copy, validate=False) != fingerprint
+
+    (dataset_copy / "sub-01" / "ses-01" / "anat" / "sub-01_ses-01_T2w.nii.gz").touch()
+    assert tree_fingerprint(dataset_copy) != fingerprint
+
+
+def test_tree_fingerprint_files(dataset_copy):
+    """Files modified in place should only change the fingerprint including files."""
+    fingerprint = tree_fingerprint(dataset_copy)
+    with_files = tree_fingerprint(dataset_copy, files=True)
+    assert with_files != fingerprint
+
+    os.utime(dataset_copy / "sub-01" / "ses-01" / "anat" / "sub-01_ses-01_T1w.nii.gz", ns=(1, 1))
+    assert tree_fingerprint(dataset_copy) == fingerprint
+    assert tree_fingerprint(dataset_copy, files=True) != with_files
+
+
+def test_tree_fingerprint_description(dataset_copy):
+    fingerprint = tree_fingerprint(dataset_copy)
+    description = dataset_copy / "dataset_description.json"
+    description.write_text(description.read_text().replace("}", ', "Authors": ["A"]}', 1))
+    assert tree_fingerprint(dataset_copy) != fingerprint
+
+
+def test_load_layout(dataset_copy, tmp_path):
+    database_path = tmp_path / "db"
+
+    layout = load_layout(dataset_copy, database_path=database_path)
+    assert layout.connection_manager._database_reset
+    assert (database_path / FINGERPRINT_FILENAME).exists()
+    n_files = len(layout.get())
+
+    layout = load_layout(dataset_copy, database_path=database_path)
+    assert not layout.connection_manager._database_reset
+    assert len(layout.get()) == n_files
+
+    layout = load_layout(dataset_copy, database_path=database_path, reset_database=True)
+    assert layout.connection_manager._database_reset
+
+    shutil.copy(
+        dataset_copy / "sub-01" / "ses-01" / "anat" / "sub-01_ses-01_T1w.nii.gz",
+        dataset_copy / "sub-01" / "ses-01" / "anat" / "sub-01_ses-01_T2w.nii.gz",
+    )
+    layout = load_layout(dataset_copy, database_path=database_path)
+    assert layout.connection_manager._database_reset
+    assert len(layout.get()) == n_files + 1
+
+
+def test_participant_ignore_patterns():
+    patterns = participant_ignore_patterns(["01", "02"])
+
+    def ignored(path):
+        return any(pattern.search(path) for pattern in patterns)
+
+    assert not ignored("/sub-01")
+    assert not ignored("/sub-02/ses-01/anat")
+    assert not ignored("/task-nback_bold.json")
+    assert ignored("/sub-03")
+    assert ignored("/sub-010")
+    assert ignored("/derivatives")
+    assert ignored("/sourcedata/sub-01")
+    assert ignored("/code")
+
+
+def test_load_layout_participant_label(dataset_copy, tmp_path):
+    (dataset_copy / "derivatives" / "sub-01").mkdir(parents=True)
+    (dataset_copy / "derivatives" / "sub-01" / "sub-01_T1w.nii.gz").touch()
+
+    layout = load_layout(dataset_copy, participant_label=["02"])
+    assert layout.get_subjects() == ["02"]
+    assert layout.get(suffix="description")
+
+    # the database of some participants is not reused for others
+    database_path = tmp_path / "db"
+    load_layout(dataset_copy, database_path=database_path, participant_label=["02"])
+    layout = load_layout(dataset_copy, database_path=database_path, participant_label=["03"])
+    assert layout.connection_manager._database_reset
+    assert layout.get_subjects() == ["03"]
+
+
+def test_load_layout_participant_label_report(testdataset, testlayout):
+    """Indexing only one participant should not change its report."""
+    layout = load_layout(testdataset, participant_label=["02"])
+    assert BIDSReport(layout).generate(subject=["02"]) == BIDSReport(testlayout).generate(
+        subject=["02"]
+    )
@@ -0,0 +1,79 @@
+"""Tests for bids.reports.nifti."""
+
+from __future__ import annotations
+
+import os
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+from bids.ext.reports import nifti
+
+
+def _assert_same_header(header, img):
+    assert header.shape == img.shape
+    assert header.zooms == pytest.approx(img.header.get_zooms())
+    assert header.datatype == int(img.header["datatype"])
+
+
+def test_read_nifti_header(testlayout):
+    files = testlayout.get(subject="01", session="01", extension=[".nii", ".nii.gz"])
+    for f in files:
+        _assert_same_header(nifti.read_nifti_header(f.path), nib.load(f.path))
+
+
+@pytest.mark.parametrize("image_class", [nib.Nifti1Image, nib.Nifti2Image])
+@pytest.mark.parametrize("extension", [".nii", ".nii.gz"])
+@pytest.mark.parametrize("byteorder", ["<", ">"])
+def test_read_nifti_header_formats(tmp_path, image_class, extension, byteorder):
+    header = image_class.header_class(endianness=byteorder)
+    img = image_class(np.zeros((4, 5, 6, 7), dtype=np.int16), affine=np.eye(4), header=header)
+    img.header.set_zooms((1.5, 2.0, 2.5, 0.8))
+    path = tmp_path / f"img{extension}"
+    nib.save(img, path)
+
+    header = nifti.read_nifti_header(path)
+
+    _assert_same_header(header, nib.load(path))
+
+
+@pytest.mark.parametrize("content", [b"", b"not a nifti file" * 100])
+def test_read_nifti_header_invalid(tmp_path, content):
+    path = tmp_path / "img.nii"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        nifti.read_nifti_header(path)
+
+
+def test_read_nifti_header_not_found(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        nifti.read_nifti_header(tmp_path / "img.nii.gz")
+
+
+def test_header_cache(tmp_path):
+    img_file = tmp_path / "img.nii.gz"
+    nib.save(nib.Nifti1Image(np.zeros((4, 5, 6), dtype=np.int16), affine=np.eye(4)), img_file)
+    db_file = tmp_path / "cache" / "headers.sqlite"
+
+    with nifti.HeaderCache(db_file) as header_cache:
+        header = header_cache.get(img_file)
+        assert header_cache.get(img_file) == header
+        assert (header_cache.reused, header_cache.refreshed) == (1, 1)
+
+    with nifti.HeaderCache(db_file) as header_cache:
+        assert header_cache.get(img_file) == header
+        assert (header_cache.reused, header_cache.refreshed) == (1, 0)
+
+    # modifying the file invalidates the entry
+    nib.save(nib.Nifti1Image(np.zeros((4, 5, 7), dtype=np.int16), affine=np.eye(4)), img_file)
+    os.utime(img_file, ns=(0, 0))
+    with nifti.HeaderCache(db_file) as header_cache:
+        assert header_cache.get(img_file).shape == (4, 5, 7)
+        assert (header_cache.reused, header_cache.refreshed) == (0, 1)
+
+
+def test_header_cache_missing_file(tmp_path):
+    header_cache = nifti.HeaderCache()
+    with pytest.raises(FileNotFoundError):
+        header_cache.get(tmp_path / "img.nii.gz")
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 import pytest
 
-from bids.ext.reports import parameters
+from bids.ext.reports import parameters, utils
 
 
 @pytest.mark.parametrize(
@@ -83,6 +83,18 @@ def test_echo_times_fmap(testlayout):
     assert isinstance(te_1, float)
 
 
+def test_echo_time_records(testlayout):
+    """Records should need a metadata cache holding their layout."""
+    files = testlayout.get(subject="01", session="01", suffix="bold", extension=[".nii.gz"])
+    records = utils.file_records(testlayout, files)
+
+    with pytest.raises(ValueError, match="MetadataCache"):
+        parameters.echo_time_ms(records)
+    assert parameters.echo_time_ms(records, utils.MetadataCache(layout=testlayout)) == (
+        parameters.echo_time_ms(files)
+    )
+
+
 def test_describe_func_duration_smoke():
     # given
     n_vols = 100
@@ -127,3 +139,57 @@ def test_intendedfor_targets(testmeta_light, testlayout):
     metadata = fmap_files[0].get_metadata()
     intended_for = parameters.intendedfor_targets(metadata, testlayout)
     assert intended_for == "first and second runs of the N-Back BOLD scan"
+
+
+@pytest.mark.parametrize(
+    "metadata, expected",
+    [
+        ({}, "?x?"),
+        ({"AcquisitionMatrixPE": 64}, "?x64"),
+        ({"BaseResolution": 96, "AcquisitionMatrixPE": 64}, "96x64"),
+        ({"BaseResolution": 96, "ReconMatrixPE": 96, "AcquisitionMatrixPE": 64}, "96x96"),
+    ],
+)
+def test_matrix_size_from_metadata(metadata, expected):
+    """The matrix size should be read from the dcm2niix fields without a header."""
+    assert parameters.matrix_size(None, metadata) == expected
+
+
+def test_image_parameters_without_header():
+    """Voxel size and field of view should be unknown without a header."""
+    assert parameters.voxel_size(None) == "?x?x?"
+    assert parameters.field_of_view(None) == "?x?"
+
+
+@pytest.mark.parametrize(
+    "bvals, expected",
+    [
+        ([0, 1000, 1000, 1000], ((0, 1), (1000, 3))),
+        ([5, 995, 1005, 1000, 0], ((0, 2), (1000, 3))),
+        ([0, 1000, 2000, 1000, 2000, 3000], ((0, 1), (1000, 2), (2000, 2), (3000, 1))),
+        ([], ()),
+    ],
+)
+def test_cluster_shells(bvals, expected):
+    assert parameters.cluster_shells(bvals) == expected
+
+
+def test_read_gradients(tmp_path):
+    bval_file = tmp_path / "sub-01_dwi.bval"
+    bval_file.write_text("0 995 1005\n 2000 2010\n")
+    (tmp_path / "sub-01_dwi.bvec").write_text("0 1 0 1 0\n0 0 1 0 0\n0 0 0 0 0\n")
+
+    gradients = parameters.read_gradients(bval_file)
+    # the last volume has no gradient direction
+    assert gradients.shells == ((0, 2), (1000, 2), (2000, 1))
+    assert gradients.n_volumes == 5
+    assert gradients.n_directions == 3
+    assert parameters.bvals(bval_file) == "0, 1000, and 2000"
+    assert parameters.read_gradients(bval_file) is gradients
+
+    # a modified file is read again
+    bval_file.write_text("0 1000 1000 1000 1000 1000\n")
+    assert parameters.read_gradients(bval_file).shells == ((0, 1), (1000, 5))
+
+    with pytest.raises(OSError):
+        parameters.read_gradients(tmp_path / "missing.bval")
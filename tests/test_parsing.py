@@ -5,6 +5,7 @@ from __future__ import annotations
 from bids.layout import BIDSLayout
 
 from bids.ext.reports import parsing
+from bids.ext.reports.nifti import HeaderCache
 
 
 def test_institution_info(testlayout):
@@ -117,3 +118,17 @@ def test_parse_files_smoke(testlayout, testconfig):
     desc = parsing.parse_files(testlayout, niftis, testconfig)
     assert isinstance(desc, list)
     assert isinstance(desc[0], str)
+
+
+def test_parse_files_prefetch(testlayout, testconfig):
+    """Prefetching the headers should not change the descriptions,
+    and each header should only be read once.
+    """
+    niftis = testlayout.get(subject="01", session="01", extension=[".nii", ".nii.gz"])
+    header_cache = HeaderCache()
+    desc = parsing.parse_files(
+        testlayout, niftis, testconfig, header_cache=header_cache, io_threads=4
+    )
+    assert desc == parsing.parse_files(testlayout, niftis, testconfig)
+    assert header_cache.refreshed == len(header_cache)
+    assert header_cache.reused > 0
@@ -0,0 +1,79 @@
+"""Tests for bids.ext.reports.profiling."""
+
+from __future__ import annotations
+
+from bids.ext.reports import BIDSReport, profiling
+
+
+class ListCollector:
+    def __init__(self):
+        self.records = []
+
+    def record(self, stage, datatype, seconds, calls=1):
+        """Store the stage, datatype and number of calls."""
+        self.records.append((stage, datatype, calls))
+
+
+def test_timer_disabled():
+    """Timers should do nothing without a collector."""
+    assert not profiling.enabled()
+    assert profiling.timer("render") is profiling.timer("query")
+
+
+def test_timer_datatype():
+    """Nested stages should inherit the datatype of the enclosing stage."""
+    collector = ListCollector()
+    profiling.add_collector(collector)
+    try:
+        with profiling.timer("describe", "func"), profiling.timer("read_header"):
+            pass
+        with profiling.timer("query"):
+            pass
+    finally:
+        profiling.remove_collector(collector)
+
+    assert collector.records == [
+        ("read_header", "func", 1),
+        ("describe", "func", 1),
+        ("query", None, 1),
+    ]
+    assert not profiling.enabled()
+
+
+def test_profiler_summary():
+    with profiling.Profiler() as profiler:
+        profiling.record("read_header", "anat", 0.5, calls=2)
+        profiling.record("read_header", "func", 1.5, calls=3)
+        profiling.record("query", None, 1.0)
+
+    summary = profiler.summary()
+    assert summary["stages"] == {
+        "query": {"seconds": 1.0, "calls": 1},
+        "read_header": {"seconds": 2.0, "calls": 5},
+    }
+    assert summary["datatypes"] == {
+        "anat": {"read_header": {"seconds": 0.5, "calls": 2}},
+        "func": {"read_header": {"seconds": 1.5, "calls": 3}},
+    }
+    assert summary["wall_time"] > 0
+
+    table = profiler.table().splitlines()
+    assert table[0].split()[:2] == ["stage", "datatype"]
+    assert [line.split()[:3] for line in table[2:5]] == [
+        ["query", "-", "1"],
+        ["read_header", "anat", "2"],
+        ["read_header", "func", "3"],
+    ]
+
+
+def test_profile_report(testlayout):
+    """Stages of a report should be timed per datatype, also in worker processes."""
+    for n_jobs in (1, 2):
+        with profiling.Profiler() as profiler:
+            BIDSReport(testlayout).generate(n_jobs=n_jobs)
+        summary = profiler.summary()
+        assert {"query", "collect_associated_files", "describe", "render"} <= set(
+            summary["stages"]
+        )
+        assert {"anat", "dwi", "fmap", "func"} <= set(summary["datatypes"])
+        assert "read_header" in summary["datatypes"]["func"]
@@ -2,9 +2,13 @@
 
 from __future__ import annotations
 
+import shutil
 from collections import Counter
 
-from bids.ext.reports import BIDSReport
+from bids.layout import BIDSLayout
+
+from bids.ext.reports import BIDSReport, parsing
+from bids.ext.reports.report import SubjectReport
 
 
 def test_report_init(testlayout):
@@ -30,6 +34,38 @@ def test_report_gen_from_files(testlayout):
     assert isinstance(descriptions, Counter)
 
 
+def test_report_file_missing_session(testlayout):
+    """Subjects without files in some sessions should be described with the others."""
+    files = [
+        f
+        for f in testlayout.get(extension=[".nii.gz"])
+        if (f.entities["subject"], f.entities["session"]) != ("02", "02")
+    ]
+    report = BIDSReport(testlayout)
+    descriptions = report.generate_from_files(files)
+
+    assert sum(descriptions.values()) == len(testlayout.get_subjects())
+    (subject_02,) = [desc for desc, subs in report.patterns.items() if "02" in subs]
+    assert "In session 01" in subject_02
+    assert "In session 02" not in subject_02
+
+
+def test_report_no_image_io(testlayout, monkeypatch):
+    """Without image I/O, reports should only be built from the metadata."""
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("images should not be read")
+
+    monkeypatch.setattr(parsing, "read_nifti_header", _fail)
+    report = BIDSReport(testlayout, image_io=False, io_threads=4)
+    counter = report.generate(subject="01")
+
+    (description,) = counter
+    assert "In session 01" in description
+    # the test images have no voxel size in their metadata
+    assert "?x?x?" in description
+
+
 def test_report_subject(testlayout):
     """Generating a report for one subject should only return one subject's
     description (i.e., one pattern with a count of one).
@@ -60,3 +96,159 @@ def test_report_dict_config(testconfig, testlayout):
     report = BIDSReport(testlayout, config=testconfig)
     descriptions = report.generate()
     assert isinstance(descriptions, Counter)
+
+
+def test_report_parses_each_session_once(testlayout, monkeypatch):
+    """Each subject/session combination should be parsed exactly once,
+    and only with the files of that session.
+    """
+    calls = []
+
+    def _describe_files(layout, data_files, config, *args):
+        calls.append({(f.subject, f.session) for f in data_files})
+        return [(None, {})]
+
+    monkeypatch.setattr(parsing, "describe_files", _describe_files)
+
+    report = BIDSReport(testlayout)
+    report.generate(subject=["01", "02"])
+
+    assert calls == [{("01", "01")}, {("01", "02")}, {("02", "01")}, {("02", "02")}]
+
+
+def test_report_patterns(testlayout, monkeypatch):
+    """Subjects with the same description should only be rendered once."""
+    rendered = []
+    render = parsing.render_paragraph
+
+    def _render_paragraph(paragraph):
+        rendered.append(paragraph)
+        return render(paragraph)
+
+    monkeypatch.setattr(parsing, "render_paragraph", _render_paragraph)
+
+    report = BIDSReport(testlayout)
+    report.generate(subject="01")
+    n_rendered_single_subject = len(rendered)
+    rendered.clear()
+    counter = report.generate()
+
+    # all subjects share the same protocol in the test dataset
+    assert len(counter) == 1
+    assert len(rendered) == n_rendered_single_subject
+    assert list(report.patterns) == list(counter)
+    assert {desc: len(subs) for desc, subs in report.patterns.items()} == counter
+    assert sorted(sub for subs in report.patterns.values() for sub in subs) == sorted(
+        testlayout.get_subjects()
+    )
+
+
+def test_report_patterns_value_types(testdataset, tmp_path):
+    """Metadata values that are equal but rendered differently should give different patterns."""
+    dataset = shutil.copytree(testdataset, tmp_path / "dataset")
+    for sidecar in (
+        dataset / "sub-01" / "ses-01" / "anat" / "sub-01_ses-01_T1w.json",
+        dataset / "sub-02" / "ses-01" / "anat" / "sub-02_ses-01_T1w.json",
+    ):
+        sidecar.write_text('{"FlipAngle": 8.0}')
+
+    report = BIDSReport(BIDSLayout(dataset))
+    counter = report.generate()
+
+    assert sorted(counter.values()) == [2, 3]
+    for description, subjects in report.patterns.items():
+        assert ("FA=8.0" in description) == (subjects == ["01", "02"])
+
+
+def test_report_metadata_cache(testlayout):
+    """Each sidecar should be read at most once per report."""
+    report = BIDSReport(testlayout)
+    report.generate()
+    cache_info = report.metadata_cache.cache_info()
+    assert cache_info["hits"] > 0
+    assert cache_info["misses"] == cache_info["currsize"]
+
+
+def test_report_parallel(testlayout):
+    """Reporting on subjects in parallel should give the same result as serially."""
+    report = BIDSReport(testlayout)
+    serial = report.generate()
+    parallel = report.generate(n_jobs=2)
+    assert list(parallel.items()) == list(serial.items())
+
+    files = testlayout.get(extension=[".nii.gz", ".nii"])
+    serial = report.generate_from_files(files)
+    parallel = report.generate_from_files(files, n_jobs=-1)
+    assert list(parallel.items()) == list(serial.items())
+
+
+def test_report_incremental(testdataset, tmp_path, monkeypatch):
+    """Only subjects whose files changed should be described again."""
+    dataset = shutil.copytree(testdataset, tmp_path / "dataset")
+    manifest_dir = tmp_path / "manifests"
+    expected = BIDSReport(BIDSLayout(dataset)).generate()
+
+    described = []
+    describe = BIDSReport._describe_subject
+
+    def _describe_subject(self, subject, sessions):
+        described.append(subject)
+        return describe(self, subject, sessions)
+
+    monkeypatch.setattr(BIDSReport, "_describe_subject", _describe_subject)
+
+    assert BIDSReport(BIDSLayout(dataset), manifest_dir=manifest_dir).generate() == expected
+    assert described == ["01", "02", "03", "04", "05"]
+    assert len(list(manifest_dir.glob("sub-*.json"))) == 5
+
+    described.clear()
+    assert BIDSReport(BIDSLayout(dataset), manifest_dir=manifest_dir).generate() == expected
+    assert described == []
+
+    # touching a sidecar does not change its content
+    sidecar = dataset / "sub-02" / "ses-01" / "fmap" / "sub-02_ses-01_phasediff.json"
+    sidecar.touch()
+    assert BIDSReport(BIDSLayout(dataset), manifest_dir=manifest_dir).generate() == expected
+    assert described == []
+
+    sidecar.write_text(sidecar.read_text().replace("}", ', "Manufacturer": "Other"}', 1))
+    report = BIDSReport(BIDSLayout(dataset), manifest_dir=manifest_dir)
+    report.generate()
+    assert described == ["02"]
+    assert sorted(sub for subs in report.patterns.values() for sub in subs) == [
+        "01",
+        "02",
+        "03",
+        "04",
+        "05",
+    ]
+
+
+def test_iter_subjects(testlayout, monkeypatch):
+    """Subjects should be yielded as soon as they are described."""
+    described = []
+    describe = BIDSReport._describe_subject
+
+    def _describe_subject(self, subject, sessions):
+        described.append(subject)
+        return describe(self, subject, sessions)
+
+    monkeypatch.setattr(BIDSReport, "_describe_subject", _describe_subject)
+
+    report = BIDSReport(testlayout)
+    subject_reports = report.iter_subjects()
+    first = next(subject_reports)
+    assert described == ["01"]
+    assert first.subject == "01"
+    assert list(first.session_descriptions) == ["01", "02"]
+    assert first.description.startswith(first.session_descriptions["01"])
+    assert SubjectReport.from_dict(first.to_dict()) == first
+
+    subject_reports = [first, *subject_reports]
+    assert [r.subject for r in subject_reports] == ["01", "02", "03", "04", "05"]
+    # all subjects have the same protocol in the test dataset
+    assert len({r.fingerprint for r in subject_reports}) == 1
+
+    counter = report.generate()
+    assert report.patterns == {first.description: ["01", "02", "03", "04", "05"]}
+    assert counter == Counter({first.description: 5})
@@ -0,0 +1,129 @@
+"""Tests for bids.ext.reports.server."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import socket
+import threading
+import urllib.request
+from urllib.error import HTTPError
+
+import pytest
+
+from bids.ext.reports.server import ReportServer, UnknownDatasetError, make_http_server
+
+
+@pytest.fixture
+def reports(testdataset):
+    reports = ReportServer(check_interval=-1)
+    reports.register("synthetic", testdataset)
+    return reports
+
+
+def test_report(reports):
+    """Reports should be reused until the dataset is invalidated."""
+    result = reports.report("synthetic")
+    assert not result["cached"]
+    assert result["patterns"][0]["subjects"] == ["01", "02", "03", "04", "05"]
+    assert result["report"] == result["patterns"][0]["description"]
+
+    assert reports.report("synthetic")["cached"]
+
+    result = reports.report("synthetic", subject=["01"], datatype="anat")
+    assert not result["cached"]
+    assert result["patterns"][0]["subjects"] == ["01"]
+    assert "functional" not in result["report"]
+
+    reports.invalidate("synthetic")
+    assert not reports.report("synthetic")["cached"]
+
+
+def test_report_errors(reports):
+    with pytest.raises(UnknownDatasetError):
+        reports.report("unknown")
+    with pytest.raises(ValueError, match="Unknown filters"):
+        reports.report("synthetic", task="rest")
+
+
+def test_report_changed_dataset(testdataset, tmp_path):
+    """Datasets should be indexed again when their fingerprint changes."""
+    bids_dir = tmp_path / "synthetic"
+    shutil.copytree(testdataset, bids_dir)
+    reports = ReportServer(check_interval=0)
+    reports.register("synthetic", bids_dir)
+    assert reports.info("synthetic")["subjects"] == 5
+    reports.report("synthetic")
+
+    shutil.rmtree(bids_dir / "sub-05")
+    result = reports.report("synthetic")
+    assert not result["cached"]
+    assert result["patterns"][0]["subjects"] == ["01", "02", "03", "04"]
+
+
+def test_report_edited_sidecar(testdataset, tmp_path):
+    """Datasets should be indexed again when a sidecar is edited in place."""
+    bids_dir = tmp_path / "synthetic"
+    shutil.copytree(testdataset, bids_dir)
+    reports = ReportServer(check_interval=0)
+    reports.register("synthetic", bids_dir)
+    assert "FA=8;" in reports.report("synthetic")["report"]
+
+    sidecar = bids_dir / "T1w.json"
+    sidecar.write_text(sidecar.read_text().replace('"FlipAngle": 8', '"FlipAngle": 9'))
+    result = reports.report("synthetic")
+    assert not result["cached"]
+    assert "FA=9;" in result["report"]
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_http_server(reports):
+    server = make_http_server(reports)
+    _serve(server)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{url}/datasets") as response:
+            assert [info["name"] for info in json.load(response)] == ["synthetic"]
+
+        with urllib.request.urlopen(f"{url}/datasets/synthetic/report?subject=02") as response:
+            assert json.load(response)["patterns"][0]["subjects"] == ["02"]
+
+        request = urllib.request.Request(f"{url}/datasets/synthetic/invalidate", method="POST")
+        with urllib.request.urlopen(request) as response:
+            assert json.load(response)["reports"] == 0
+
+        with pytest.raises(HTTPError) as exc_info:
+            urllib.request.urlopen(f"{url}/datasets/unknown/report")
+        assert exc_info.value.code == 404
+        exc_info.value.close()
+        with pytest.raises(HTTPError) as exc_info:
+            urllib.request.urlopen(f"{url}/datasets/synthetic/report?task=rest")
+        assert exc_info.value.code == 400
+        exc_info.value.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unix_socket_server(reports, tmp_path):
+    socket_path = tmp_path / "reports.sock"
+    server = make_http_server(reports, socket_path=socket_path)
+    _serve(server)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(socket_path))
+            client.sendall(b"GET /datasets/synthetic HTTP/1.0\r\n\r\n")
+            response = b""
+            while chunk := client.recv(4096):
+                response += chunk
+        assert response.startswith(b"HTTP/1.0 200")
+        assert json.loads(response.split(b"\r\n\r\n", 1)[1])["subjects"] == 5
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert not socket_path.exists()
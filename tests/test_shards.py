@@ -0,0 +1,43 @@
+"""Tests for bids.ext.reports.shards."""
+
+from __future__ import annotations
+
+from collections import Counter
+
+import pytest
+
+from bids.ext.reports import shards
+
+
+def test_parse_shard():
+    assert shards.parse_shard("0/4") == (0, 4)
+    assert shards.parse_shard("3/4") == (3, 4)
+    for shard in ("4/4", "-1/4", "1", "a/b"):
+        with pytest.raises(ValueError):
+            shards.parse_shard(shard)
+
+
+def test_shard_subjects():
+    subjects = [f"{i:03d}" for i in range(100)]
+    all_shards = [shards.shard_subjects(subjects, i, 3) for i in range(3)]
+    assert sorted(sub for shard in all_shards for sub in shard) == subjects
+    # adding subjects does not move the others
+    assert set(all_shards[0]) <= set(shards.shard_subjects([*subjects, "new"], 0, 3))
+
+
+def test_merge_patterns(tmp_path):
+    single = {"A": ["01", "03", "04"], "B": ["02"], "C": ["05"]}
+    shard_patterns = [{"A": ["03"], "C": ["05"]}, {"B": ["02"], "A": ["01", "04"]}]
+    for i, patterns in enumerate(shard_patterns):
+        shards.write_patterns(patterns, tmp_path / f"{i}.json", shard=(i, 2))
+
+    merged = shards.merge_patterns(shards.read_patterns(tmp_path / f"{i}.json") for i in range(2))
+    assert list(merged.items()) == list(single.items())
+
+    # unpadded labels are in natural order, and ties are broken by the first subject
+    merged = shards.merge_patterns([{"A": ["10", "3"]}, {"B": ["4", "2"]}])
+    assert list(merged.items()) == [("B", ["2", "4"]), ("A", ["3", "10"])]
+    assert Counter({desc: len(subs) for desc, subs in merged.items()}).most_common(1) == [("B", 2)]
+
+    with pytest.raises(ValueError, match="several shards"):
+        shards.merge_patterns([{"A": ["01"]}, {"B": ["01"]}])
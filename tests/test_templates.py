@@ -1,10 +1,12 @@
-"""Tests for bids.reports.parsing."""
+"""Tests for bids.reports.templates."""
 
 from __future__ import annotations
 
 import json
 from pathlib import Path
 
+import pytest
+
 from bids.ext.reports import templates
 
 
@@ -13,3 +15,63 @@ def test_pet():
         metadata = json.load(f)
 
     templates.pet_info(metadata)
+
+
+def test_template_keys():
+    keys = templates.template_keys("institution.mustache")
+    assert "InstitutionName" in keys
+
+
+def test_fingerprint():
+    data = {"InstitutionName": "A", "Unused": [1, {"a": 2}]}
+    fingerprint = templates.fingerprint("institution.mustache", data)
+    hash(fingerprint)
+    assert fingerprint == templates.fingerprint(
+        "institution.mustache", {**data, "Unused": "something else"}
+    )
+    assert fingerprint != templates.fingerprint(
+        "institution.mustache", {**data, "InstitutionName": "B"}
+    )
+    assert fingerprint != templates.fingerprint("mri_scanner_info.mustache", data)
+    assert templates.fingerprint(None, data) is None
+
+
+@pytest.mark.parametrize("value, other", [(8, 8.0), (1, True), (0.0, False)])
+def test_fingerprint_scalar_types(value, other):
+    """Values rendered differently should have different fingerprints, even if equal."""
+    assert templates.render("institution.mustache", {"InstitutionName": value}) != (
+        templates.render("institution.mustache", {"InstitutionName": other})
+    )
+    assert templates.fingerprint("institution.mustache", {"InstitutionName": value}) != (
+        templates.fingerprint("institution.mustache", {"InstitutionName": other})
+    )
+
+
+def test_registry_compiles_once():
+    registry = templates.TemplateRegistry()
+    tokens = registry.tokens("func.mustache")
+    assert registry.tokens("func.mustache") is tokens
+
+
+def test_registry_bundle(tmp_path):
+    """A registry built from a bundle should not read the templates directory."""
+    data = {"InstitutionName": "A & B"}
+    bundle = templates.TemplateRegistry().bundle()
+    assert "institution.mustache" in bundle["templates"]
+
+    registry = templates.TemplateRegistry(templates_dir=tmp_path, bundle=bundle)
+    assert registry.render("institution.mustache", data) == templates.get_registry().render(
+        "institution.mustache", data
+    )
+    with pytest.raises(FileNotFoundError):
+        registry.render("missing.mustache", data)
+
+
+def test_registry_partials():
+    bundle = {
+        "templates": {"main.mustache": "{{a}} {{> part}}{{> missing}}"},
+        "partials": {"part.mustache": "{{#b}}<{{c}}>{{/b}}"},
+    }
+    registry = templates.TemplateRegistry(bundle=bundle)
+    assert registry.render("main.mustache", {"a": 1, "b": [{"c": 2}, {"c": 3}]}) == "1 <2><3>"
+    assert registry.keys("main.mustache") == {"a", "b", "c"}
@@ -0,0 +1,170 @@
+"""Tests for bids.reports.utils."""
+
+from __future__ import annotations
+
+import pickle
+from types import SimpleNamespace
+
+import pytest
+
+from bids.ext.reports import utils
+
+
+def test_index_files_by_subject_session(testlayout):
+    files = testlayout.get(extension=[".nii.gz"])
+    index = utils.index_files_by_subject_session(files)
+
+    assert list(index) == testlayout.get_subjects()
+    assert list(index["01"]) == ["01", "02"]
+    assert sum(len(f) for ses in index.values() for f in ses.values()) == len(files)
+    for sub, sessions in index.items():
+        for ses, ses_files in sessions.items():
+            assert all(f.entities["subject"] == sub for f in ses_files)
+            assert all(f.entities["session"] == ses for f in ses_files)
+
+
+def test_index_files_by_subject_session_no_session():
+    files = [
+        SimpleNamespace(entities={"subject": "02", "suffix": "T1w"}),
+        SimpleNamespace(entities={"subject": "01", "suffix": "T1w"}),
+        SimpleNamespace(entities={"subject": "01", "suffix": "bold"}),
+    ]
+    index = utils.index_files_by_subject_session(files)
+    assert list(index) == ["01", "02"]
+    assert index["01"] == {None: files[1:]}
+
+
+def test_collect_associated_files(data_path, monkeypatch):
+    """Multi-echo files should be grouped without querying the layout."""
+    from bids.layout import BIDSLayout
+
+    layout = BIDSLayout(data_path / "ds000117")
+    files = layout.get(subject="01", session="mri", extension=[".nii", ".nii.gz"])
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("layout should not be queried")
+
+    monkeypatch.setattr(layout, "get", _fail)
+
+    groups = utils.collect_associated_files(files, extra_entities=["run"])
+
+    assert sum(len(g) for g in groups) == len(files)
+    flash = [g for g in groups if g[0].entities["suffix"] == "FLASH"]
+    assert len(flash) == 1
+    assert len(flash[0]) == 14
+    bold = [g for g in groups if g[0].entities["suffix"] == "bold"]
+    assert len(bold) == 1
+    assert len(bold[0]) == 9
+
+
+def test_file_records(testlayout):
+    files = testlayout.get(subject="01", session="01")
+    records = utils.file_records(testlayout, files)
+
+    assert [r.path for r in records] == [f.path for f in files]
+    for f, record in zip(files, records):
+        assert record.get_entities() == f.get_entities()
+        assert record.filename == f.filename
+        assert record.subject == "01"
+    # records are returned as they are
+    assert utils.file_records(testlayout, records) == records
+
+
+def test_file_record_immutable_and_picklable():
+    record = utils.FileRecord.from_entities(
+        "/data/sub-01/func/sub-01_task-rest_acq-fast_run-1_bold.nii.gz",
+        {"subject": "01", "task": "rest", "acquisition": "fast", "run": 1, "suffix": "bold"},
+    )
+    assert record.run == 1
+    assert record.session is None
+    assert record.other_entities == (("acquisition", "fast"),)
+    with pytest.raises(AttributeError):
+        record.run = 2
+    with pytest.raises(AttributeError):
+        record.extra = 2
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_collect_associated_files_records(testlayout):
+    """Records should be grouped as the files they come from."""
+    files = testlayout.get(subject="01", session="01", extension=[".nii.gz"])
+    records = utils.file_records(testlayout, files)
+
+    groups = utils.collect_associated_files(files, extra_entities=["run"])
+    record_groups = utils.collect_associated_files(records, extra_entities=["run"])
+    assert [[r.path for r in g] for g in record_groups] == [[f.path for f in g] for g in groups]
+
+
+@pytest.mark.parametrize(
+    "target",
+    [
+        "sub-01/ses-01/func/sub-01_ses-01_task-nback_run-01_bold.nii.gz",
+        "ses-01/func/sub-01_ses-01_task-nback_run-01_bold.nii.gz",
+        "bids::sub-01/ses-01/func/sub-01_ses-01_task-nback_run-01_bold.nii.gz",
+        "sub-01_ses-01_task-nback_run-01_bold.nii.gz",
+    ],
+)
+def test_filename_index(testlayout, target):
+    filename_index = utils.FilenameIndex(testlayout)
+    f = filename_index.get(target)
+    assert f.filename == "sub-01_ses-01_task-nback_run-01_bold.nii.gz"
+    assert f.entities["subject"] == "01"
+
+
+def test_filename_index_missing(testlayout):
+    filename_index = utils.FilenameIndex(testlayout)
+    assert filename_index.get("sub-01/func/sub-01_task-foo_bold.nii.gz") is None
+
+
+def test_metadata_cache(testlayout):
+    files = testlayout.get(subject="01", session="01", extension=[".nii.gz"])
+    metadata_cache = utils.MetadataCache(maxsize=2)
+
+    assert metadata_cache.get(files[0]) == files[0].get_metadata()
+    metadata_cache.get(files[0])
+    assert metadata_cache.cache_info()["hits"] == 1
+    assert metadata_cache.cache_info()["misses"] == 1
+
+    metadata_cache.get(files[1])
+    metadata_cache.get(files[0])
+    metadata_cache.get(files[2])
+    # files[1] was the least recently used one
+    assert len(metadata_cache) == 2
+    metadata_cache.get(files[0])
+    metadata_cache.get(files[1])
+    assert metadata_cache.cache_info() == {"hits": 3, "misses": 4, "maxsize": 2, "currsize": 2}
+
+
+def test_fetch_tags(testlayout, monkeypatch):
+    """Tags read in bulk should match those read file by file."""
+    files = testlayout.get()
+    monkeypatch.setattr(utils, "TAG_QUERY_CHUNK_SIZE", 7)
+    entities, metadata = utils.fetch_tags(testlayout, [f.path for f in files])
+
+    for f in files:
+        assert entities[f.path] == f.get_entities()
+        assert metadata[f.path] == f.get_metadata()
+
+    entities, metadata = utils.fetch_tags(testlayout, [files[0].path], metadata=False)
+    assert entities == {files[0].path: files[0].get_entities()}
+    assert metadata == {}
+
+
+@pytest.mark.parametrize("filters", [{}, {"session": "02"}, {"subject": ["03", "01"]}])
+def test_get_subjects(testlayout, filters):
+    assert utils.get_subjects(testlayout, **filters) == testlayout.get_subjects(**filters)
+
+
+def test_metadata_cache_prefetch(testlayout):
+    files = testlayout.get(subject="01", extension=[".nii.gz"])
+    metadata_cache = utils.MetadataCache()
+    metadata_cache.prefetch(testlayout, files)
+    assert metadata_cache.cache_info()["misses"] == len(files)
+
+    for f in files:
+        assert metadata_cache.entities(f) == f.get_entities()
+        assert metadata_cache.get(f) == f.get_metadata()
+    assert metadata_cache.cache_info()["hits"] == len(files)
+
+    metadata_cache.prefetch(testlayout, files)
+    assert metadata_cache.cache_info()["misses"] == len(files)
@@ -1,18 +1,19 @@
 #!/usr/bin/env python3
 
-import subprocess
 import sys
 from pathlib import Path
 
+from bids.ext.reports.cli import cli
+
 
 def main():
 
-    rc = 0
     prefixes = ["asl", "ds00", "eeg", "meg", "ieeg", "pet"]
 
     base_dir = Path("tools") / "bids-examples"
     output_dir = Path(__file__).parent
 
+    datasets = []
     for pre in prefixes:
         for path in base_dir.glob(f"{pre}*"):
             if not path.is_dir():
@@ -21,26 +22,14 @@ def main():
             if path.name == "bids-examples":
                 continue
 
-            print()
-            print("running on dataset", path)
-
-            (output_dir / path.name).mkdir(exist_ok=True)
-
-            cmd = [
-                "pybids_reports",
-                str(path),
-                str(output_dir / path.name),
-                "--verbosity",
-                "1",
-            ]
+            datasets.append(str(path))
 
-            print(" ".join(cmd))
+    # report on all datasets in a single process, see 'pybids_reports batch --help'
+    cmd = ["batch", str(output_dir), *datasets, "--verbosity", "1", *sys.argv[1:]]
 
-            result = subprocess.run(cmd)
-            if result.returncode != 0:
-                rc = result.returncode
+    print("pybids_reports", " ".join(cmd))
 
-    sys.exit(rc)
+    cli(cmd)
 
 
 if __name__ == "__main__":